@@ -16,3 +16,10 @@ def get_small_instance_automatic_sample_routes():
         if start != destination:
             sample_routes.append(SampleRoute(start, destination, '7:30:00', date='2024-09-05'))
     return sample_routes
+
+def get_estimator_benchmark_sample_routes():
+    sample_routes = []
+    for start, destination, time, date in product(restricted_locations_dict.keys(), restricted_locations_dict.keys(), times, dates):
+        if start != destination:
+            sample_routes.append(SampleRoute(start, destination, time, date=date))
+    return sample_routes
@@ -16,6 +16,7 @@ from algorithm.estimator import *
 from components.SampleRoute import SampleRoute
 from strategies.BenchmarkStrategy import BenchmarkStrategy
 from strategies.CustomBenchmark import CustomBenchmark
+from strategies.EstimatorBenchmark import EstimatorBenchmark
 from strategies.SmallAutoBenchmark import SmallAutoBenchmark
 from strategies.FullAutoBenchmark import FullAutoBenchmark
 from common import OSRM_PORT, start_osrm
@@ -25,6 +26,12 @@ with start_osrm("pl_wielkopolskie"):
   data = Data.instance(ROOT / "data" / "cities" / "poz-w.db")
   estimator = None
 
+  if len(sys.argv) > 1 and sys.argv[1] == "estimators":
+    b = EstimatorBenchmark(data)
+    b.run()
+    b.print_results_to_csv()
+    sys.exit()
+
   if len(sys.argv) > 1:
     match sys.argv[1]:
       case "manhattan":
@@ -33,8 +40,14 @@ with start_osrm("pl_wielkopolskie"):
         estimator = euclidean_estimator
       case "cluster":
         estimator = data.cluster_estimator
+      case "cluster-hourly":
+        estimator = data.hourly_cluster_estimator
+      case "heurtable":
+        estimator = data.heurtable_estimator
       case "knn":
         estimator = data.knn_estimator
+      case "landmarks":
+        estimator = data.landmark_estimator
       case "nn":
         estimator = data.nn_estimator
       case "nn-ref":
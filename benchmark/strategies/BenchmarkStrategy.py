@@ -8,6 +8,7 @@ from algorithm.data import Data
 from algorithm.estimator import Estimator
 from algorithm.utils import time_to_seconds, seconds_to_time, custom_print, plans_to_string
 from algorithm.astar_planner import AStarPlanner
+from algorithm.jit_planner import JitAStarPlanner
 from transit.data.misc import Coords
 
 class PlannerResult(NamedTuple):
@@ -39,7 +40,12 @@ class BenchmarkStrategy():
             weekday = route.week_day
             total_time = 0
 
-            planner = AStarPlanner(
+            if JitAStarPlanner.supports(self.estimator):
+                planner_class = JitAStarPlanner
+            else:
+                planner_class = AStarPlanner
+
+            planner = planner_class(
                 self.data,
                 start,
                 destination,
@@ -0,0 +1,126 @@
+import csv
+import datetime
+from time import perf_counter
+
+import numpy as np
+
+from strategies.BenchmarkStrategy import BenchmarkStrategy
+from routes_generating.automatic_routes import get_estimator_benchmark_sample_routes
+from algorithm.estimator import Instant
+from algorithm.utils import time_to_seconds, custom_print
+from transit.data.misc import Coords, INF_TIME
+
+# Stops sampled for every route to check admissibility against the router
+ADMISSIBILITY_SAMPLES = 20
+# Stops sampled for every route to time single estimates
+LATENCY_SAMPLES = 1000
+
+
+class EstimatorBenchmark(BenchmarkStrategy):
+    """
+    Runs the same routes with every estimator available in Data and compares
+    cost of estimates and quality of the search. Estimates are checked against
+    travel times from sampled stops found by the router with exact lower
+    bounds, and found routes against the router's optimal ones.
+    """
+    alternative_routes = 1
+
+    def __init__(self, data):
+        BenchmarkStrategy.__init__(self, data)
+        self.benchmark_type = 'estimator_benchmark'
+        self.sample_routes = get_estimator_benchmark_sample_routes()
+        self.estimators = data.estimators
+        self.rows = []
+
+    def run(self):
+        references = [self.get_reference(i, route) for i, route in enumerate(self.sample_routes)]
+        self.rows = []
+
+        for name, estimator in self.estimators.items():
+            if estimator is None:
+                custom_print(f'Skipping {name} estimator, its data is missing', 'BENCHMARK')
+                continue
+
+            custom_print(f'Benchmarking {name} estimator', 'BENCHMARK')
+            self.estimator = estimator
+            BenchmarkStrategy.run(self)
+
+            for route_index, route in enumerate(self.sample_routes):
+                self.rows.append(self.get_row(name, route_index, route, references[route_index]))
+
+    def print_results_to_csv(self):
+        filename = self.get_csv_filename()
+        with open(filename, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=self.rows[0].keys())
+            writer.writeheader()
+            writer.writerows(self.rows)
+        custom_print(filename, 'BENCHMARK')
+
+    #private methods:
+    def get_reference(self, route_index, route):
+        """Exact travel time of the route, and from sampled stops to its destination."""
+        date = datetime.date.fromisoformat(route.date)
+        services = self.data.services_around(date)
+        start_time = time_to_seconds(route.start_time)
+        destination = Coords(*route.destination_cords)
+        prospect = self.data.prospector.prospect(Coords(*route.start_cords), destination)
+        plan = self.data.router.find_route(prospect, services, start_time, engine="raptor")
+
+        rng = np.random.default_rng(route_index)
+        stop_ids = rng.choice(self.data.stops.count(), ADMISSIBILITY_SAMPLES, replace=False)
+        samples = []
+
+        for stop_id in stop_ids.tolist():
+            stop_prospect = self.data.prospector.prospect(stop_id, destination)
+            stop_plan = self.data.router.find_route(stop_prospect, services, start_time, engine="raptor")
+
+            if stop_plan.arrival != INF_TIME:
+                samples.append((stop_id, stop_prospect, stop_plan.arrival - start_time))
+
+        duration = plan.arrival - start_time if plan.arrival != INF_TIME else None
+        latency_stops = rng.integers(0, self.data.stops.count(), LATENCY_SAMPLES)
+        return prospect, duration, samples, latency_stops
+
+    def get_row(self, name, route_index, route, reference):
+        prospect, duration, samples, latency_stops = reference
+        stops = self.data.stops
+        start_time = time_to_seconds(route.start_time)
+        instant = Instant.from_date(datetime.date.fromisoformat(route.date), start_time)
+        estimate = self.estimator.estimate
+
+        # Warm up numba before timing
+        estimate(stops, prospect, 0, instant)
+        t0 = perf_counter()
+        for stop_id in latency_stops.tolist():
+            estimate(stops, prospect, stop_id, instant)
+        latency = (perf_counter() - t0) / len(latency_stops)
+
+        overestimates = [
+            estimate(stops, stop_prospect, stop_id, instant) - exact
+            for stop_id, stop_prospect, exact in samples
+        ]
+        violations = [o for o in overestimates if o > 0]
+
+        planner = self.planners[route_index]
+        found_plans = planner.found_plans
+        found_duration = found_plans[0].time_at_destination - start_time if found_plans else None
+
+        return {
+            'estimator': name,
+            'Start name': route.start_name,
+            'Destination Name': route.destination_name,
+            'Start Time': route.start_time,
+            'Day of week': route.week_day,
+            'Time searching': round(self.total_times[route_index], 4),
+            'estimate latency [us]': round(latency * 1e6, 3),
+            'admissibility checks': len(samples),
+            'admissibility violations': len(violations),
+            'admissibility violation rate': len(violations) / len(samples) if samples else None,
+            'mean overestimate': round(float(np.mean(violations)), 1) if violations else 0,
+            'expansions_total': planner.metrics['expansions_total'],
+            'unique_stops_visited': planner.metrics['unique_stops_visited'],
+            'iterations': planner.metrics['iterations'],
+            'found route duration': found_duration,
+            'optimal route duration': duration,
+            'optimality gap': found_duration - duration if found_duration is not None and duration is not None else None,
+        }
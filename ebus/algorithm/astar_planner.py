@@ -3,28 +3,30 @@ import heapq
 from itertools import combinations
 import numba as nb
 import numba.types as nbt
+import numpy as np
 import time
 from .data import Data
 from .discovered_stop import DiscoveredStop
-from .estimator import Estimate, Estimator, Instant
-from .plan import Plan, PlanTrip
+from .estimator import Estimate, Estimator, Instant, estimate_all
+from .plan import Plan, PlanArena, PlanTrip
 from .preferences import *
 from .utils import *
 from ebus.custom_settings.algorithm_settings import *
-from transit.data.misc import Coords, Delays, INF_TIME, Services
+from transit.data.misc import Coords, Delays, INF_TIME
 from transit.data.stops import Stops
-from transit.data.trips import Trips
+from transit.data.trips import Trips, TripStarts
 from transit.prospector import Prospect
 
 
 class AStarPlanner():
     prospect: Prospect
     data: Data
-    services: Services
+    trip_starts: TripStarts
     date: datetime.date
     start_time: int
     estimator: Estimator
     iterations: int
+    arena: PlanArena
     plans_queue: list[Plan]
     found_plans: list[Plan]
     used_trips: set[frozenset[tuple[int, int]]]
@@ -60,11 +62,12 @@ class AStarPlanner():
 
         self.data = data
         self.date = date if isinstance(date, datetime.date) else datetime.date.fromisoformat(date)
-        self.services = self.data.services_around(self.date)
+        self.trip_starts = self.data.starts_around(self.date)
         self.start_time = start_time
         self.estimator = estimator or data.default_estimator
 
         self.iterations = 0
+        self.arena = PlanArena()
         self.plans_queue = []
         self.found_plans = []
         self.used_trips = set()
@@ -100,12 +103,13 @@ class AStarPlanner():
         for near in self.prospect.near_start:
             walk_time = int(near.walk_distance / preferences.pace)
             dstop = self.discover_stop(near.id)
-            plan = Plan.initial(near.id, start_time, walk_time)
+            plan = Plan.initial(near.id, start_time, walk_time, self.arena)
             plan.walk_time = self.get_walk_time(near.id)
-            plan.travel_time = self.get_estimate(near.id, start_time + walk_time).travel_time
             dstop.register_plan(plan)
             self.plans_queue.append(plan)
 
+        self.set_travel_times(self.plans_queue)
+
         heapify_t0 = time.time()
         heapq.heapify(self.plans_queue)
         self.metrics['plans_queue_operations_time'] += (time.time() - heapify_t0)
@@ -160,6 +164,36 @@ class AStarPlanner():
 
         return estimate
 
+    def set_travel_times(self, plans: list[Plan]):
+        """
+        Sets travel times of plans to estimates at their current stops and
+        times, estimating all the ones not cached at once.
+        """
+        missing = []
+
+        for plan in plans:
+            estimate = self.estimates.get(plan.current_stop_id)
+
+            if estimate is None or not self.is_estimate_valid(estimate, plan.current_time):
+                missing.append(plan)
+            else:
+                plan.travel_time = estimate.travel_time
+
+        if not missing:
+            return
+
+        t0 = time.time()
+        stop_ids = np.array([plan.current_stop_id for plan in missing], np.int32)
+        times = np.array([plan.current_time for plan in missing], np.int32)
+        instants = Instant.from_date_many(self.date, times)
+        travel_times = estimate_all(self.estimator, self.data.stops, self.prospect, stop_ids, instants)
+
+        for plan, travel_time in zip(missing, travel_times.tolist()):
+            plan.travel_time = travel_time
+            self.estimates[plan.current_stop_id] = Estimate(travel_time, plan.current_time)
+
+        self.metrics['plan_compute_heurstic_time_total'] += time.time() - t0
+
     # Mere algorithm
     def find_next_plan(self):
         start_time_find_next_plan = time.time()
@@ -209,11 +243,13 @@ class AStarPlanner():
             transfer_time = HEURISTIC_SETTINGS["TRANSFER_TIME"]
             walk_limit = self.preferences.max_stop_walk
 
-            if not fastest_known_plan.plan_trips:
+            last_trip = fastest_known_plan.last_trip
+
+            if last_trip is None:
                 # Don't add transfer time before first trip
                 transfer_time = 0
-            elif fastest_known_plan.plan_trips[-1].trip_id == -1:
-                trip = fastest_known_plan.plan_trips[-1]
+            elif last_trip.trip_id == -1:
+                trip = last_trip
                 walk_time = trip.arrival_time - trip.departure_time
                 walk_limit -= int(walk_time * self.preferences.pace)
 
@@ -221,7 +257,7 @@ class AStarPlanner():
                 stops = self.data.stops,
                 trips = self.data.trips,
                 from_stop = fastest_known_plan.current_stop_id,
-                services = self.services,
+                trip_starts = self.trip_starts,
                 time = fastest_known_plan.current_time,
                 transfer_time = transfer_time,
                 pace = self.preferences.pace,
@@ -246,11 +282,12 @@ class AStarPlanner():
                 plan = fastest_known_plan.extend(extending_plan_trip)
 
                 if dstop.register_plan(plan):
-                    cur_time = extending_plan_trip.arrival_time
                     plan.walk_time = self.get_walk_time(stop_id)
-                    plan.travel_time = self.get_estimate(stop_id, cur_time).travel_time
                     extended_plans.append(plan)
 
+            # The first plan goes to the destination, so it needs no estimate
+            self.set_travel_times(extended_plans[1:])
+
             end_extensions_init_time = time.time()
 
             start_time_heappush = time.time()
@@ -294,16 +331,19 @@ class AStarPlanner():
         return not duplicate
 
     def next_gen(self, plan):
-        if not plan.plan_trips:
+        first_trip = plan.first_trip
+
+        if first_trip is None:
             return
 
-        stop_id = plan.plan_trips[0].from_stop
-        new_time = plan.plan_trips[0].departure_time + 1
+        stop_id = first_trip.from_stop
+        new_time = first_trip.departure_time + 1
 
         alternative = Plan.initial(
             stop_id,
             new_time - plan.initial_walk,
             plan.initial_walk,
+            self.arena,
         )
 
         alternative.generation = plan.generation + 1
@@ -324,7 +364,7 @@ def get_next_trips(
     stops: Stops,
     trips: Trips,
     from_stop: int,
-    services: Services,
+    trip_starts: TripStarts,
     time: int,
     transfer_time: int,
     pace: float,
@@ -353,7 +393,7 @@ def get_next_trips(
 
     for trip_id, from_seq, stop_departure in stops.get_stop_trips(from_stop):
         min_start = time + transfer_time - stop_departure
-        start = trips.get_next_start(trip_id, services, min_start)
+        start = trip_starts.get_next_start(trip_id, min_start)
 
         if start.time == INF_TIME:
             continue
@@ -6,19 +6,26 @@ from pathlib import Path
 from time import time
 from typing import Callable, Optional
 
-from .estimator import Estimator, euclidean_estimator
+from .estimator import Estimator, euclidean_estimator, manhattan_estimator
 from .estimators.cluster import cluster_estimator
+from .estimators.heurtable import heurtable_estimator
 from .estimators.knn import knn_estimator
+from .estimators.landmarks import landmark_estimator
 from .estimators.nn import nn_estimator, nn_ref_estimator
 from .utils import custom_print
 from transit.data.misc import Metadata, Point, Services
 from transit.data.routes import Routes
 from transit.data.shapes import Shapes
 from transit.data.stops import Stops
-from transit.data.trips import Trips
+from transit.data.trips import Trips, TripStarts
+from transit.datecache import DateCache
 from transit.osrm import OsrmClient
 from transit.prospector import Prospector, NearStop
+from transit.router import Router
+from transit.snapshot import load_snapshot
+from transit.tripbased import load_transfers
 from transit.transitdb import TransitDb
+from ebus.custom_settings.algorithm_settings import HEURISTIC_SETTINGS
 
 
 class Data:
@@ -29,10 +36,15 @@ class Data:
     stops: Stops
     trips: Trips
     prospector: Prospector
+    router: Router
     default_estimator: Estimator
     cluster_estimator: Optional[Estimator]
+    hourly_cluster_estimator: Optional[Estimator]
+    heurtable_estimator: Optional[Estimator]
     nn_estimator: Optional[Estimator]
     knn_estimator: Optional[Estimator]
+    landmark_estimator: Optional[Estimator]
+    estimators: dict[str, Optional[Estimator]]
 
     _instances = dict()
 
@@ -50,12 +62,20 @@ class Data:
         return ins
 
     def __init__(self, db_path: Path):
+        def aux_file(suffix):
+            return db_path.parent / db_path.name.replace(".db", suffix)
+
         self.tdb = TransitDb(db_path)
         self.md = self.tdb.get_metadata()
-        self.routes = self.tdb.get_routes()
-        self.shapes = self.tdb.get_shapes()
-        self.stops = self.tdb.get_stops()
-        self.trips = self.tdb.get_trips()
+        snapshot = load_snapshot(aux_file("-snapshot"))
+
+        if snapshot is not None:
+            self.routes, self.shapes, self.stops, self.trips = snapshot
+        else:
+            self.routes = self.tdb.get_routes()
+            self.shapes = self.tdb.get_shapes()
+            self.stops = self.tdb.get_stops()
+            self.trips = self.tdb.get_trips()
 
         var = f"OSRM_URL_{self.md.region}"
         osrm_url = os.environ.get(var, None)
@@ -70,19 +90,56 @@ class Data:
             self.stops,
         )
 
-        def aux_file(suffix):
-            return db_path.parent / db_path.name.replace(".db", suffix)
+        transfers_path = aux_file("-transfers.npy")
 
-        nn_path = aux_file(".tflite")
+        if transfers_path.exists():
+            transfers = load_transfers(transfers_path, self.trips)
+        else:
+            transfers = None
+
+        self.router = Router(
+            self.tdb,
+            stops=self.stops,
+            trips=self.trips,
+            starts=DateCache(8),
+            transfers=transfers,
+        )
+
+        nn_path = aux_file("-nn.npz")
         clustertimes_path = aux_file("-clustertimes.npy")
-        nn_ref_path = aux_file("-ref.tflite")
+        hourly_clustertimes_path = aux_file("-clustertimes-hourly.npy")
+        nn_ref_path = aux_file("-nn-ref.npz")
         knn_path = aux_file("-knn.pkl")
+        knn_grid_path = aux_file("-knn-grid.npy")
+        landmarks_path = aux_file("-landmarks.npz")
+        heurtable_path = aux_file("-heurtable.npy")
+
+        # NN models used to be loaded from TFLite, which needs exporting
+        tflite_only = {}
+
+        for name, tflite_suffix, path in [("nn", ".tflite", nn_path), ("nn-ref", "-ref.tflite", nn_ref_path)]:
+            if aux_file(tflite_suffix).exists() and not path.exists():
+                tflite_only[name] = (
+                    f"{aux_file(tflite_suffix).name} isn't used anymore, "
+                    f"export the model to {path.name} with deep_learning notebooks"
+                )
+                custom_print(f"Warning: {tflite_only[name]}")
 
         if clustertimes_path.exists():
             self.cluster_estimator = cluster_estimator(clustertimes_path)
         else:
             self.cluster_estimator = None
 
+        if hourly_clustertimes_path.exists():
+            self.hourly_cluster_estimator = cluster_estimator(hourly_clustertimes_path)
+        else:
+            self.hourly_cluster_estimator = None
+
+        if heurtable_path.exists():
+            self.heurtable_estimator = heurtable_estimator(heurtable_path, self.stops)
+        else:
+            self.heurtable_estimator = None
+
         if nn_path.exists():
             self.nn_estimator = nn_estimator(nn_path, self.stops)
         else:
@@ -97,18 +154,58 @@ class Data:
         else:
             self.nn_ref_estimator = None
 
-        if knn_path.exists():
-            self.knn_estimator = knn_estimator(knn_path, self.stops)
+        if knn_path.exists() and not knn_grid_path.exists():
+            custom_print(
+                f"Warning: {knn_grid_path.name} is missing, "
+                f"build it by running pipeline/knn.py again",
+            )
+
+        if knn_grid_path.exists():
+            self.knn_estimator = knn_estimator(knn_grid_path, self.stops)
         else:
             self.knn_estimator = None
 
-        self.default_estimator = (
-            self.nn_estimator
-            or self.nn_ref_estimator
-            or self.cluster_estimator
-            or euclidean_estimator
-        )
+        if landmarks_path.exists():
+            self.landmark_estimator = landmark_estimator(landmarks_path)
+        else:
+            self.landmark_estimator = None
+
+        self.estimators = {
+            "euclidean": euclidean_estimator,
+            "manhattan": manhattan_estimator,
+            "cluster": self.cluster_estimator,
+            "cluster-hourly": self.hourly_cluster_estimator,
+            "heurtable": self.heurtable_estimator,
+            "knn": self.knn_estimator,
+            "landmarks": self.landmark_estimator,
+            "nn": self.nn_estimator,
+            "nn-ref": self.nn_ref_estimator,
+        }
+
+        default_name = HEURISTIC_SETTINGS["DEFAULT_ESTIMATOR"]
+
+        # Without a setting, NN models are preferred, even ones left in TFLite
+        if default_name is None:
+            default_name = next(
+                (name for name in ["nn", "nn-ref"] if self.estimators[name] is not None or name in tflite_only),
+                None,
+            )
+
+        if default_name in tflite_only:
+            raise Exception(f"Data: default estimator '{default_name}' isn't available, {tflite_only[default_name]}")
+
+        if default_name is not None:
+            self.default_estimator = self.estimators.get(default_name)
+
+            if self.default_estimator is None:
+                raise Exception(f"Data: default estimator '{default_name}' isn't available")
+        else:
+            self.default_estimator = self.cluster_estimator or euclidean_estimator
 
     @lru_cache
     def services_around(self, date: datetime.date) -> Services:
         return self.tdb.get_services(date)
+
+    def starts_around(self, date: datetime.date) -> TripStarts:
+        # Shared with the router, so every date's table is built once
+        return self.router.get_starts(date)
@@ -2,7 +2,7 @@ import datetime
 import math
 import numba as nb
 import numpy as np
-from typing import Callable, NamedTuple
+from typing import Callable, NamedTuple, Optional
 
 from transit.data.misc import Point, DAY, INF_TIME
 from transit.data.stops import Stops
@@ -25,25 +25,67 @@ class Instant(NamedTuple):
             time -= DAY
             date += datetime.timedelta(days=1)
 
-        match date.weekday():
-            case 6:
-                dt = 2
-            case 5:
-                dt = 1
-            case _:
-                dt = 0
+        return cls(day_type(date), time)
 
-        return cls(dt, time)
+    @classmethod
+    def from_date_many(cls, date, times: np.ndarray):
+        """Instant of arrays of day types and times."""
+        next_day = times > DAY
+
+        return cls(
+            np.where(next_day, day_type(date + datetime.timedelta(days=1)), day_type(date)),
+            np.where(next_day, times - DAY, times),
+        )
+
+
+def day_type(date: datetime.date) -> int:
+    match date.weekday():
+        case 6:
+            return 2
+        case 5:
+            return 1
+        case _:
+            return 0
 
 
 class Estimator(NamedTuple):
     estimate: Callable[[Stops, Prospect, int, Instant], int]
     time_valid: int
 
+    # Estimates for array of stops at Instant of arrays, if supported
+    estimate_many: Optional[Callable[[Stops, Prospect, np.ndarray, Instant], np.ndarray]] = None
+
+
+def estimate_all(estimator: Estimator, stops: Stops, prospect: Prospect, stop_ids: np.ndarray, instants: Instant) -> np.ndarray:
+    if estimator.estimate_many is not None:
+        return estimator.estimate_many(stops, prospect, stop_ids, instants)
+
+    return np.array([
+        estimator.estimate(stops, prospect, stop_id, Instant(dt, time))
+        for stop_id, dt, time in zip(stop_ids.tolist(), *(i.tolist() for i in instants))
+    ])
+
+
+def jit_estimate_many(estimate):
+    """estimate_many calling estimate compiled by numba in a loop."""
+
+    @nb.jit
+    def estimate_many(stops, prospect, stop_ids, instants):
+        day_types, times = instants
+        result = np.empty(len(stop_ids), np.float64)
+
+        for i in range(len(stop_ids)):
+            result[i] = estimate(stops, prospect, stop_ids[i], Instant(day_types[i], times[i]))
+
+        return result
+
+    return estimate_many
+
 
 null_estimator = Estimator(
     estimate = lambda stops, prospect, from_stop, at_time: 0,
     time_valid = INF_TIME,
+    estimate_many = lambda stops, prospect, stop_ids, instants: np.zeros(len(stop_ids), np.int32),
 )
 
 
@@ -55,7 +97,7 @@ def distance_estimator(metric: Callable[[Point, Point], float]) -> Estimator:
         distance = metric(stops[from_stop].position, prospect.destination)
         return distance / max_speed
 
-    return Estimator(estimate, INF_TIME)
+    return Estimator(estimate, INF_TIME, jit_estimate_many(estimate))
 
 
 @nb.jit
@@ -7,8 +7,19 @@ from ebus.custom_settings.algorithm_settings import WALKING_SETTINGS
 
 
 def cluster_estimator(clustertimes: np.ndarray|Path) -> Estimator:
+  """
+  Estimator using travel times between clusters, either a timeless
+  [from_cluster, to_cluster] matrix or a [day_type, hour, from_cluster,
+  to_cluster] tensor from pipeline/clustertimes.py --hourly. Tensors are
+  memory-mapped when loaded from a file.
+  """
   if isinstance(clustertimes, Path):
-    clustertimes = np.load(clustertimes)
+    clustertimes = np.load(clustertimes, mmap_mode="r")
+
+  if clustertimes.ndim == 4:
+    return _hourly_cluster_estimator(clustertimes)
+
+  clustertimes = np.array(clustertimes)
 
   uwdm = WALKING_SETTINGS["DISTANCE_MULTIPLIER"]
   pace = WALKING_SETTINGS["PACE"]
@@ -25,4 +36,48 @@ def cluster_estimator(clustertimes: np.ndarray|Path) -> Estimator:
 
     return result
 
-  return Estimator(estimate, INF_TIME)
+  return Estimator(estimate, INF_TIME, jit_estimate_many(estimate))
+
+
+def _hourly_cluster_estimator(clustertimes: np.ndarray) -> Estimator:
+  uwdm = WALKING_SETTINGS["DISTANCE_MULTIPLIER"]
+  pace = WALKING_SETTINGS["PACE"]
+  hours = clustertimes.shape[1]
+
+  # Unlike the matrix, the tensor is passed as an argument rather than
+  # captured, so numba doesn't copy it into compiled code
+  def estimate(stops, prospect, from_stop, at_time):
+    day_type, time = at_time
+    hour = time * hours // DAY % hours
+    return _estimate_hourly(clustertimes[day_type, hour], uwdm, pace, stops, prospect, from_stop)
+
+  def estimate_many(stops, prospect, stop_ids, instants):
+    day_types, times = instants
+    return _estimate_hourly_many(clustertimes, uwdm, pace, stops, prospect, stop_ids, day_types, times)
+
+  return Estimator(estimate, DAY // hours // 2, estimate_many)
+
+
+@nb.jit
+def _estimate_hourly(clustertimes, uwdm, pace, stops, prospect, from_stop):
+  a = stops[from_stop]
+  result = nb.int32(euclidean_metric(a.position, prospect.destination) * uwdm / pace)
+
+  for near in prospect.near_destination:
+    b = stops[near.id]
+    ct = clustertimes[a.cluster, b.cluster]
+    result = min(result, nb.int32(ct + nb.int32(near.walk_distance / pace)))
+
+  return result
+
+
+@nb.jit
+def _estimate_hourly_many(clustertimes, uwdm, pace, stops, prospect, stop_ids, day_types, times):
+  hours = clustertimes.shape[1]
+  result = np.empty(len(stop_ids), np.int32)
+
+  for i in range(len(stop_ids)):
+    hour = times[i] * hours // DAY % hours
+    result[i] = _estimate_hourly(clustertimes[day_types[i], hour], uwdm, pace, stops, prospect, stop_ids[i])
+
+  return result
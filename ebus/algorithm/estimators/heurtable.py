@@ -0,0 +1,77 @@
+import numba as nb
+import numpy as np
+from pathlib import Path
+
+from algorithm.estimator import *
+from ebus.custom_settings.algorithm_settings import WALKING_SETTINGS
+from transit.data.stops import Stops
+
+
+CELL_SIZE = 1000 # Side of destination cells (meters)
+UNKNOWN = np.iinfo(np.uint16).max
+
+
+def heurtable_grid(stops: Stops) -> tuple[float, float, int, int]:
+  """Grid of destination cells covering all stops, as (x0, y0, columns, rows)."""
+  x0 = float(np.min(stops.xs))
+  y0 = float(np.min(stops.ys))
+  columns = int((np.max(stops.xs) - x0) // CELL_SIZE) + 1
+  rows = int((np.max(stops.ys) - y0) // CELL_SIZE) + 1
+  return x0, y0, columns, rows
+
+
+def heurtable_estimator(table: np.ndarray|Path, stops: Stops) -> Estimator:
+  """
+  Estimator looking travel times up in a [day_type, time_bucket, from_stop,
+  cell] table of minutes from pipeline/heurtable.py, memory-mapped when loaded
+  from a file. Destinations outside the grid or unreachable cells are
+  estimated as walks.
+  """
+  if isinstance(table, Path):
+    table = np.load(table, mmap_mode="r")
+
+  x0, y0, columns, rows = heurtable_grid(stops)
+  uwdm = WALKING_SETTINGS["DISTANCE_MULTIPLIER"]
+  pace = WALKING_SETTINGS["PACE"]
+  buckets = table.shape[1]
+
+  # Like the hourly cluster tensor, the table is passed as an argument so
+  # numba doesn't copy it into compiled code
+  def estimate(stops, prospect, from_stop, at_time):
+    day_type, time = at_time
+    return _lookup(table, x0, y0, columns, rows, uwdm, pace, stops, prospect, from_stop, day_type, time)
+
+  def estimate_many(stops, prospect, stop_ids, instants):
+    day_types, times = instants
+    return _lookup_many(table, x0, y0, columns, rows, uwdm, pace, stops, prospect, stop_ids, day_types, times)
+
+  return Estimator(estimate, DAY // buckets // 2, estimate_many)
+
+
+@nb.jit
+def _lookup(table, x0, y0, columns, rows, uwdm, pace, stops, prospect, from_stop, day_type, time):
+  a = stops[from_stop]
+  walk = nb.int32(euclidean_metric(a.position, prospect.destination) * uwdm / pace)
+  column = int((prospect.destination.x - x0) // CELL_SIZE)
+  row = int((prospect.destination.y - y0) // CELL_SIZE)
+
+  if column < 0 or column >= columns or row < 0 or row >= rows:
+    return walk
+
+  buckets = table.shape[1]
+  minutes = table[day_type, time * buckets // DAY % buckets, from_stop, row * columns + column]
+
+  if minutes == UNKNOWN:
+    return walk
+
+  return min(walk, nb.int32(minutes) * 60)
+
+
+@nb.jit
+def _lookup_many(table, x0, y0, columns, rows, uwdm, pace, stops, prospect, stop_ids, day_types, times):
+  result = np.empty(len(stop_ids), np.int32)
+
+  for i in range(len(stop_ids)):
+    result[i] = _lookup(table, x0, y0, columns, rows, uwdm, pace, stops, prospect, stop_ids[i], day_types[i], times[i])
+
+  return result
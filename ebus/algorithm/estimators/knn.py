@@ -1,41 +1,139 @@
 import numba as nb
 import numpy as np
 from pathlib import Path
-from sklearn.neighbors import KNeighborsRegressor
+from sklearn.neighbors import KDTree, KNeighborsRegressor
 import pickle
 
 from algorithm.estimator import *
 from transit.data.stops import Stops
 
 
-def knn_estimator(knn: KNeighborsRegressor|Path, stops: Stops) -> Estimator:
+CELL_SIZE = 1000 # Side of destination cells (meters)
+TIME_BUCKETS = 24
+DAY_TYPES = 3
+QUERY_BATCH = 100_000
+MAX_TIME = np.iinfo(np.uint16).max # Longer times are clamped to it
+
+
+def knn_estimator(grid: np.ndarray|Path, stops: Stops) -> Estimator:
+  """
+  Estimator looking travel times up in a [day_type, time_bucket, from_stop,
+  to_cell] table of seconds from save_knn_grid, memory-mapped when loaded
+  from a file. Destinations in cells without stops use the nearest cell with
+  them, and ones outside the grid are clamped to its edge.
+  """
+  if isinstance(grid, Path):
+    grid = np.load(grid, mmap_mode="r")
+
+  x0, y0, columns, rows = knn_grid(stops)
+  _, cell_indices = _get_cell_indices(stops, x0, y0, columns, rows)
+
+  # Like the hourly cluster tensor, the grid is passed as an argument so numba
+  # doesn't copy it into compiled code
+  def estimate(stops, prospect, from_stop, at_time):
+    day_type, time = at_time
+    return _lookup(grid, cell_indices, x0, y0, columns, rows, prospect, from_stop, day_type, time)
+
+  def estimate_many(stops, prospect, stop_ids, instants):
+    day_types, times = instants
+    return _lookup_many(grid, cell_indices, x0, y0, columns, rows, prospect, stop_ids, day_types, times)
+
+  return Estimator(estimate, 0, estimate_many)
+
+
+def knn_grid(stops: Stops) -> tuple[float, float, int, int]:
+  """Grid of destination cells covering all stops, as (x0, y0, columns, rows)."""
+  x0 = float(np.min(stops.xs))
+  y0 = float(np.min(stops.ys))
+  columns = int((np.max(stops.xs) - x0) // CELL_SIZE) + 1
+  rows = int((np.max(stops.ys) - y0) // CELL_SIZE) + 1
+  return x0, y0, columns, rows
+
+
+def save_knn_grid(knn: KNeighborsRegressor|Path, file: Path, stops: Stops):
+  """
+  Queries KNN model from pipeline/knn.py for the shortest neighbour time from
+  every stop to centers of cells containing stops, for every day type and
+  hour, and saves them for knn_estimator. The table is written next to the
+  target and renamed, so readers never see a partial one.
+  """
   if isinstance(knn, Path):
-    with knn.open("rb") as file:
-      knn = pickle.load(file)
+    with knn.open("rb") as f:
+      knn = pickle.load(f)
 
   assert isinstance(knn, KNeighborsRegressor)
+  x0, y0, columns, rows = knn_grid(stops)
+  kept_cells, _ = _get_cell_indices(stops, x0, y0, columns, rows)
   x_scale = 1 / np.std(stops.xs)
   y_scale = 1 / np.std(stops.ys)
-  time_scale = 1 / (24*60*60)
+  to_xs = (x0 + (kept_cells % columns + 0.5) * CELL_SIZE) * x_scale
+  to_ys = (y0 + (kept_cells // columns + 0.5) * CELL_SIZE) * y_scale
+  froms = np.repeat(np.arange(stops.count()), len(kept_cells))
+  tos = np.tile(np.arange(len(kept_cells)), stops.count())
 
-  def estimate(stops, prospect, from_stop, at_time):
-    from_x, from_y = stops[from_stop].position
-    to_x, to_y = prospect.destination
-    day_type, start_time = at_time
-
-    inputs = np.array(
-      [[
-        from_x * x_scale,
-        from_y * y_scale,
-        to_x * x_scale,
-        to_y * y_scale,
-        day_type,
-        start_time * time_scale,
-      ]],
-      dtype=np.float32,
-    )
-
-    indices = knn.kneighbors(inputs, return_distance=False)[0]
-    return knn._y[indices].min()
-
-  return Estimator(estimate, 0)
+  tmp = file.with_name(file.name + ".tmp")
+
+  grid = np.lib.format.open_memmap(
+    tmp,
+    mode="w+",
+    dtype=np.uint16,
+    shape=(DAY_TYPES, TIME_BUCKETS, stops.count(), len(kept_cells)),
+  )
+
+  flat = grid.reshape((DAY_TYPES, TIME_BUCKETS, len(tos)))
+
+  for day_type in range(DAY_TYPES):
+    for bucket in range(TIME_BUCKETS):
+      time = (bucket + 0.5) / TIME_BUCKETS
+
+      for start in range(0, len(tos), QUERY_BATCH):
+        end = start + QUERY_BATCH
+        count = len(tos[start:end])
+
+        # Inputs in the same order and scale as in pipeline/dataset.py
+        inputs = np.column_stack((
+          stops.xs[froms[start:end]] * x_scale,
+          stops.ys[froms[start:end]] * y_scale,
+          to_xs[tos[start:end]],
+          to_ys[tos[start:end]],
+          np.full(count, day_type),
+          np.full(count, time),
+        )).astype(np.float32)
+
+        indices = knn.kneighbors(inputs, return_distance=False)
+        times = knn._y[indices].min(axis=1)
+        flat[day_type, bucket, start:end] = np.clip(times, 0, MAX_TIME)
+
+  grid.flush()
+  del flat, grid
+  tmp.rename(file)
+
+
+def _get_cell_indices(stops, x0, y0, columns, rows):
+  """Cells containing stops, and index of the nearest of them for every cell."""
+  stop_columns = np.clip((stops.xs - x0) // CELL_SIZE, 0, columns - 1).astype(np.int32)
+  stop_rows = np.clip((stops.ys - y0) // CELL_SIZE, 0, rows - 1).astype(np.int32)
+  kept_cells = np.unique(stop_rows * columns + stop_columns)
+  cells = np.arange(columns * rows)
+  tree = KDTree(np.column_stack((kept_cells % columns, kept_cells // columns)))
+  _, nearest = tree.query(np.column_stack((cells % columns, cells // columns)), k=1)
+  return kept_cells, nearest[:, 0].astype(np.int32)
+
+
+@nb.jit(nogil=True)
+def _lookup(grid, cell_indices, x0, y0, columns, rows, prospect, from_stop, day_type, time):
+  column = min(max(int((prospect.destination.x - x0) // CELL_SIZE), 0), columns - 1)
+  row = min(max(int((prospect.destination.y - y0) // CELL_SIZE), 0), rows - 1)
+  bucket = time * TIME_BUCKETS // DAY % TIME_BUCKETS
+  to_index = cell_indices[row * columns + column]
+  return nb.int32(grid[day_type, bucket, from_stop, to_index])
+
+
+@nb.jit(nogil=True)
+def _lookup_many(grid, cell_indices, x0, y0, columns, rows, prospect, stop_ids, day_types, times):
+  result = np.empty(len(stop_ids), np.int32)
+
+  for i in range(len(stop_ids)):
+    result[i] = _lookup(grid, cell_indices, x0, y0, columns, rows, prospect, stop_ids[i], day_types[i], times[i])
+
+  return result
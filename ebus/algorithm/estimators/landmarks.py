@@ -0,0 +1,65 @@
+import numba as nb
+import numpy as np
+from pathlib import Path
+
+from algorithm.estimator import *
+from ebus.custom_settings.algorithm_settings import WALKING_SETTINGS
+from transit.params import TRANSFER_TIME
+
+
+def landmark_estimator(landmarks: Path) -> Estimator:
+  """
+  ALT estimator: by triangle inequality, travel time from s to t is at least
+  d(L, t) - d(L, s) and d(s, L) - d(t, L) for every landmark L, with timeless
+  travel times from and to landmarks precomputed by pipeline/landmarks.py.
+  """
+  with np.load(landmarks) as file:
+    forward = np.ascontiguousarray(file["forward"], np.int32)
+    backward = np.ascontiguousarray(file["backward"], np.int32)
+
+  uwdm = WALKING_SETTINGS["DISTANCE_MULTIPLIER"]
+  pace = WALKING_SETTINGS["PACE"]
+
+  # Like the hourly cluster tensor, landmark times are passed as arguments so
+  # numba doesn't copy them into compiled code
+  def estimate(stops, prospect, from_stop, at_time):
+    return _estimate(forward, backward, uwdm, pace, stops, prospect, from_stop)
+
+  def estimate_many(stops, prospect, stop_ids, instants):
+    return _estimate_many(forward, backward, uwdm, pace, stops, prospect, stop_ids)
+
+  return Estimator(estimate, INF_TIME, estimate_many)
+
+
+@nb.jit
+def _estimate(forward, backward, uwdm, pace, stops, prospect, from_stop):
+  a = stops[from_stop]
+  result = nb.int32(euclidean_metric(a.position, prospect.destination) * uwdm / pace)
+
+  for near in prospect.near_destination:
+    to_stop = near.id
+    bound = TRANSFER_TIME
+
+    for l in range(len(forward)):
+      if forward[l, from_stop] != INF_TIME and forward[l, to_stop] != INF_TIME:
+        bound = max(bound, forward[l, to_stop] - forward[l, from_stop])
+
+      if backward[l, from_stop] != INF_TIME and backward[l, to_stop] != INF_TIME:
+        bound = max(bound, backward[l, from_stop] - backward[l, to_stop])
+
+    # Timeless searches don't add transfer time for the first trip, so the
+    # triangle inequality only holds up to one transfer time
+    bound -= TRANSFER_TIME
+    result = min(result, nb.int32(bound + nb.int32(near.walk_distance / pace)))
+
+  return result
+
+
+@nb.jit
+def _estimate_many(forward, backward, uwdm, pace, stops, prospect, stop_ids):
+  result = np.empty(len(stop_ids), np.int32)
+
+  for i in range(len(stop_ids)):
+    result[i] = _estimate(forward, backward, uwdm, pace, stops, prospect, stop_ids[i])
+
+  return result
@@ -1,52 +1,42 @@
-import time
 import math
 import numba as nb
 import numpy as np
 from pathlib import Path
-from typing import Callable
 
 from algorithm.estimator import *
-from transit.data.misc import INF_TIME, Point
+from transit.data.misc import INF_TIME
 from transit.data.stops import Stops
 
-try:
-  from ai_edge_litert.interpreter import Interpreter
-except:
-  from tensorflow.lite.python.interpreter import Interpreter
 
+LINEAR = 0
+RELU = 1
+EXPONENTIAL = 2
 
-def nn_estimator(file: Path, stops: Stops) -> Estimator:
-  interpreter = Interpreter(model_content=file.read_bytes())
-  in_idx = interpreter.get_input_details()[0]["index"]
-  out_idx = interpreter.get_output_details()[0]["index"]
+ACTIVATIONS = {
+  "linear": LINEAR,
+  "relu": RELU,
+  "exponential": EXPONENTIAL,
+}
 
-  interpreter.resize_tensor_input(in_idx, (1, 6))
-  interpreter.allocate_tensors()
 
+def nn_estimator(file: Path, stops: Stops) -> Estimator:
+  params, layers = load_mlp(file)
   x_scale = 1 / np.std(stops.xs)
   y_scale = 1 / np.std(stops.ys)
   time_scale = 1 / (24*60*60)
 
+  @nb.jit
   def estimate(stops, prospect, from_stop, at_time):
-    from_x, from_y = stops[from_stop].position
-    to_x, to_y = prospect.destination
     day_type, start_time = at_time
+    inputs = np.empty(6, np.float32)
+    inputs[0] = stops.xs[from_stop] * x_scale
+    inputs[1] = stops.ys[from_stop] * y_scale
+    inputs[2] = prospect.destination.x * x_scale
+    inputs[3] = prospect.destination.y * y_scale
+    inputs[4] = day_type
+    inputs[5] = start_time * time_scale
 
-    inputs = np.array(
-      [[
-        from_x * x_scale,
-        from_y * y_scale,
-        to_x * x_scale,
-        to_y * y_scale,
-        day_type,
-        start_time * time_scale,
-      ]],
-      dtype=np.float32,
-    )
-
-    interpreter.set_tensor(in_idx, inputs)
-    interpreter.invoke()
-    output = interpreter.get_tensor(out_idx)[0, 0]
+    output = mlp_forward(params, layers, inputs)[0]
 
     if output < 0 or math.isnan(output):
       return 0
@@ -55,44 +45,83 @@ def nn_estimator(file: Path, stops: Stops) -> Estimator:
     else:
       return int(output)
 
-  return Estimator(estimate, 0)
+  return Estimator(estimate, 0, jit_estimate_many(estimate))
 
 
 def nn_ref_estimator(file: Path, stops: Stops, reference: Estimator) -> Estimator:
-  interpreter = Interpreter(model_content=file.read_bytes())
-  in_idx = interpreter.get_input_details()[0]["index"]
-  out_idx = interpreter.get_output_details()[0]["index"]
-
-  interpreter.resize_tensor_input(in_idx, (1, 7))
-  interpreter.allocate_tensors()
-
+  """
+  Estimator correcting a reference one. The network gives a relative and an
+  absolute (in 15 minutes) correction of the reference estimate.
+  """
+  params, layers = load_mlp(file)
   x_scale = 1 / np.std(stops.xs)
   y_scale = 1 / np.std(stops.ys)
   time_scale = 1 / (24*60*60)
   reference = reference.estimate
 
+  @nb.jit
   def estimate(stops, prospect, from_stop, at_time):
-    from_x, from_y = stops[from_stop].position
-    to_x, to_y = prospect.destination
     day_type, start_time = at_time
     ref = reference(stops, prospect, from_stop, at_time)
-
-    inputs = np.array(
-      [[
-        from_x * x_scale,
-        from_y * y_scale,
-        to_x * x_scale,
-        to_y * y_scale,
-        day_type,
-        start_time * time_scale,
-        ref,
-      ]],
-      dtype=np.float32,
-    )
-
-    interpreter.set_tensor(in_idx, inputs)
-    interpreter.invoke()
-    output = interpreter.get_tensor(out_idx)[0]
+    inputs = np.empty(6, np.float32)
+    inputs[0] = stops.xs[from_stop] * x_scale
+    inputs[1] = stops.ys[from_stop] * y_scale
+    inputs[2] = prospect.destination.x * x_scale
+    inputs[3] = prospect.destination.y * y_scale
+    inputs[4] = day_type
+    inputs[5] = start_time * time_scale
+
+    mods = mlp_forward(params, layers, inputs)
+    output = ref * (1 + mods[0]) + 15 * 60 * mods[1]
     return int(0.8*output + 0.2*ref)
 
-  return Estimator(estimate, 0)
+  return Estimator(estimate, 0, jit_estimate_many(estimate))
+
+
+def load_mlp(file: Path) -> tuple[np.ndarray, np.ndarray]:
+  """
+  Loads dense network saved by deep_learning notebooks as kernel_i and bias_i
+  of every layer and names of their activations. Returns parameters of all
+  layers in one array, and (inputs, outputs, offset, activation) of each layer.
+  """
+  with np.load(file) as f:
+    activations = [str(a) for a in f["activations"]]
+    kernels = [f[f"kernel_{i}"] for i in range(len(activations))]
+    biases = [f[f"bias_{i}"] for i in range(len(activations))]
+
+  params = []
+  layers = np.empty((len(activations), 4), np.int32)
+  offset = 0
+
+  for i, (kernel, bias, activation) in enumerate(zip(kernels, biases, activations)):
+    layers[i] = (kernel.shape[0], kernel.shape[1], offset, ACTIVATIONS[activation])
+    params += [kernel.ravel(), bias]
+    offset += kernel.size + bias.size
+
+  return np.concatenate(params).astype(np.float32), layers
+
+
+@nb.jit(nogil=True)
+def mlp_forward(params: np.ndarray, layers: np.ndarray, inputs: np.ndarray) -> np.ndarray:
+  x = inputs
+
+  for l in range(len(layers)):
+    n_in, n_out, offset, activation = layers[l]
+    biases = offset + n_in * n_out
+    y = params[biases:biases + n_out].copy()
+
+    for i in range(n_in):
+      if x[i] != 0:
+        row = offset + i * n_out
+
+        for j in range(n_out):
+          y[j] += x[i] * params[row + j]
+
+    if activation == RELU:
+      y = np.maximum(y, 0)
+    elif activation == EXPONENTIAL:
+      y = np.exp(y)
+
+    x = y
+
+  return x
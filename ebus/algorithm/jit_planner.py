@@ -0,0 +1,703 @@
+import datetime
+import numba as nb
+from numba.core.dispatcher import Dispatcher
+from numba.experimental import jitclass
+import numba.types as nbt
+import numpy as np
+import time
+
+from .astar_planner import get_next_trips
+from .data import Data
+from .estimator import Estimator, Instant
+from .plan import Plan, PlanArena, PlanTrip
+from .preferences import *
+from .utils import *
+from ebus.custom_settings.algorithm_settings import *
+from transit.data.misc import Coords, Delays, DAY, INF_TIME, grow
+from transit.data.stops import Stops
+from transit.data.trips import Trips, TripStarts
+from transit.prospector import Prospect
+
+
+WALK_TIME_PENALTY = INCONVENIENCE_SETTINGS["WALK_TIME_PENALTY"]
+WAIT_TIME_PENALTY = INCONVENIENCE_SETTINGS["WAIT_TIME_PENALTY"]
+TRANSFER_PENALTY = INCONVENIENCE_SETTINGS["TRANSFER_PENALTY"]
+RELATIVE_DIFFERENCE = ALTERNATIVE_PLAN_SETTINGS["ALLOWED_RELATIVE_DIFFERENCE"]
+ABSOLUTE_DIFFERENCE = ALTERNATIVE_PLAN_SETTINGS["ALLOWED_ABSOLUTE_DIFFERENCE"]
+DISTANCE_MULTIPLIER = WALKING_SETTINGS["DISTANCE_MULTIPLIER"]
+
+# (score, inconvenience, plan)
+_NB_QUEUE_ITEM_TYPE = nbt.Tuple((nb.float64, nb.int64, nb.int64))
+
+
+# Same as heapq, but plans are compared only by score, like Plan.__lt__, so
+# plans with equal scores are popped in the same order as in AStarPlanner
+@nb.jit
+def _before(a, b) -> bool:
+    return (a[0], a[1]) < (b[0], b[1])
+
+
+@nb.jit
+def _heappush(heap, item):
+    heap.append(item)
+    _siftdown(heap, 0, len(heap) - 1)
+
+
+@nb.jit
+def _heappop(heap):
+    lastelt = heap.pop()
+
+    if len(heap) == 0:
+        return lastelt
+
+    returnitem = heap[0]
+    heap[0] = lastelt
+    _siftup(heap, 0)
+    return returnitem
+
+
+@nb.jit
+def _siftdown(heap, startpos, pos):
+    newitem = heap[pos]
+
+    while pos > startpos:
+        parentpos = (pos - 1) >> 1
+        parent = heap[parentpos]
+
+        if _before(newitem, parent):
+            heap[pos] = parent
+            pos = parentpos
+        else:
+            break
+
+    heap[pos] = newitem
+
+
+@nb.jit
+def _siftup(heap, pos):
+    endpos = len(heap)
+    startpos = pos
+    newitem = heap[pos]
+    childpos = 2 * pos + 1
+
+    while childpos < endpos:
+        rightpos = childpos + 1
+
+        if rightpos < endpos and not _before(heap[childpos], heap[rightpos]):
+            childpos = rightpos
+
+        heap[pos] = heap[childpos]
+        pos = childpos
+        childpos = 2 * pos + 1
+
+    heap[pos] = newitem
+    _siftdown(heap, startpos, pos)
+
+
+@nb.jit
+def _contains_all(items: np.ndarray, subset: np.ndarray) -> bool:
+    """Whether sorted items contain all of subset."""
+    for item in subset:
+        i = np.searchsorted(items, item)
+
+        if i == len(items) or items[i] != item:
+            return False
+
+    return True
+
+
+@jitclass([
+    ("stop_count", nb.int32),
+    ("pace", nb.float64),
+    ("max_stop_walk", nb.int64),
+    ("transfer_time", nb.int32),
+    ("time_valid", nb.int64),
+    ("today_type", nb.int64),
+    ("tomorrow_type", nb.int64),
+
+    # Plans, each one holding its last trip and the index of the plan holding
+    # the trips before it
+    ("size", nb.int32),
+    ("parents", nb.int32[:]),
+    ("trip_counts", nb.int32[:]),
+    ("stop_ids", nb.int32[:]),
+    ("times", nb.int32[:]),
+    ("start_times", nb.int32[:]),
+    ("inconveniences", nb.int64[:]),
+    ("initial_walks", nb.int32[:]),
+    ("generations", nb.int32[:]),
+    ("travel_times", nb.float64[:]),
+    ("walk_times", nb.int32[:]),
+    ("superseded", nb.bool_[:]),
+    ("from_stops", nb.int32[:]),
+    ("departures", nb.int32[:]),
+    ("to_stops", nb.int32[:]),
+    ("arrivals", nb.int32[:]),
+    ("trip_ids", nb.int32[:]),
+    ("service_ids", nb.int32[:]),
+    ("trip_starts", nb.int32[:]),
+
+    ("queue", nbt.ListType(_NB_QUEUE_ITEM_TYPE)),
+    ("best", nbt.DictType(nb.int64, nb.int32)),
+    ("stop_walk_times", nb.int32[:]),
+    ("estimates", nb.float64[:]),
+    ("estimates_at", nb.int64[:]),
+    ("estimated", nb.bool_[:]),
+    ("visited", nb.bool_[:]),
+    ("used_trips", nbt.ListType(nb.int64[:])),
+    ("last_found", nb.int32),
+    ("shortest_time", nb.int64),
+
+    ("iterations", nb.int64),
+    ("unique_stops_visited", nb.int64),
+    ("plans_queue_max_size", nb.int64),
+    ("walking_expansions_total", nb.int64),
+    ("transit_expansions_total", nb.int64),
+])
+class PlannerState:
+    """
+    State of JitAStarPlanner. Plans are stored in growable arrays, and refer to
+    plans they were extended from by index, so extending one doesn't copy its
+    trips.
+    """
+
+    def __init__(self, stop_count, pace, max_stop_walk, transfer_time, time_valid, today_type, tomorrow_type):
+        self.stop_count = stop_count
+        self.pace = pace
+        self.max_stop_walk = max_stop_walk
+        self.transfer_time = transfer_time
+        self.time_valid = time_valid
+        self.today_type = today_type
+        self.tomorrow_type = tomorrow_type
+
+        self.size = 0
+        self.parents = np.empty(0, np.int32)
+        self.trip_counts = np.empty(0, np.int32)
+        self.stop_ids = np.empty(0, np.int32)
+        self.times = np.empty(0, np.int32)
+        self.start_times = np.empty(0, np.int32)
+        self.inconveniences = np.empty(0, np.int64)
+        self.initial_walks = np.empty(0, np.int32)
+        self.generations = np.empty(0, np.int32)
+        self.travel_times = np.empty(0, np.float64)
+        self.walk_times = np.empty(0, np.int32)
+        self.superseded = np.empty(0, np.bool_)
+        self.from_stops = np.empty(0, np.int32)
+        self.departures = np.empty(0, np.int32)
+        self.to_stops = np.empty(0, np.int32)
+        self.arrivals = np.empty(0, np.int32)
+        self.trip_ids = np.empty(0, np.int32)
+        self.service_ids = np.empty(0, np.int32)
+        self.trip_starts = np.empty(0, np.int32)
+
+        self.queue = nb.typed.List.empty_list(_NB_QUEUE_ITEM_TYPE)
+        self.best = nb.typed.Dict.empty(nb.int64, nb.int32)
+        self.stop_walk_times = np.full(stop_count, -1, np.int32)
+        self.estimates = np.empty(stop_count, np.float64)
+        self.estimates_at = np.zeros(stop_count, np.int64)
+        self.estimated = np.zeros(stop_count, np.bool_)
+        self.visited = np.zeros(stop_count, np.bool_)
+        self.used_trips = nb.typed.List.empty_list(nb.int64[:])
+        self.last_found = -1
+        self.shortest_time = INF_TIME
+
+        self.iterations = 0
+        self.unique_stops_visited = 0
+        self.plans_queue_max_size = 0
+        self.walking_expansions_total = 0
+        self.transit_expansions_total = 0
+
+
+    def allocate(self) -> int:
+        if self.size == len(self.parents):
+            self.parents = grow(self.parents)
+            self.trip_counts = grow(self.trip_counts)
+            self.stop_ids = grow(self.stop_ids)
+            self.times = grow(self.times)
+            self.start_times = grow(self.start_times)
+            self.inconveniences = grow(self.inconveniences)
+            self.initial_walks = grow(self.initial_walks)
+            self.generations = grow(self.generations)
+            self.travel_times = grow(self.travel_times)
+            self.walk_times = grow(self.walk_times)
+            self.superseded = grow(self.superseded)
+            self.from_stops = grow(self.from_stops)
+            self.departures = grow(self.departures)
+            self.to_stops = grow(self.to_stops)
+            self.arrivals = grow(self.arrivals)
+            self.trip_ids = grow(self.trip_ids)
+            self.service_ids = grow(self.service_ids)
+            self.trip_starts = grow(self.trip_starts)
+
+        plan = self.size
+        self.size += 1
+        self.travel_times[plan] = INF_TIME
+        self.walk_times[plan] = INF_TIME
+        self.superseded[plan] = False
+        return plan
+
+
+    def copy_trips(self, plan, source, parent, trip_count):
+        self.parents[plan] = parent
+        self.trip_counts[plan] = trip_count
+        self.from_stops[plan] = self.from_stops[source]
+        self.departures[plan] = self.departures[source]
+        self.to_stops[plan] = self.to_stops[source]
+        self.arrivals[plan] = self.arrivals[source]
+        self.trip_ids[plan] = self.trip_ids[source]
+        self.service_ids[plan] = self.service_ids[source]
+        self.trip_starts[plan] = self.trip_starts[source]
+
+
+    def initial(self, stop_id, start_time, initial_walk, generation) -> int:
+        """Equivalent of Plan.initial."""
+        plan = self.allocate()
+        self.parents[plan] = -1
+        self.trip_counts[plan] = 0
+        self.stop_ids[plan] = stop_id
+        self.times[plan] = start_time + initial_walk
+        self.start_times[plan] = start_time
+        self.inconveniences[plan] = int(initial_walk * WALK_TIME_PENALTY)
+        self.initial_walks[plan] = initial_walk
+        self.generations[plan] = generation
+        return plan
+
+
+    def extend(self, source, plan_trip) -> int:
+        """Equivalent of Plan.extend."""
+        inconvenience = self.inconveniences[source]
+        initial_walk = self.initial_walks[source]
+        has_trips = self.trip_counts[source] > 0
+
+        if plan_trip.trip_id == -1:
+            if not has_trips:
+                return self.initial(
+                    plan_trip.to_stop,
+                    self.times[source] - initial_walk,
+                    plan_trip.arrival_time - plan_trip.departure_time + initial_walk,
+                    0,
+                )
+
+            walk_time = plan_trip.arrival_time - plan_trip.departure_time
+            inconvenience += int(walk_time * WALK_TIME_PENALTY)
+
+            if self.trip_ids[source] == -1:
+                plan = self.allocate()
+                self.copy_trips(plan, source, self.parents[source], self.trip_counts[source])
+                self.to_stops[plan] = plan_trip.to_stop
+                self.arrivals[plan] = plan_trip.arrival_time
+                self.stop_ids[plan] = plan_trip.to_stop
+                self.times[plan] = plan_trip.arrival_time
+                self.start_times[plan] = self.start_times[source]
+                self.inconveniences[plan] = inconvenience
+                self.initial_walks[plan] = initial_walk
+                self.generations[plan] = self.generations[source]
+                return plan
+        elif has_trips:
+            inconvenience += TRANSFER_PENALTY
+            wait_time = plan_trip.departure_time - self.arrivals[source]
+            inconvenience += int(wait_time * WAIT_TIME_PENALTY)
+
+        plan = self.allocate()
+        self.parents[plan] = source
+        self.trip_counts[plan] = self.trip_counts[source] + 1
+        self.from_stops[plan] = plan_trip.from_stop
+        self.departures[plan] = plan_trip.departure_time
+        self.to_stops[plan] = plan_trip.to_stop
+        self.arrivals[plan] = plan_trip.arrival_time
+        self.trip_ids[plan] = plan_trip.trip_id
+        self.service_ids[plan] = plan_trip.service_id
+        self.trip_starts[plan] = plan_trip.trip_start
+        self.stop_ids[plan] = plan_trip.to_stop
+        self.times[plan] = plan_trip.arrival_time
+        self.inconveniences[plan] = inconvenience
+        self.initial_walks[plan] = initial_walk
+        self.generations[plan] = self.generations[source]
+
+        if has_trips:
+            self.start_times[plan] = self.start_times[source]
+        else:
+            self.start_times[plan] = plan_trip.departure_time - initial_walk
+
+        return plan
+
+
+    def extend_to_destination(self, source) -> int:
+        plan = self.allocate()
+        self.copy_trips(plan, source, self.parents[source], self.trip_counts[source])
+        self.stop_ids[plan] = self.stop_ids[source]
+        self.times[plan] = self.times[source] + self.walk_times[source]
+
+        # Like Plan.start_time, which only subtracts initial walk without trips
+        if self.trip_counts[source] == 0:
+            self.start_times[plan] = self.times[plan] - self.initial_walks[source]
+        else:
+            self.start_times[plan] = self.start_times[source]
+
+        self.inconveniences[plan] = self.inconveniences[source] + self.walk_times[source] * WALK_TIME_PENALTY
+        self.initial_walks[plan] = self.initial_walks[source]
+        self.generations[plan] = self.generations[source]
+        self.travel_times[plan] = 0
+        self.walk_times[plan] = 0
+        return plan
+
+
+    def register(self, plan) -> bool:
+        """
+        Equivalent of DiscoveredStop.register_plan. Rejected plan is freed, so
+        it has to be the last one allocated.
+        """
+        key = nb.int64(self.generations[plan]) * self.stop_count + self.stop_ids[plan]
+
+        if key not in self.best:
+            self.best[key] = nb.int32(plan)
+            return True
+
+        prev = self.best[key]
+
+        if (self.times[plan], self.inconveniences[plan]) < (self.times[prev], self.inconveniences[prev]):
+            self.best[key] = nb.int32(plan)
+            self.superseded[prev] = True
+            return True
+
+        self.size -= 1
+        return False
+
+
+    def push(self, plan):
+        score = self.times[plan] + self.travel_times[plan]
+        _heappush(self.queue, (nb.float64(score), self.inconveniences[plan], nb.int64(plan)))
+
+
+    def get_walk_time(self, stops, prospect, stop_id) -> int:
+        wt = self.stop_walk_times[stop_id]
+
+        if wt == -1:
+            dx = stops.xs[stop_id] - prospect.destination.x
+            dy = stops.ys[stop_id] - prospect.destination.y
+            distance = np.sqrt(dx*dx + dy*dy)
+            wt = int(distance * DISTANCE_MULTIPLIER / self.pace)
+            self.stop_walk_times[stop_id] = wt
+
+        return wt
+
+
+    def get_trips(self, plan) -> np.ndarray:
+        """Trips of plan as rows of PlanTrip fields."""
+        count = self.trip_counts[plan]
+        result = np.empty((count, 7), np.int32)
+
+        for i in range(count - 1, -1, -1):
+            result[i, 0] = self.from_stops[plan]
+            result[i, 1] = self.departures[plan]
+            result[i, 2] = self.to_stops[plan]
+            result[i, 3] = self.arrivals[plan]
+            result[i, 4] = self.trip_ids[plan]
+            result[i, 5] = self.service_ids[plan]
+            result[i, 6] = self.trip_starts[plan]
+            plan = self.parents[plan]
+
+        return result
+
+
+    def get_used_trip_instances(self, plan) -> np.ndarray:
+        result = np.empty(self.trip_counts[plan], np.int64)
+        count = 0
+
+        while plan != -1 and self.trip_counts[plan] > 0:
+            if self.trip_ids[plan] != -1:
+                result[count] = (nb.int64(self.trip_ids[plan]) << 32) + self.trip_starts[plan]
+                count += 1
+
+            plan = self.parents[plan]
+
+        return np.unique(result[:count])
+
+
+    def is_acceptable_alternative(self, plan, used_trips) -> bool:
+        prev = self.last_found
+
+        if prev == -1:
+            return True
+
+        cur_time = self.times[plan] - self.start_times[plan]
+
+        if cur_time < self.shortest_time:
+            self.shortest_time = cur_time
+
+        acceptable_time = (
+            cur_time <= self.shortest_time * (1 + RELATIVE_DIFFERENCE)
+            or
+            cur_time <= self.shortest_time + ABSOLUTE_DIFFERENCE
+        )
+
+        if self.start_times[prev] >= self.start_times[plan] and not acceptable_time:
+            return False
+
+        for ut in self.used_trips:
+            if _contains_all(used_trips, ut):
+                return False
+
+        return True
+
+
+@nb.jit
+def _get_estimate(state, stops, prospect, estimate, stop_id, at_time):
+    at_time = nb.int64(at_time)
+
+    if not state.estimated[stop_id] or abs(state.estimates_at[stop_id] - at_time) > state.time_valid:
+        if at_time > DAY:
+            instant = Instant(state.tomorrow_type, at_time - DAY)
+        else:
+            instant = Instant(state.today_type, at_time)
+
+        state.estimates[stop_id] = estimate(stops, prospect, stop_id, instant)
+        state.estimates_at[stop_id] = at_time
+        state.estimated[stop_id] = True
+
+    return state.estimates[stop_id]
+
+
+@nb.jit
+def _initialize(state, stops, prospect, estimate, start_time):
+    for near in prospect.near_destination:
+        state.stop_walk_times[near.id] = int(near.walk_distance / state.pace)
+
+    for near in prospect.near_start:
+        walk_time = int(near.walk_distance / state.pace)
+        plan = state.initial(near.id, start_time, walk_time, 0)
+
+        if state.register(plan):
+            state.walk_times[plan] = state.get_walk_time(stops, prospect, near.id)
+            state.travel_times[plan] = _get_estimate(state, stops, prospect, estimate, near.id, start_time + walk_time)
+            state.push(plan)
+
+
+@nb.jit
+def _next_gen(state, stops, prospect, estimate, plan):
+    if state.trip_counts[plan] == 0:
+        return
+
+    first = plan
+
+    while state.trip_counts[first] > 1:
+        first = state.parents[first]
+
+    stop_id = state.from_stops[first]
+    new_time = state.departures[first] + 1
+    initial_walk = state.initial_walks[plan]
+    alternative = state.initial(stop_id, new_time - initial_walk, initial_walk, state.generations[plan] + 1)
+
+    if state.register(alternative):
+        state.walk_times[alternative] = state.get_walk_time(stops, prospect, stop_id)
+        state.travel_times[alternative] = _get_estimate(state, stops, prospect, estimate, stop_id, new_time)
+        state.push(alternative)
+
+
+@nb.jit(nogil=True)
+def _find_next_plan(state, stops, trips, trip_starts, delays, prospect, estimate) -> int:
+    while len(state.queue) > 0:
+        _, _, plan = _heappop(state.queue)
+
+        if state.walk_times[plan] == 0:
+            used_trips = state.get_used_trip_instances(plan)
+
+            if not state.is_acceptable_alternative(plan, used_trips):
+                continue
+
+            state.used_trips.append(used_trips)
+            _next_gen(state, stops, prospect, estimate, plan)
+            state.last_found = plan
+            return plan
+
+        if state.superseded[plan]:
+            continue
+
+        state.iterations += 1
+        stop_id = state.stop_ids[plan]
+
+        if not state.visited[stop_id]:
+            state.visited[stop_id] = True
+            state.unique_stops_visited += 1
+
+        transfer_time = state.transfer_time
+        walk_limit = state.max_stop_walk
+
+        if state.trip_counts[plan] == 0:
+            transfer_time = 0
+        elif state.trip_ids[plan] == -1:
+            walk_time = state.arrivals[plan] - state.departures[plan]
+            walk_limit -= int(walk_time * state.pace)
+
+        fastest_ways = get_next_trips(
+            stops,
+            trips,
+            stop_id,
+            trip_starts,
+            state.times[plan],
+            transfer_time,
+            state.pace,
+            delays,
+            walk_limit,
+        )
+
+        state.push(state.extend_to_destination(plan))
+
+        for to_stop, plan_trip in fastest_ways.items():
+            if plan_trip.trip_id == -1:
+                state.walking_expansions_total += 1
+            else:
+                state.transit_expansions_total += 1
+
+            extended = state.extend(plan, plan_trip)
+
+            if state.register(extended):
+                state.walk_times[extended] = state.get_walk_time(stops, prospect, to_stop)
+                state.travel_times[extended] = _get_estimate(
+                    state, stops, prospect, estimate, to_stop, plan_trip.arrival_time
+                )
+                state.push(extended)
+
+        state.plans_queue_max_size = max(state.plans_queue_max_size, len(state.queue))
+
+    return -1
+
+
+class JitAStarPlanner():
+    """
+    AStarPlanner with its main loop compiled by numba, for estimators compiled
+    by numba too.
+    """
+
+    prospect: Prospect
+    data: Data
+    trip_starts: TripStarts
+    date: datetime.date
+    start_time: int
+    estimator: Estimator
+    found_plans: list[Plan]
+    preferences: Preferences
+    delays: Delays
+    state: PlannerState
+
+    @staticmethod
+    def supports(estimator: Estimator) -> bool:
+        return isinstance(estimator.estimate, Dispatcher)
+
+    def __init__(
+        self,
+        data: Data,
+        start: Coords,
+        destination: Coords,
+        date: datetime.date,
+        start_time,
+        estimator=None,
+        preferences=Preferences(),
+        delays=Delays.empty(),
+    ):
+        start_init_time = time.time()
+        self.prospect = data.prospector.prospect(
+            start,
+            destination,
+            start_radius=preferences.start_radius,
+            start_min_count=preferences.start_min_count,
+            destination_radius=preferences.destination_radius,
+            destination_min_count=preferences.destination_min_count,
+        )
+        prospecting_time = time.time() - start_init_time
+
+        self.data = data
+        self.date = date if isinstance(date, datetime.date) else datetime.date.fromisoformat(date)
+        self.trip_starts = self.data.starts_around(self.date)
+        self.start_time = start_time
+        self.estimator = estimator or data.default_estimator
+        self.found_plans = []
+        self.preferences = preferences
+        self.delays = delays
+
+        if not JitAStarPlanner.supports(self.estimator):
+            raise Exception("JitAStarPlanner: estimator isn't compiled by numba")
+
+        self.state = PlannerState(
+            data.stops.count(),
+            preferences.pace,
+            int(preferences.max_stop_walk),
+            HEURISTIC_SETTINGS["TRANSFER_TIME"],
+            self.estimator.time_valid,
+            Instant.from_date(self.date, 0).day_type,
+            Instant.from_date(self.date + datetime.timedelta(days=1), 0).day_type,
+        )
+
+        _initialize(self.state, data.stops, self.prospect, self.estimator.estimate, start_time)
+        init_time = time.time() - start_init_time
+
+        self.metrics = {
+            'iterations': 0,
+            'unique_stops_visited': 0,
+            'plans_queue_max_size': 0,
+            'expansions_total' : 0,
+            'walking_expansions_total': 0,
+            'trasnit_expansions_total': 0,
+            'find_plans_time_total': init_time,
+            'planner_initialization_time': init_time - prospecting_time,
+            'prospecting_time': prospecting_time,
+        }
+
+    @property
+    def iterations(self) -> int:
+        return self.state.iterations
+
+    def find_next_plan(self):
+        t0 = time.time()
+
+        index = _find_next_plan(
+            self.state,
+            self.data.stops,
+            self.data.trips,
+            self.trip_starts,
+            self.delays,
+            self.prospect,
+            self.estimator.estimate,
+        )
+
+        self.update_metrics(time.time() - t0)
+
+        if index == -1:
+            return None
+
+        custom_print(self.iterations, 'ALGORITHM_ITERATIONS')
+        plan = self.get_plan(index)
+        self.found_plans.append(plan)
+        return plan
+
+    def get_plan(self, index: int) -> Plan:
+        state = self.state
+        arena = PlanArena()
+        last_trip_index = -1
+
+        for row in state.get_trips(index):
+            last_trip_index = arena.add(last_trip_index, PlanTrip(*map(int, row)))
+
+        return Plan(
+            int(state.stop_ids[index]),
+            int(state.times[index]),
+            int(state.inconveniences[index]),
+            int(state.initial_walks[index]),
+            arena,
+            last_trip_index,
+            int(state.generations[index]),
+            state.travel_times[index],
+            int(state.walk_times[index]),
+        )
+
+    def update_metrics(self, find_time: float):
+        state = self.state
+        self.metrics['find_plans_time_total'] += find_time
+        self.metrics['iterations'] = state.iterations
+        self.metrics['unique_stops_visited'] = state.unique_stops_visited
+
+        if METRICS_SETTINGS['EXPANSIONS']:
+            self.metrics['plans_queue_max_size'] = state.plans_queue_max_size
+            self.metrics['walking_expansions_total'] = state.walking_expansions_total
+            self.metrics['trasnit_expansions_total'] = state.transit_expansions_total
+            self.metrics['expansions_total'] = state.walking_expansions_total + state.transit_expansions_total
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import NamedTuple
+from typing import NamedTuple, Optional
 
 from .data import Data
 from .estimator import Estimate
@@ -21,13 +21,47 @@ class PlanTrip(NamedTuple):
     trip_start: int = -1
 
 
+class PlanArena:
+    """
+    Trips of all plans of a planner, each one linked to the trip before it, so
+    extending a plan doesn't copy its trips.
+    """
+
+    parents: list[int]
+    firsts: list[int]
+    trips: list[PlanTrip]
+
+    def __init__(self):
+        self.parents = []
+        self.firsts = []
+        self.trips = []
+
+    def add(self, parent: int, plan_trip: PlanTrip) -> int:
+        index = len(self.trips)
+        self.parents.append(parent)
+        self.firsts.append(index if parent == -1 else self.firsts[parent])
+        self.trips.append(plan_trip)
+        return index
+
+    def get_trips(self, index: int) -> list[PlanTrip]:
+        result = []
+
+        while index != -1:
+            result.append(self.trips[index])
+            index = self.parents[index]
+
+        result.reverse()
+        return result
+
+
 @dataclass
 class Plan:
     current_stop_id: int
     current_time: int
     inconvenience: int
     initial_walk: int
-    plan_trips: list[PlanTrip]
+    arena: PlanArena
+    last_trip_index: int # -1 before first trip
     generation: int = 0
     travel_time: int = INF_TIME
     walk_time: int = INF_TIME
@@ -51,42 +85,62 @@ class Plan:
     def time_at_destination(self):
         return self.current_time + self.walk_time
 
+    @property
+    def plan_trips(self) -> list[PlanTrip]:
+        return self.arena.get_trips(self.last_trip_index)
+
+    @property
+    def first_trip(self) -> Optional[PlanTrip]:
+        if self.last_trip_index == -1:
+            return None
+        else:
+            return self.arena.trips[self.arena.firsts[self.last_trip_index]]
+
+    @property
+    def last_trip(self) -> Optional[PlanTrip]:
+        if self.last_trip_index == -1:
+            return None
+        else:
+            return self.arena.trips[self.last_trip_index]
+
     @property
     def start_time(self):
-        if self.plan_trips:
-            return self.plan_trips[0].departure_time - self.initial_walk
+        if self.last_trip_index != -1:
+            return self.first_trip.departure_time - self.initial_walk
         else:
             return self.current_time - self.initial_walk
 
     @staticmethod
-    def initial(stop_id, start_time, initial_walk):
+    def initial(stop_id, start_time, initial_walk, arena):
         return Plan(
             stop_id,
             start_time + initial_walk,
             int(initial_walk * INCONVENIENCE_SETTINGS["WALK_TIME_PENALTY"]),
             initial_walk,
-            [],
+            arena,
+            -1,
         )
 
     def extend(self, plan_trip: PlanTrip):
         inconvenience = self.inconvenience
+        last_trip = self.last_trip
 
         if plan_trip.trip_id == -1:
-            if not self.plan_trips:
+            if last_trip is None:
                 return Plan.initial(
                     plan_trip.to_stop,
                     self.current_time - self.initial_walk,
                     plan_trip.arrival_time - plan_trip.departure_time + self.initial_walk,
+                    self.arena,
                 )
             else:
                 walk_time = plan_trip.arrival_time - plan_trip.departure_time
                 inconvenience += int(walk_time * INCONVENIENCE_SETTINGS["WALK_TIME_PENALTY"])
 
-                if self.plan_trips and self.plan_trips[-1].trip_id == -1:
-                    trips = self.plan_trips.copy()
-                    from_stop, departure_time, *_ = trips[-1]
+                if last_trip.trip_id == -1:
+                    from_stop, departure_time, *_ = last_trip
 
-                    trips[-1] = PlanTrip(
+                    merged_walk = PlanTrip(
                         from_stop,
                         departure_time,
                         plan_trip.to_stop,
@@ -98,12 +152,13 @@ class Plan:
                         plan_trip.arrival_time,
                         inconvenience,
                         self.initial_walk,
-                        trips,
+                        self.arena,
+                        self.arena.add(self.arena.parents[self.last_trip_index], merged_walk),
                         self.generation,
                     )
-        elif self.plan_trips:
+        elif last_trip is not None:
             inconvenience += INCONVENIENCE_SETTINGS["TRANSFER_PENALTY"]
-            wait_time = plan_trip.departure_time - self.plan_trips[-1].arrival_time
+            wait_time = plan_trip.departure_time - last_trip.arrival_time
             inconvenience += int(wait_time * INCONVENIENCE_SETTINGS["WAIT_TIME_PENALTY"])
 
         return Plan(
@@ -111,7 +166,8 @@ class Plan:
             plan_trip.arrival_time,
             inconvenience,
             self.initial_walk,
-            self.plan_trips + [plan_trip],
+            self.arena,
+            self.arena.add(self.last_trip_index, plan_trip),
             self.generation,
         )
 
@@ -121,18 +177,26 @@ class Plan:
             self.current_time + self.walk_time,
             self.inconvenience + self.walk_time * INCONVENIENCE_SETTINGS["WALK_TIME_PENALTY"],
             self.initial_walk,
-            self.plan_trips,
+            self.arena,
+            self.last_trip_index,
             self.generation,
             travel_time=0,
             walk_time=0,
         )
 
     def get_used_trip_instances(self) -> frozenset[tuple[int, int]]:
-        return frozenset(
-            (pt.trip_id, pt.trip_start)
-            for pt in self.plan_trips
-            if pt.trip_id != -1
-        )
+        result = []
+        index = self.last_trip_index
+
+        while index != -1:
+            pt = self.arena.trips[index]
+
+            if pt.trip_id != -1:
+                result.append((pt.trip_id, pt.trip_start))
+
+            index = self.arena.parents[index]
+
+        return frozenset(result)
 
     def format(self, data: Data):
         if len(self.plan_trips) == 0:
@@ -0,0 +1,63 @@
+import datetime
+import numpy as np
+import pytest
+import random
+from types import SimpleNamespace
+
+from algorithm.astar_planner import AStarPlanner
+from algorithm.estimator import euclidean_estimator
+from algorithm.estimators.cluster import cluster_estimator
+from algorithm.jit_planner import JitAStarPlanner
+from transit.data.trips import get_trip_starts
+from transit.tests.network import build_network, random_prospect
+
+
+PLANS = 3
+
+
+class FixedProspector:
+    def __init__(self):
+        self.next = None
+
+    def prospect(self, start, destination, **kwargs):
+        return self.next
+
+
+@pytest.fixture(scope="module", params=[1, 2])
+def data(request):
+    stops, trips, services = build_network(request.param)
+    trip_starts = get_trip_starts(trips, services)
+
+    return SimpleNamespace(
+        stops=stops,
+        trips=trips,
+        prospector=FixedProspector(),
+        starts_around=lambda date: trip_starts,
+    )
+
+
+@pytest.mark.parametrize("estimator", [
+    euclidean_estimator,
+    cluster_estimator(np.zeros((1, 1), np.int32)),
+])
+def test_jit_planner_finds_same_plans(data, estimator):
+    rnd = random.Random(0)
+    date = datetime.date(2024, 9, 5)
+
+    for _ in range(20):
+        data.prospector.next = random_prospect(data.stops, rnd)
+        start_time = rnd.randrange(5*3600, 23*3600)
+        results = []
+
+        for cls in [AStarPlanner, JitAStarPlanner]:
+            planner = cls(data, None, None, date, start_time, estimator)
+
+            for _ in range(PLANS):
+                planner.find_next_plan()
+
+            results.append([
+                (p.current_time, p.inconvenience, p.start_time, p.plan_trips)
+                for p in planner.found_plans
+            ])
+
+        assert results[0] == results[1]
@@ -1,7 +1,13 @@
 from django.templatetags.static import static
 import datetime
+import numpy as np
+import threading
 from algorithm.data import Data
 from algorithm.utils import seconds_to_time
+from transit.isochrone import isochrone
+from transit.router import Router
+
+_local = threading.local()
 
 
 def plans_to_html(plans: list, data: Data, datetime: datetime.datetime):
@@ -278,4 +284,69 @@ def prepare_gtfs_trip_ids(plan, data: Data):
                 plan_trip.trip_start
             ).gtfs_trip_id
 
-    return response
\ No newline at end of file
+    return response
+
+
+def get_router(data: Data) -> Router:
+    """Clone of data.router owned by the calling thread, made on first use."""
+    routers = getattr(_local, 'routers', None)
+
+    if routers is None:
+        routers = _local.routers = {}
+
+    router = routers.get(data)
+
+    if router is None:
+        router = routers[data] = data.router.clone()
+
+    return router
+
+
+def prepare_isochrone(data: Data, start_coords, date: datetime.date, start_time: int, budget: int):
+    """
+    Stops reachable from start_coords within budget seconds, with their
+    arrival times, and reachable area as a GeoJSON MultiPolygon.
+    """
+    prospect = data.prospector.prospect(start_coords, start_coords)
+    router = get_router(data)
+    time_limit = start_time + budget
+    arrivals, _ = router.one_to_all(prospect, date, start_time, budget)
+
+    stops = []
+
+    for stop_id in np.nonzero(arrivals < time_limit)[0]:
+        stop = data.stops[int(stop_id)]
+        stops.append({
+            "stop_id": int(stop_id),
+            "name": stop.name,
+            "lat": float(stop.coords.lat),
+            "lon": float(stop.coords.lon),
+            "arrival": seconds_to_time(arrivals[stop_id], return_with_seconds=False),
+        })
+
+    vertices, offsets, components, holes = isochrone(data.stops, arrivals, prospect.start, start_time, time_limit)
+
+    # All vertices are unprojected at once
+    xs = vertices[:, 0] + data.md.center_position.x
+    ys = vertices[:, 1] + data.md.center_position.y
+    lats, lons = data.prospector.untransformer.transform(xs, ys)
+    points = np.stack([lons, lats], axis=1).tolist()
+    polygons = [[] for _ in range(components.max(initial=-1) + 1)]
+
+    for ring in range(len(components)):
+        ring_points = points[offsets[ring]:offsets[ring+1]]
+        ring_points.append(ring_points[0])
+
+        # Exterior ring goes first, followed by holes
+        if holes[ring]:
+            polygons[components[ring]].append(ring_points)
+        else:
+            polygons[components[ring]].insert(0, ring_points)
+
+    return {
+        "stops": stops,
+        "isochrone": {
+            "type": "MultiPolygon",
+            "coordinates": polygons,
+        },
+    }
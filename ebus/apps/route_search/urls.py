@@ -14,4 +14,6 @@ urlpatterns = [
     path('', ChooseCityView.as_view(), name='ChooseCity'),
     re_path(rf'^(?P<city>{CITY_REGEX})/$', BaseView.as_view(), name='BaseView'),
     path('algorithm/find-route/<str:city_id>', FindRouteView.as_view(), name='FindRoute'),
+    path('algorithm/isochrone/<str:city_id>', IsochroneView.as_view(), name='Isochrone'),
+    path('algorithm/matrix/<str:city_id>', MatrixView.as_view(), name='Matrix'),
 ]
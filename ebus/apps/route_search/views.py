@@ -1,5 +1,6 @@
 import datetime
 from django.conf import settings
+from django.core.cache import cache
 from django.http import JsonResponse, Http404
 from django.utils.translation import gettext as _
 from django.utils.translation import gettext_lazy as _
@@ -12,15 +13,20 @@ import redis
 import sys
 from .modules.views.functions import *
 from algorithm.astar_planner import AStarPlanner
+from algorithm.jit_planner import JitAStarPlanner
 from algorithm.preferences import Preferences
 from algorithm.utils import time_to_seconds
 from tickets.models import TicketType, Ticket
-from transit.data.misc import Coords, Delays
+from transit.data.misc import Coords, Delays, INF_TIME
 
 
 r = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0)
 geolocator = Nominatim(user_agent="ebus")
 
+ISOCHRONE_TIME_BUCKET = 5 * 60
+ISOCHRONE_COORDS_DIGITS = 3
+ISOCHRONE_CACHE_TIMEOUT = 60 * 60
+
 
 def load_cities_data():
     with open(settings.CITIES_JSON_PATH, 'r', encoding='utf-8') as file:
@@ -118,7 +124,12 @@ class FindRouteView(View):
         else:
             delays = Delays.empty()
 
-        planner = AStarPlanner(
+        if JitAStarPlanner.supports(data.default_estimator):
+            planner_class = JitAStarPlanner
+        else:
+            planner_class = AStarPlanner
+
+        planner = planner_class(
             data,
             Coords(start_latitude, start_longitude),
             Coords(destination_latitude, destination_longitude),
@@ -159,3 +170,89 @@ class FindRouteView(View):
             'gtfs': gtfs,
         }
         return JsonResponse(response_data)
+
+
+class IsochroneView(View):
+
+    def post(self, request, *args, **kwargs):
+        city_id = kwargs['city_id']
+        data = load_city_data(city_id)
+
+        try:
+            _, start_latitude, start_longitude = json.loads(request.POST.get('start_location')).values()
+        except (ValueError, KeyError):
+            return JsonResponse({'error': _('Invalid start location data.')}, status=400)
+
+        try:
+            _datetime = datetime.datetime.strptime(request.POST.get('datetime'), '%d-%m-%Y %H:%M')
+        except ValueError:
+            return JsonResponse({'error': _('Invalid date and time format.')}, status=400)
+
+        try:
+            budget = int(request.POST.get('budget'))
+        except (TypeError, ValueError):
+            return JsonResponse({'error': _('Invalid time budget.')}, status=400)
+
+        if budget <= 0:
+            return JsonResponse({'error': _('Invalid time budget.')}, status=400)
+
+        # Budget sets walking radii, which size the rasterized area
+        budget = min(budget, settings.ISOCHRONE_MAX_BUDGET) * 60
+
+        # Origin and time are quantized, so nearby requests share cached results
+        lat = round(float(start_latitude), ISOCHRONE_COORDS_DIGITS)
+        lon = round(float(start_longitude), ISOCHRONE_COORDS_DIGITS)
+        start_time = time_to_seconds(_datetime.strftime("%H:%M:%S"))
+        start_time -= start_time % ISOCHRONE_TIME_BUCKET
+        cache_key = f"isochrone:{city_id}:{lat}:{lon}:{_datetime.date()}:{start_time}:{budget}"
+        response_data = cache.get(cache_key)
+
+        if response_data is None:
+            response_data = prepare_isochrone(data, Coords(lat, lon), _datetime.date(), start_time, budget)
+            cache.set(cache_key, response_data, ISOCHRONE_CACHE_TIMEOUT)
+
+        return JsonResponse(response_data)
+
+
+class MatrixView(View):
+
+    def post(self, request, *args, **kwargs):
+        city_id = kwargs['city_id']
+        data = load_city_data(city_id)
+        stop_count = data.stops.count()
+
+        try:
+            origins = [int(stop_id) for stop_id in json.loads(request.POST.get('origins'))]
+            destinations = [int(stop_id) for stop_id in json.loads(request.POST.get('destinations'))]
+        except (TypeError, ValueError):
+            return JsonResponse({'error': _('Invalid origin or destination stops.')}, status=400)
+
+        if any(not 0 <= stop_id < stop_count for stop_id in origins + destinations):
+            return JsonResponse({'error': _('Invalid origin or destination stops.')}, status=400)
+
+        if (
+            len(origins) > settings.MATRIX_MAX_ORIGINS
+            or len(destinations) > settings.MATRIX_MAX_DESTINATIONS
+            or len(origins) * len(destinations) > settings.MATRIX_MAX_CELLS
+        ):
+            return JsonResponse({'error': _('Too many origin or destination stops.')}, status=400)
+
+        try:
+            _datetime = datetime.datetime.strptime(request.POST.get('datetime'), '%d-%m-%Y %H:%M')
+        except ValueError:
+            return JsonResponse({'error': _('Invalid date and time format.')}, status=400)
+
+        times = data.router.matrix(
+            origins,
+            destinations,
+            _datetime.date(),
+            time_to_seconds(_datetime.strftime("%H:%M:%S")),
+            workers=settings.MATRIX_WORKERS,
+        )
+
+        response_data = {
+            'origins': origins,
+            'destinations': destinations,
+            'times': [[None if t == INF_TIME else int(t) for t in row] for row in times],
+        }
+        return JsonResponse(response_data)
@@ -24,6 +24,9 @@ HEURISTIC_SETTINGS = {
     # BTW, even though it is not admissable heurisitc,
     # in most cases results are otimal compared to jakdojade and google
     'TRANSFER_TIME': 60,
+    # Name of estimator used by default (as in benchmark/run.py), None for the
+    # first available of nn, nn-ref, cluster and euclidean
+    'DEFAULT_ESTIMATOR': None,
 }
 
 INCONVENIENCE_SETTINGS = {
@@ -0,0 +1,6 @@
+ISOCHRONE_MAX_BUDGET = 120 # (min) Larger budgets are clamped to it
+
+MATRIX_MAX_ORIGINS = 100
+MATRIX_MAX_DESTINATIONS = 1000
+MATRIX_MAX_CELLS = 20000 # Origins times destinations
+MATRIX_WORKERS = 2 # Threads running searches of a single request
@@ -21,6 +21,7 @@ from .custom_settings.user_settings import *
 from .custom_settings.email_settings import *
 from .custom_settings.feedback_settings import *
 from .custom_settings.algorithm_settings import *
+from .custom_settings.route_search_settings import *
 
 load_dotenv()
 
@@ -0,0 +1,464 @@
+# Arrive-by queries: RAPTOR run backward in time from the destination, so the
+# latest departure that still arrives by given time is found in a single
+# search. Labels hold the latest time at which a stop has to be left (and
+# ready for whatever follows) to make it; trips are scanned from later stops
+# to earlier ones, using the last trip start at or before a given time.
+
+import numba as nb
+from numba.experimental import jitclass
+import numba.types as nbt
+import numpy as np
+
+from .data.misc import *
+from .data.stops import Stops
+from .data.trips import Trips, TripStarts
+from .params import *
+from .plan import *
+from .prospector import *
+
+
+@jitclass([
+  ("alights_off", nb.int32[:]),
+  ("alights_trips", nb.int32[:]),
+  ("alights_seqs", nb.int16[:]),
+  ("walks_off", nb.int32[:]),
+  ("walks_stop_ids", nb.int32[:]),
+  ("walks_distances", nb.int16[:]),
+])
+class ReverseIndex:
+  """
+  For every stop, trip stops at which it's possible to get off there (all
+  but the first stop of a trip) and walks leading to it.
+  """
+
+  def __init__(self, alights_off, alights_trips, alights_seqs, walks_off, walks_stop_ids, walks_distances):
+    self.alights_off = alights_off
+    self.alights_trips = alights_trips
+    self.alights_seqs = alights_seqs
+    self.walks_off = walks_off
+    self.walks_stop_ids = walks_stop_ids
+    self.walks_distances = walks_distances
+
+
+@nb.jit
+def get_reverse_index(stops: Stops, trips: Trips) -> ReverseIndex:
+  stop_count = stops.count()
+  trip_count = len(trips.routes)
+
+  alights_off = np.zeros(stop_count + 1, np.int32)
+
+  for trip_id in range(trip_count):
+    for i in range(trips.stops_off[trip_id] + 1, trips.stops_off[trip_id+1]):
+      alights_off[trips.stops_ids[i] + 1] += 1
+
+  alights_off = np.cumsum(alights_off).astype(np.int32)
+  alights_trips = np.empty(alights_off[-1], np.int32)
+  alights_seqs = np.empty(alights_off[-1], np.int16)
+  fill = alights_off[:-1].copy()
+
+  for trip_id in range(trip_count):
+    beg = trips.stops_off[trip_id]
+
+    for i in range(beg + 1, trips.stops_off[trip_id+1]):
+      stop_id = trips.stops_ids[i]
+      alights_trips[fill[stop_id]] = trip_id
+      alights_seqs[fill[stop_id]] = i - beg
+      fill[stop_id] += 1
+
+  walks_off = np.zeros(stop_count + 1, np.int32)
+
+  for i in range(len(stops.walks_stop_ids)):
+    walks_off[stops.walks_stop_ids[i] + 1] += 1
+
+  walks_off = np.cumsum(walks_off).astype(np.int32)
+  walks_stop_ids = np.empty(walks_off[-1], np.int32)
+  walks_distances = np.empty(walks_off[-1], np.int16)
+  fill = walks_off[:-1].copy()
+
+  for from_stop in range(stop_count):
+    for i in range(stops.walks_off[from_stop], stops.walks_off[from_stop+1]):
+      to_stop = stops.walks_stop_ids[i]
+      walks_stop_ids[fill[to_stop]] = from_stop
+      walks_distances[fill[to_stop]] = stops.walks_distances[i]
+      fill[to_stop] += 1
+
+  return ReverseIndex(alights_off, alights_trips, alights_seqs, walks_off, walks_stop_ids, walks_distances)
+
+
+@jitclass([
+  ("stops", nbt_jitc(Stops)),
+  ("trips", nbt_jitc(Trips)),
+  ("trip_starts", nbt_jitc(TripStarts)),
+  ("pickups", nb.bool_[:]),
+  ("reverse", nbt_jitc(ReverseIndex)),
+
+  ("near_start", nbt.List(NbtNearStop)),
+  ("destination", NbtPoint),
+  ("near_destination", nbt.List(NbtNearStop)),
+  ("walk_distance", nb.float32),
+
+  ("arrival_time", nb.int32),
+  ("rounds", nb.int32),
+  ("iteration", nb.int32),
+  ("departure", nb.int32),
+  ("departure_round", nb.int32),
+  ("departure_stop", nb.int32),
+  ("head_to_stop", nb.int32),
+  ("head_trip", nb.int32),
+  ("head_details", nb.int32),
+  ("head_seq", nb.int32),
+
+  ("readies", nb.int32[:, :]),
+  ("to_stops", nb.int32[:, :]),
+  ("trip_ids", nb.int32[:, :]),
+  ("details", nb.int32[:, :]),
+  ("seqs", nb.int32[:, :]),
+  ("best", nb.int32[:]),
+  ("start_walks", nb.int32[:]),
+  ("start_walk_times", nb.int32[:]),
+
+  ("marked", nb.bool_[:]),
+  ("marked_stops", nb.int32[:]),
+  ("marked_count", nb.int32),
+  ("touched", nb.bool_[:]),
+  ("touched_stops", nb.int32[:]),
+  ("touched_count", nb.int32),
+  ("queued_seqs", nb.int32[:]),
+  ("queued_trips", nb.int32[:]),
+  ("queued_count", nb.int32),
+  ("pending", nb.int32[:]),
+])
+class BackwardRaptorTask:
+  """
+  Mirror of RaptorTask: starts from all stops at arrival_time minus their
+  walk to destination and ends at stops near start. Transfer time is kept
+  before every boarding, except for the one right after the initial walk.
+  """
+
+  def __init__(
+    self,
+    stops: Stops,
+    trips: Trips,
+    pickups: np.ndarray,
+    reverse: ReverseIndex,
+    prospect: Prospect,
+    arrival_time: int,
+    trip_starts: TripStarts,
+    rounds: int = MAX_ROUNDS,
+  ):
+    self.stops = stops
+    self.trips = trips
+    self.trip_starts = trip_starts
+    self.pickups = pickups
+    self.reverse = reverse
+    self.near_start = prospect.near_start
+    self.destination = prospect.destination
+    self.near_destination = prospect.near_destination
+    self.walk_distance = prospect.walk_distance
+
+    self.arrival_time = arrival_time
+    self.rounds = rounds
+    self.iteration = 0
+    self.departure = -INF_TIME
+    self.departure_round = 0
+    self.departure_stop = -1
+    self.head_to_stop = -1
+    self.head_trip = -1
+    self.head_details = -1
+    self.head_seq = -1
+
+    stop_count = stops.count()
+    trip_count = len(trips.routes)
+
+    # Like in RaptorTask, row k holds labels of plans with at most k trips and
+    # label set in an earlier round is found by looking for the first row
+    # that has the same value.
+    self.readies = np.full((rounds + 1, stop_count), -INF_TIME, np.int32)
+    self.to_stops = np.empty((rounds + 1, stop_count), np.int32)
+    self.trip_ids = np.empty((rounds + 1, stop_count), np.int32)
+    self.details = np.empty((rounds + 1, stop_count), np.int32)
+    self.seqs = np.empty((rounds + 1, stop_count), np.int32)
+    self.best = np.full(stop_count, -INF_TIME, np.int32)
+    self.start_walks = np.empty(stop_count, np.int32)
+    self.start_walk_times = np.full(stop_count, -1, np.int32)
+
+    self.marked = np.zeros(stop_count, np.bool_)
+    self.marked_stops = np.empty(stop_count, np.int32)
+    self.marked_count = 0
+    self.touched = np.zeros(stop_count, np.bool_)
+    self.touched_stops = np.empty(stop_count, np.int32)
+    self.touched_count = 0
+    self.queued_seqs = np.full(trip_count, -1, np.int32)
+    self.queued_trips = np.empty(trip_count, np.int32)
+    self.queued_count = 0
+    self.pending = np.empty(stop_count, np.int32)
+
+
+  def improve(
+    self,
+    k: int,
+    stop_id: int,
+    departure: int,
+    ready: int,
+    to_stop: int,
+    trip_id: int,
+    details: int,
+    seq: int,
+  ) -> bool:
+    # Departure is when stop_id is left right after the initial walk, ready
+    # is the latest arrival there for any other way of getting there
+    walk_time = self.start_walk_times[stop_id]
+
+    if walk_time != -1 and departure - walk_time > self.departure:
+      self.departure = departure - walk_time
+      self.departure_round = k
+      self.departure_stop = stop_id
+      self.head_to_stop = to_stop
+      self.head_trip = trip_id
+      self.head_details = details
+      self.head_seq = seq
+
+    if ready <= max(self.best[stop_id], self.departure):
+      return False
+
+    self.readies[k, stop_id] = ready
+    self.to_stops[k, stop_id] = to_stop
+    self.trip_ids[k, stop_id] = trip_id
+    self.details[k, stop_id] = details
+    self.seqs[k, stop_id] = seq
+    self.best[stop_id] = ready
+    self.mark(stop_id)
+
+    if not self.touched[stop_id]:
+      self.touched[stop_id] = True
+      self.touched_stops[self.touched_count] = stop_id
+      self.touched_count += 1
+
+    return True
+
+
+  def mark(self, stop_id: int):
+    if not self.marked[stop_id]:
+      self.marked[stop_id] = True
+      self.marked_stops[self.marked_count] = stop_id
+      self.marked_count += 1
+
+
+  def settled_round(self, k: int, stop_id: int) -> int:
+    while k > 0 and self.readies[k-1, stop_id] == self.readies[k, stop_id]:
+      k -= 1
+
+    return k
+
+
+  def initialize(self):
+    self.departure = self.arrival_time - int(self.walk_distance / WALK_SPEED)
+    self.departure_stop = -1
+
+    for id, dst in self.near_start:
+      self.start_walks[id] = nb.int32(dst)
+      self.start_walk_times[id] = int(dst / WALK_SPEED)
+
+    # Last walk can start from any stop, just like in forward engines
+    for stop_id in range(self.stops.count()):
+      walk_time = self.walk_time(stop_id)
+      time = self.arrival_time - walk_time
+      self.improve(0, stop_id, time, time, -1, -1, nb.int32(walk_time * WALK_SPEED), -1)
+
+
+  def walk_time(self, stop_id: int) -> int:
+    """Same as RaptorTask.walk_time."""
+    for near in self.near_destination:
+      if near.id == stop_id:
+        return nb.int32(near.walk_distance / WALK_SPEED)
+
+    a = self.stops[stop_id].position
+    b = self.destination
+    t = np.sqrt((a.x - b.x)**2 + (a.y - b.y)**2) * WALK_DISTANCE_MULTIPLIER / WALK_SPEED
+    return nb.int32(t)
+
+
+  def merge_round(self, k: int):
+    for i in range(self.touched_count):
+      stop_id = self.touched_stops[i]
+      self.readies[k, stop_id] = max(self.readies[k, stop_id], self.readies[k-1, stop_id])
+
+
+  def queue_trips(self):
+    reverse = self.reverse
+
+    for i in range(self.marked_count):
+      stop_id = self.marked_stops[i]
+      self.marked[stop_id] = False
+
+      for j in range(reverse.alights_off[stop_id], reverse.alights_off[stop_id+1]):
+        trip_id = reverse.alights_trips[j]
+        seq = reverse.alights_seqs[j]
+        queued = self.queued_seqs[trip_id]
+
+        if queued == -1:
+          self.queued_seqs[trip_id] = seq
+          self.queued_trips[self.queued_count] = trip_id
+          self.queued_count += 1
+        elif seq > queued:
+          self.queued_seqs[trip_id] = seq
+
+    self.marked_count = 0
+
+
+  def scan_trip(self, k: int, trip_id: int, seq: int):
+    trips = self.trips
+    beg = trips.stops_off[trip_id]
+    start = -INF_TIME
+    alight_stop = -1
+
+    for i in range(beg + seq, beg - 1, -1):
+      stop_id = trips.stops_ids[i]
+
+      if start != -INF_TIME and self.pickups[i]:
+        departure = start + trips.stops_departures[i]
+        self.improve(k, stop_id, departure, departure - TRANSFER_TIME, alight_stop, trip_id, departure, i - beg)
+
+      if i == beg or self.readies[k-1, stop_id] == -INF_TIME:
+        continue
+
+      latest = self.readies[k-1, stop_id] - trips.stops_arrivals[i]
+
+      if latest <= start:
+        continue
+
+      previous_start = self.trip_starts.get_previous_start(trip_id, latest).time
+
+      if previous_start > start and previous_start + trips.stops_arrivals[i] > self.departure:
+        start = previous_start
+        alight_stop = stop_id
+
+
+  def relax_walks(self, k: int):
+    # Same as in RaptorTask, stops improved here are relaxed again
+    reverse = self.reverse
+    pending = self.pending
+    count = self.marked_count
+    pending[:count] = self.marked_stops[:count]
+
+    while count > 0:
+      count -= 1
+      to_stop = pending[count]
+      ready = self.readies[k, to_stop]
+
+      for j in range(reverse.walks_off[to_stop], reverse.walks_off[to_stop+1]):
+        from_stop = reverse.walks_stop_ids[j]
+        distance = reverse.walks_distances[j]
+        time = ready - int(distance / WALK_SPEED)
+
+        if self.improve(k, from_stop, time, time, to_stop, -1, distance, -1):
+          if count == len(pending):
+            pending = grow(pending)
+            self.pending = pending
+
+          pending[count] = from_stop
+          count += 1
+
+
+  def run(self):
+    self.relax_walks(0)
+
+    for k in range(1, self.rounds + 1):
+      self.merge_round(k)
+
+      if self.marked_count == 0:
+        continue
+
+      self.queue_trips()
+
+      for i in range(self.queued_count):
+        trip_id = self.queued_trips[i]
+        self.scan_trip(k, trip_id, self.queued_seqs[trip_id])
+        self.queued_seqs[trip_id] = -1
+        self.iteration += 1
+
+      self.queued_count = 0
+      self.relax_walks(k)
+
+
+  def solve(self) -> ProfileEntry:
+    """Latest departure from start and plan which then arrives by arrival_time."""
+    self.initialize()
+    self.run()
+    path, seqs = self.gather_path()
+    return ProfileEntry(self.departure, Plan(self.get_arrival(path, seqs), path, self.iteration))
+
+
+  def gather_path(self):
+    result = nb.typed.List.empty_list(NbtPathSegment)
+    seqs = nb.typed.List.empty_list(nb.int32)
+
+    if self.departure_stop == -1:
+      result.append(PathSegment(nb.int32(-1), nb.int32(-1), nb.int32(self.walk_distance)))
+      seqs.append(nb.int32(-1))
+      return result, seqs
+
+    result.append(PathSegment(nb.int32(-1), nb.int32(-1), self.start_walks[self.departure_stop]))
+    seqs.append(nb.int32(-1))
+    k = self.departure_round
+    stop_id = self.departure_stop
+    to_stop = self.head_to_stop
+    trip_id = self.head_trip
+    details = self.head_details
+    seq = self.head_seq
+
+    while True:
+      result.append(PathSegment(nb.int32(stop_id), nb.int32(trip_id), nb.int32(details)))
+      seqs.append(nb.int32(seq))
+
+      if to_stop == -1:
+        return result, seqs
+
+      if trip_id != -1:
+        k -= 1
+
+      stop_id = to_stop
+      k = self.settled_round(k, stop_id)
+      to_stop = self.to_stops[k, stop_id]
+      trip_id = self.trip_ids[k, stop_id]
+      details = self.details[k, stop_id]
+      seq = self.seqs[k, stop_id]
+
+
+  def get_arrival(self, path, seqs) -> int:
+    """Arrival at destination when path is followed from self.departure."""
+    trips = self.trips
+    time = self.departure
+
+    if self.departure_stop == -1:
+      return time + int(self.walk_distance / WALK_SPEED)
+
+    time += self.start_walk_times[self.departure_stop]
+
+    for i in range(1, len(path)):
+      segment = path[i]
+
+      if segment.trip_id == -1:
+        if i == len(path) - 1:
+          time += self.walk_time(segment.from_stop)
+        else:
+          time += int(segment.details / WALK_SPEED)
+
+        continue
+
+      beg = trips.stops_off[segment.trip_id]
+      start = segment.details - trips.stops_departures[beg + seqs[i]]
+      alight_stop = path[i+1].from_stop
+      j = beg + seqs[i] + 1
+
+      while trips.stops_ids[j] != alight_stop:
+        j += 1
+
+      time = start + trips.stops_arrivals[j]
+
+    return time
+
+
+@nb.jit(nogil=True)
+def solve_backward(task):
+  return task.solve()
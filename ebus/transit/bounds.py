@@ -0,0 +1,90 @@
+# Admissible estimates for RouterTask: travel times to a destination cell,
+# found by a timeless backward Dijkstra's search over a graph of minimum ride
+# times between consecutive trip stops and of stop walks. Waiting and transfer
+# times are ignored, and walks to the destination are taken as straight lines
+# to the nearest point of the cell, so the bounds hold for any destination in
+# the cell at any time and can be shared by queries.
+
+import numba as nb
+from numba.experimental import jitclass
+import numpy as np
+
+from .data.misc import *
+from .data.stops import Stops
+from .data.trips import Trips
+from .heapq import RadixHeap
+from .params import *
+
+
+@jitclass([
+  ("offs", nb.int32[:]),
+  ("from_stops", nb.int32[:]),
+  ("times", nb.int32[:]),
+])
+class BoundGraph:
+  """Edges leading to every stop with minimum times, in CSR layout."""
+
+  def __init__(self, offs, from_stops, times):
+    self.offs = offs
+    self.from_stops = from_stops
+    self.times = times
+
+
+def get_bound_graph(stops: Stops, trips: Trips) -> BoundGraph:
+  # Riding further than the next stop of a trip takes at least as long as
+  # riding there and on, so consecutive stops are enough
+  next_in_trip = np.ones(len(trips.stops_ids) - 1, np.bool_)
+  next_in_trip[trips.stops_off[1:-1] - 1] = False
+  ride_from = trips.stops_ids[:-1][next_in_trip]
+  ride_to = trips.stops_ids[1:][next_in_trip]
+  ride_times = trips.stops_arrivals[1:][next_in_trip] - trips.stops_departures[:-1][next_in_trip]
+
+  walk_from = np.repeat(np.arange(stops.count(), dtype=np.int32), np.diff(stops.walks_off))
+  walk_to = stops.walks_stop_ids
+  walk_times = (stops.walks_distances / WALK_SPEED).astype(np.int32)
+
+  from_stops = np.concatenate((ride_from, walk_from))
+  to_stops = np.concatenate((ride_to, walk_to))
+  times = np.maximum(np.concatenate((ride_times, walk_times)), 0)
+
+  order = np.lexsort((times, from_stops, to_stops))
+  from_stops = from_stops[order]
+  to_stops = to_stops[order]
+  times = times[order]
+
+  first = np.ones(len(order), np.bool_)
+  first[1:] = (from_stops[1:] != from_stops[:-1]) | (to_stops[1:] != to_stops[:-1])
+  to_stops = to_stops[first]
+
+  return BoundGraph(
+    np.searchsorted(to_stops, np.arange(stops.count() + 1)).astype(np.int32),
+    np.ascontiguousarray(from_stops[first], np.int32),
+    np.ascontiguousarray(times[first], np.int32),
+  )
+
+
+@nb.jit(nogil=True)
+def get_lower_bounds(graph: BoundGraph, stops: Stops, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+  """Lower bounds of travel times from all stops to rectangle (x0, y0, x1, y1)."""
+  stop_count = stops.count()
+  result = np.empty(stop_count, np.int32)
+  queue = RadixHeap(stop_count)
+
+  for stop_id in range(stop_count):
+    dx = max(x0 - stops.xs[stop_id], 0, stops.xs[stop_id] - x1)
+    dy = max(y0 - stops.ys[stop_id], 0, stops.ys[stop_id] - y1)
+    result[stop_id] = int(np.sqrt(dx*dx + dy*dy) / WALK_SPEED)
+    queue.push(stop_id, result[stop_id])
+
+  while queue.size > 0:
+    to_stop = queue.pop()
+
+    for i in range(graph.offs[to_stop], graph.offs[to_stop+1]):
+      from_stop = graph.from_stops[i]
+      time = result[to_stop] + graph.times[i]
+
+      if time < result[from_stop]:
+        result[from_stop] = time
+        queue.push(from_stop, time)
+
+  return result
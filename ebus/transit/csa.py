@@ -0,0 +1,341 @@
+# Connection Scan Algorithm, see Dibbelt, Pajor, Strasser, Wagner:
+# "Connection Scan Algorithm", 2017.
+#
+# Every ride between two consecutive stops of a trip instance running on given
+# date is one connection. Connections are sorted by departure once per date,
+# so a query is a single linear scan starting at the first connection that
+# departs after start time.
+
+import numba as nb
+from numba.experimental import jitclass
+import numba.types as nbt
+import numpy as np
+
+from .data.misc import *
+from .data.stops import Stops
+from .data.trips import Trips, TripStarts
+from .params import *
+from .plan import *
+from .prospector import *
+
+
+CONNECTION = np.dtype([
+  ("departure", np.int32),
+  ("arrival", np.int32),
+  ("from_stop", np.int32),
+  ("to_stop", np.int32),
+  ("trip_id", np.int32),
+  ("instance", np.int32),
+  ("pickup", np.bool_),
+], align=True)
+
+NbtConnection = nb.from_dtype(CONNECTION)
+
+
+@jitclass([
+  ("connections", NbtConnection[:]),
+  ("instance_count", nb.int32),
+])
+class Connections:
+  def __init__(self, connections, instance_count):
+    self.connections = connections
+    self.instance_count = instance_count
+
+
+  def first_after(self, time: int) -> int:
+    """Index of the first connection departing at or after given time."""
+    lo = 0
+    hi = len(self.connections)
+
+    while lo < hi:
+      mid = (lo + hi) // 2
+
+      if self.connections[mid].departure < time:
+        lo = mid + 1
+      else:
+        hi = mid
+
+    return lo
+
+
+def build_connections(trips: Trips, pickups: np.ndarray, starts: TripStarts) -> Connections:
+  """Connections of all trip instances running on the date of given starts."""
+  empty = np.empty(0, CONNECTION)
+  count = _fill_connections(trips, pickups, starts, empty, False)
+  connections = np.empty(count, CONNECTION)
+  _fill_connections(trips, pickups, starts, connections, True)
+
+  # Stable sort keeps zero-duration connections of a trip in stop order
+  connections = connections[np.argsort(connections["departure"], kind="stable")]
+  return Connections(connections, len(starts.times))
+
+
+@nb.jit
+def _fill_connections(trips, pickups, starts, connections, write):
+  count = 0
+
+  for trip_id in range(len(trips.routes)):
+    stops_beg = trips.stops_off[trip_id]
+    stops_end = trips.stops_off[trip_id+1]
+
+    # Every start is a trip instance, identified by its index
+    for instance in range(starts.offs[trip_id], starts.offs[trip_id+1]):
+      start = starts.times[instance]
+
+      for i in range(stops_beg, stops_end - 1):
+        departure = start + trips.stops_departures[i]
+        arrival = start + trips.stops_arrivals[i+1]
+
+        if departure >= CONNECTIONS_END:
+          break
+
+        if departure < 0:
+          continue
+
+        if write:
+          c = connections[count]
+          c.departure = departure
+          c.arrival = arrival
+          c.from_stop = trips.stops_ids[i]
+          c.to_stop = trips.stops_ids[i+1]
+          c.trip_id = trip_id
+          c.instance = instance
+          c.pickup = pickups[i]
+
+        count += 1
+
+  return count
+
+
+@jitclass([
+  ("stops", nbt_jitc(Stops)),
+  ("connections", nbt_jitc(Connections)),
+
+  ("destination", NbtPoint),
+  ("near_destination", nbt.List(NbtNearStop)),
+
+  ("start_time", nb.int32),
+  ("iteration", nb.int32),
+  ("arrival", nb.int32),
+  ("path_tail", NbtPathSegment),
+
+  ("epoch", nb.int32),
+  ("epochs", nb.int32[:]),
+  ("arrivals", nb.int32[:]),
+  ("from_stops", nb.int32[:]),
+  ("trip_ids", nb.int32[:]),
+  ("details", nb.int32[:]),
+  ("starts", nb.int32[:]),
+  ("start_walks", nb.int32[:]),
+  ("walk_times", nb.int32[:]),
+  ("boarded_epochs", nb.int32[:]),
+  ("boarded_stops", nb.int32[:]),
+  ("boarded_departures", nb.int32[:]),
+
+  ("pending", nb.bool_[:]),
+  ("pending_stops", nb.int32[:]),
+  ("pending_count", nb.int32),
+])
+class CsaTask:
+  def __init__(
+    self,
+    stops: Stops,
+    connections: Connections,
+    prospect: Prospect,
+    start_time: int,
+  ):
+    self.stops = stops
+
+    # Like in RouterTask, per stop and per instance state is only valid when
+    # its epoch matches the task's epoch, so start() doesn't clear it
+    stop_count = stops.count()
+    self.epoch = 0
+    self.epochs = np.zeros(stop_count, np.int32)
+    self.arrivals = np.empty(stop_count, np.int32)
+    self.from_stops = np.empty(stop_count, np.int32)
+    self.trip_ids = np.empty(stop_count, np.int32)
+    self.details = np.empty(stop_count, np.int32)
+    self.starts = np.empty(stop_count, np.int32)
+    self.start_walks = np.empty(stop_count, np.int32)
+    self.walk_times = np.empty(stop_count, np.int32)
+    self.boarded_epochs = np.zeros(connections.instance_count, np.int32)
+    self.boarded_stops = np.empty(connections.instance_count, np.int32)
+    self.boarded_departures = np.empty(connections.instance_count, np.int32)
+
+    self.pending = np.zeros(stop_count, np.bool_)
+    self.pending_stops = np.empty(stop_count, np.int32)
+    self.pending_count = 0
+
+    self.start(prospect, start_time, connections)
+
+
+  def start(self, prospect: Prospect, start_time: int, connections: Connections):
+    """Prepares the task for a new search, keeping allocated arrays."""
+    self.connections = connections
+    self.destination = prospect.destination
+    self.near_destination = prospect.near_destination
+
+    self.start_time = start_time
+    self.iteration = 0
+    self.arrival = start_time + int(prospect.walk_distance / WALK_SPEED)
+    self.path_tail = PathSegment(nb.int32(-1), nb.int32(-1), nb.int32(prospect.walk_distance))
+
+    if len(self.boarded_epochs) < connections.instance_count:
+      self.boarded_epochs = np.zeros(connections.instance_count, np.int32)
+      self.boarded_stops = np.empty(connections.instance_count, np.int32)
+      self.boarded_departures = np.empty(connections.instance_count, np.int32)
+
+    if self.epoch == np.iinfo(np.int32).max:
+      self.epochs[:] = 0
+      self.boarded_epochs[:] = 0
+      self.epoch = 0
+
+    self.epoch += 1
+
+    for i in range(self.pending_count):
+      self.pending[self.pending_stops[i]] = False
+
+    self.pending_count = 0
+
+    for id, dst in prospect.near_start:
+      self.visit(id)
+      arrival = start_time + int(dst / WALK_SPEED)
+
+      if arrival < self.starts[id]:
+        self.starts[id] = arrival
+        self.start_walks[id] = nb.int32(dst)
+
+      self.improve(id, arrival, -1, -1, nb.int32(dst))
+
+
+  def visit(self, stop_id: int):
+    if self.epochs[stop_id] != self.epoch:
+      self.epochs[stop_id] = self.epoch
+      self.arrivals[stop_id] = INF_TIME
+      self.starts[stop_id] = INF_TIME
+      self.walk_times[stop_id] = -1
+
+
+  def walk_time(self, stop_id: int) -> int:
+    wt = self.walk_times[stop_id]
+
+    if wt != -1:
+      return wt
+
+    wt = -1
+
+    for near in self.near_destination:
+      if near.id == stop_id:
+        wt = nb.int32(near.walk_distance / WALK_SPEED)
+        break
+
+    if wt == -1:
+      a = self.stops[stop_id].position
+      b = self.destination
+      t = np.sqrt((a.x - b.x)**2 + (a.y - b.y)**2) * WALK_DISTANCE_MULTIPLIER / WALK_SPEED
+      wt = nb.int32(t)
+
+    self.walk_times[stop_id] = wt
+    return wt
+
+
+  def improve(self, stop_id: int, arrival: int, from_stop: int, trip_id: int, details: int):
+    self.visit(stop_id)
+
+    if arrival >= min(self.arrivals[stop_id], self.arrival):
+      return
+
+    self.arrivals[stop_id] = arrival
+    self.from_stops[stop_id] = from_stop
+    self.trip_ids[stop_id] = trip_id
+    self.details[stop_id] = details
+
+    if not self.pending[stop_id]:
+      self.pending[stop_id] = True
+      self.pending_stops[self.pending_count] = stop_id
+      self.pending_count += 1
+
+    walk_time = self.walk_time(stop_id)
+
+    if arrival + walk_time < self.arrival:
+      self.arrival = arrival + walk_time
+      self.path_tail = PathSegment(nb.int32(stop_id), nb.int32(-1), nb.int32(walk_time*WALK_SPEED))
+
+
+  def relax_walks(self):
+    # Walks aren't transitively closed, so stops reached by walking are
+    # relaxed as well, just like in RouterTask
+    while self.pending_count > 0:
+      self.pending_count -= 1
+      from_stop = self.pending_stops[self.pending_count]
+      self.pending[from_stop] = False
+      arrival = self.arrivals[from_stop]
+
+      for to_stop, distance in self.stops.get_stop_walks(from_stop):
+        self.improve(to_stop, arrival + int(distance / WALK_SPEED), from_stop, -1, distance)
+
+
+  def solve(self) -> Plan:
+    self.relax_walks()
+    connections = self.connections.connections
+
+    for i in range(self.connections.first_after(self.start_time), len(connections)):
+      c = connections[i]
+
+      if c.departure >= self.arrival:
+        break
+
+      self.iteration += 1
+
+      if self.boarded_epochs[c.instance] != self.epoch:
+        if not c.pickup or self.epochs[c.from_stop] != self.epoch:
+          continue
+
+        ready = min(self.arrivals[c.from_stop] + TRANSFER_TIME, self.starts[c.from_stop])
+
+        if ready > c.departure:
+          continue
+
+        self.boarded_epochs[c.instance] = self.epoch
+        self.boarded_stops[c.instance] = c.from_stop
+        self.boarded_departures[c.instance] = c.departure
+
+      self.improve(
+        c.to_stop,
+        c.arrival,
+        self.boarded_stops[c.instance],
+        c.trip_id,
+        self.boarded_departures[c.instance],
+      )
+
+      self.relax_walks()
+
+    return Plan(self.arrival, self.gather_path(), self.iteration)
+
+
+  def gather_path(self):
+    result = nb.typed.List.empty_list(NbtPathSegment)
+    segment = self.path_tail
+
+    while True:
+      result.append(segment)
+
+      if segment.from_stop == -1:
+        result.reverse()
+        return result
+
+      stop_id = segment.from_stop
+
+      if segment.trip_id != -1 and self.starts[stop_id] <= segment.details:
+        segment = PathSegment(nb.int32(-1), nb.int32(-1), self.start_walks[stop_id])
+      else:
+        segment = PathSegment(
+          self.from_stops[stop_id],
+          self.trip_ids[stop_id],
+          self.details[stop_id],
+        )
+
+
+@nb.jit(nogil=True)
+def solve_csa(task):
+  return task.solve()
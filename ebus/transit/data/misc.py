@@ -40,10 +40,31 @@ class Metadata(NamedTuple):
   realtime: list[str]
 
 
+@nb.jit
+def service_bits(services) -> np.ndarray:
+  """Bitset of given service ids, 64 services per word."""
+  words = services.max() // 64 + 1 if len(services) > 0 else 0
+  bits = np.zeros(words, np.uint64)
+
+  for service in services:
+    bits[service >> 6] |= np.uint64(1) << np.uint64(service & 63)
+
+  return bits
+
+
+@nb.jit
+def has_service(bits, service) -> bool:
+  word = service >> 6
+  return word < len(bits) and (bits[word] >> np.uint64(service & 63)) & np.uint64(1) != 0
+
+
 @jitclass([
   ("today", nb.int32[:]),
   ("yesterday", nb.int32[:]),
   ("tomorrow", nb.int32[:]),
+  ("today_bits", nb.uint64[:]),
+  ("yesterday_bits", nb.uint64[:]),
+  ("tomorrow_bits", nb.uint64[:]),
 ])
 class Services:
   def __init__(self, today, yesterday, tomorrow):
@@ -55,6 +76,10 @@ class Services:
     self.yesterday.sort()
     self.tomorrow.sort()
 
+    self.today_bits = service_bits(today)
+    self.yesterday_bits = service_bits(yesterday)
+    self.tomorrow_bits = service_bits(tomorrow)
+
   @staticmethod
   def empty():
     return Services(
@@ -94,5 +119,72 @@ class Delays:
     )
 
 
+@jitclass([
+  ("dict", nbt.DictType(nbt.UniTuple(nb.int32, 3), nb.bool_)),
+])
+class AccessibleTrips:
+  """Trip instances (trip, service, start time) accessible by wheelchair."""
+
+  def __init__(self, trip_ids, services, start_times):
+    self.dict = dict(
+      zip(
+        zip(trip_ids, services, start_times),
+        np.ones(len(trip_ids), np.bool_),
+      )
+    )
+
+  def contains(self, trip_triple) -> bool:
+    return trip_triple in self.dict
+
+  @staticmethod
+  def empty():
+    return AccessibleTrips(
+      np.empty(0, np.int32),
+      np.empty(0, np.int32),
+      np.empty(0, np.int32),
+    )
+
+
+@jitclass([
+  ("blob", nbt.string),
+  ("offsets", nb.int32[:]),
+])
+class Strings:
+  """List of strings packed into one, with offsets of every string in it."""
+
+  def __init__(self, blob, offsets):
+    self.blob = blob
+    self.offsets = offsets
+
+  def __len__(self) -> int:
+    return len(self.offsets) - 1
+
+  def __getitem__(self, i: int) -> str:
+    return self.blob[self.offsets[i]:self.offsets[i+1]]
+
+
+def pack_strings(strings: list[str|None]) -> Strings:
+  strings = [s or "" for s in strings]
+  offsets = np.zeros(len(strings) + 1, np.int32)
+  offsets[1:] = np.cumsum([len(s) for s in strings])
+  return Strings("".join(strings), offsets)
+
+
+@nb.jit
+def grow(array):
+  """Copy of array with (at least) doubled length."""
+  result = np.empty(max(2 * len(array), 16), array.dtype)
+  result[:len(array)] = array
+  return result
+
+
+def nbt_jitc(cls):
+  if nb.config.DISABLE_JIT:
+    return None
+  else:
+    return cls.class_type.instance_type
+
+
+NbtStrings = nbt_jitc(Strings)
 NbtPoint = nbt.NamedUniTuple(nb.float32, 2, Point)
 NbtCoords = nbt.NamedUniTuple(nb.float32, 2, Coords)
@@ -1,8 +1,9 @@
 import numba as nb
-import numba.types as nbt
 from numba.experimental import jitclass
 from typing import NamedTuple
 
+from .misc import *
+
 
 class Route(NamedTuple):
   agency_id: int
@@ -14,7 +15,7 @@ class Route(NamedTuple):
 
 @jitclass([
   ("agency_ids", nb.int32[:]),
-  ("names", nbt.List(nbt.string)),
+  ("names", NbtStrings),
   ("types", nb.int8[:]),
   ("colors", nb.int32[:]),
   ("text_colors", nb.int32[:]),
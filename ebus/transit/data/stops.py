@@ -1,5 +1,4 @@
 import numba as nb
-import numba.types as nbt
 from numba.experimental import jitclass
 from typing import Iterator, NamedTuple, Optional
 
@@ -29,9 +28,9 @@ class StopTrip(NamedTuple):
 
 
 @jitclass([
-  ("codes", nbt.List(nbt.string)),
-  ("names", nbt.List(nbt.string)),
-  ("zones", nbt.List(nbt.string)),
+  ("codes", NbtStrings),
+  ("names", NbtStrings),
+  ("zones", NbtStrings),
   ("clusters", nb.int32[:]),
   ("lats", nb.float32[:]),
   ("lons", nb.float32[:]),
@@ -1,5 +1,4 @@
 import numba as nb
-import numba.types as nbt
 from numba.experimental import jitclass
 import numpy as np
 from typing import Iterator, NamedTuple, Optional
@@ -32,7 +31,7 @@ class TripStop(NamedTuple):
 @jitclass([
   ("routes", nb.int32[:]),
   ("shapes", nb.int32[:]),
-  ("headsigns", nbt.List(nbt.string)),
+  ("headsigns", NbtStrings),
   ("first_departures", nb.int32[:]),
   ("last_departures", nb.int32[:]),
   ("starts_off", nb.int32[:]),
@@ -123,24 +122,24 @@ class Trips:
     first_departure = self.first_departures[trip_id]
     last_departure = self.last_departures[trip_id]
 
-    start = self._get_next_start(starts_beg, starts_end, services.today, earliest)
+    start = self._get_next_start(starts_beg, starts_end, services.today_bits, earliest)
 
     if earliest <= last_departure - DAY:
-      yts = self._get_next_start(starts_beg, starts_end, services.yesterday, earliest + DAY)
+      yts = self._get_next_start(starts_beg, starts_end, services.yesterday_bits, earliest + DAY)
       start = _ts_min(start, _ts_offset(yts, -DAY))
 
     if start.time >= first_departure + DAY:
-      tts = self._get_next_start(starts_beg, starts_end, services.tomorrow, earliest - DAY)
+      tts = self._get_next_start(starts_beg, starts_end, services.tomorrow_bits, earliest - DAY)
       start = _ts_min(start, _ts_offset(tts, DAY))
 
     return start
 
 
-  def _get_next_start(self, starts_beg, starts_end, day_services, earliest: int) -> TripStart:
+  def _get_next_start(self, starts_beg, starts_end, day_bits, earliest: int) -> TripStart:
     start = TripStart(nb.int32(-1), nb.int32(INF_TIME), nb.int32(0))
 
     for starts_i in range(starts_beg, starts_end):
-      service = self._common_service(starts_i, day_services)
+      service = self._common_service(starts_i, day_bits)
 
       if service == -1:
         continue
@@ -155,22 +154,12 @@ class Trips:
     return start
 
 
-  def _common_service(self, starts_i, day_services):
-    starts_service_end = self.starts_services_off[starts_i+1]
-    starts_service_i = self.starts_services_off[starts_i]
-    day_service_end = len(day_services)
-    day_service_i = 0
+  def _common_service(self, starts_i, day_bits):
+    for i in range(self.starts_services_off[starts_i], self.starts_services_off[starts_i+1]):
+      service = self.starts_services[i]
 
-    while starts_service_i < starts_service_end and day_service_i < day_service_end:
-      starts_service_id = self.starts_services[starts_service_i]
-      day_service_id = day_services[day_service_i]
-
-      if starts_service_id == day_service_id:
-        return starts_service_id
-      elif starts_service_id > day_service_id:
-        day_service_i += 1
-      else:
-        starts_service_i += 1
+      if has_service(day_bits, service):
+        return service
 
     return nb.int32(-1)
 
@@ -186,3 +175,121 @@ def _ts_min(a, b):
     return a
   else:
     return b
+
+
+@jitclass([
+  ("offs", nb.int32[:]),
+  ("times", nb.int32[:]),
+  ("services", nb.int32[:]),
+  ("offsets", nb.int32[:]),
+])
+class TripStarts:
+  """
+  Starts of trips running on a date, including the ones from the day before
+  and after (shifted by a day), sorted by time for every trip.
+  """
+
+  def __init__(self, offs, times, services, offsets):
+    self.offs = offs
+    self.times = times
+    self.services = services
+    self.offsets = offsets
+
+  @staticmethod
+  def empty(trip_count: int):
+    return TripStarts(
+      np.zeros(trip_count + 1, np.int32),
+      np.empty(0, np.int32),
+      np.empty(0, np.int32),
+      np.empty(0, np.int32),
+    )
+
+
+  def get_next_start(self, trip_id: int, earliest: int) -> TripStart:
+    i = self.next_index(trip_id, earliest)
+
+    if i == self.offs[trip_id+1]:
+      return TripStart(nb.int32(-1), nb.int32(INF_TIME), nb.int32(0))
+
+    return TripStart(self.services[i], self.times[i], self.offsets[i])
+
+
+  def next_index(self, trip_id: int, earliest: int) -> int:
+    """Index of the first start at or after earliest, or end of trip's starts."""
+    end = self.offs[trip_id+1]
+    beg = self.offs[trip_id]
+    return beg + np.searchsorted(self.times[beg:end], earliest)
+
+
+  def get_previous_start(self, trip_id: int, latest: int) -> TripStart:
+    i = self.previous_index(trip_id, latest)
+
+    if i < self.offs[trip_id]:
+      return TripStart(nb.int32(-1), nb.int32(-INF_TIME), nb.int32(0))
+
+    return TripStart(self.services[i], self.times[i], self.offsets[i])
+
+
+  def previous_index(self, trip_id: int, latest: int) -> int:
+    """Index of the last start at or before latest, or one before trip's starts."""
+    end = self.offs[trip_id+1]
+    beg = self.offs[trip_id]
+    return beg + np.searchsorted(self.times[beg:end], latest, "right") - 1
+
+
+  def get_starts(self, trip_id: int) -> Range:
+    return Range(self.offs[trip_id], self.offs[trip_id+1])
+
+
+@nb.jit
+def get_trip_starts(trips: Trips, services: Services) -> TripStarts:
+  """Equivalent of Trips.get_next_start for given services, precomputed for all trips."""
+  trip_count = len(trips.routes)
+  offs = np.empty(trip_count + 1, np.int32)
+  offs[0] = 0
+
+  for trip_id in range(trip_count):
+    count = 0
+
+    for starts_i in range(trips.starts_off[trip_id], trips.starts_off[trip_id+1]):
+      times_count = trips.starts_times_off[starts_i+1] - trips.starts_times_off[starts_i]
+
+      for day_bits in (services.yesterday_bits, services.today_bits, services.tomorrow_bits):
+        if trips._common_service(starts_i, day_bits) != -1:
+          count += times_count
+
+    offs[trip_id+1] = offs[trip_id] + count
+
+  times = np.empty(offs[-1], np.int32)
+  result_services = np.empty(offs[-1], np.int32)
+  offsets = np.empty(offs[-1], np.int32)
+
+  for trip_id in range(trip_count):
+    beg = offs[trip_id]
+    i = beg
+
+    # Ties are resolved the same way as in Trips.get_next_start
+    for day_bits, offset in ((services.tomorrow_bits, DAY), (services.yesterday_bits, -DAY), (services.today_bits, 0)):
+      for starts_i in range(trips.starts_off[trip_id], trips.starts_off[trip_id+1]):
+        service = trips._common_service(starts_i, day_bits)
+
+        if service == -1:
+          continue
+
+        for times_i in range(trips.starts_times_off[starts_i], trips.starts_times_off[starts_i+1]):
+          times[i] = trips.starts_times[times_i] + offset
+          result_services[i] = service
+          offsets[i] = offset
+          i += 1
+
+    order = np.argsort(times[beg:i] * np.int64(3) + _day_ranks(offsets[beg:i]), kind="mergesort")
+    times[beg:i] = times[beg:i][order]
+    result_services[beg:i] = result_services[beg:i][order]
+    offsets[beg:i] = offsets[beg:i][order]
+
+  return TripStarts(offs, times, result_services, offsets)
+
+
+@nb.jit
+def _day_ranks(offsets):
+  return np.where(offsets == DAY, 0, np.where(offsets == -DAY, 1, 2))
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import datetime
+import threading
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class DateCache:
+  """LRU cache of structures built for a date (or another key), shared by clones of a Router."""
+
+  def __init__(self, size: int = 3):
+    self.size = size
+    self.lock = threading.Lock()
+    self.cache = OrderedDict()
+    self.pending = dict()
+
+
+  def get(self, date: datetime.date, build: Callable[[], T]) -> T:
+    """
+    Values are built outside the lock, so other keys aren't blocked. Threads
+    asking for a key that's being built wait for the same value.
+    """
+    with self.lock:
+      if date in self.cache:
+        self.cache.move_to_end(date)
+        return self.cache[date]
+
+      future = self.pending.get(date)
+
+      if future is not None:
+        building = False
+      else:
+        future = Future()
+        self.pending[date] = future
+        building = True
+
+    if not building:
+      return future.result()
+
+    try:
+      value = build()
+    except BaseException as e:
+      with self.lock:
+        del self.pending[date]
+
+      future.set_exception(e)
+      raise
+
+    with self.lock:
+      del self.pending[date]
+      self.cache[date] = value
+
+      if len(self.cache) > self.size:
+        self.cache.popitem(last=False)
+
+    future.set_result(value)
+    return value
@@ -1,76 +1,267 @@
-# Based on stdlib's heapq, modified to keep track of heap position inside queue item.
-
 import numba as nb
+from numba.experimental import jitclass
+import numpy as np
+
+from .data.misc import grow
+
+
+# Based on stdlib's heapq, modified to work with item ids and to keep track of
+# item positions, so key of a queued item can be decreased.
+@jitclass([
+  ("keys", nb.int32[:]),
+  ("heap", nb.int32[:]),
+  ("positions", nb.int32[:]),
+  ("size", nb.int32),
+])
+class IndexedHeap:
+  """Min-heap of items 0..capacity-1 with int32 keys."""
+
+  def __init__(self, capacity: int):
+    self.keys = np.empty(capacity, np.int32)
+    self.heap = np.empty(capacity, np.int32)
+    self.positions = np.full(capacity, -1, np.int32)
+    self.size = 0
+
+
+  def clear(self):
+    for i in range(self.size):
+      self.positions[self.heap[i]] = -1
+
+    self.size = 0
 
 
-@nb.jit
-def _siftdown(heap, startpos, pos, item):
-  while pos > startpos:
-    parentpos = (pos - 1) >> 1
-    parent = heap[parentpos]
+  def contains(self, item: int) -> bool:
+    return self.positions[item] != -1
 
-    if item < parent:
-      heap[pos] = parent
-      parent.heap_pos = pos
-      pos = parentpos
+
+  def push(self, item: int, key: int):
+    """Pushes item, or changes its key if it's already queued."""
+    pos = self.positions[item]
+    old_key = self.keys[item]
+    self.keys[item] = key
+
+    if pos == -1:
+      self.size += 1
+      self._siftdown(0, self.size - 1, item)
+    elif key < old_key:
+      self._siftdown(0, pos, item)
     else:
-      break
+      self._siftup(pos, item)
+
+
+  def pop(self) -> int:
+    returnitem = self.heap[0]
+    self.positions[returnitem] = -1
+    self.size -= 1
+
+    if self.size > 0:
+      self._siftup(0, self.heap[self.size])
+
+    return returnitem
 
-  heap[pos] = item
-  item.heap_pos = pos
 
+  def _siftdown(self, startpos: int, pos: int, item: int):
+    key = self.keys[item]
 
-@nb.jit
-def _siftup(heap, pos, item):
-  endpos = len(heap)
-  startpos = pos
-  childpos = 2 * pos + 1
+    while pos > startpos:
+      parentpos = (pos - 1) >> 1
+      parent = self.heap[parentpos]
 
-  while childpos < endpos:
-    rightpos = childpos + 1
+      if key < self.keys[parent]:
+        self.heap[pos] = parent
+        self.positions[parent] = pos
+        pos = parentpos
+      else:
+        break
 
-    if rightpos < endpos and not heap[childpos] < heap[rightpos]:
-      childpos = rightpos
+    self.heap[pos] = item
+    self.positions[item] = pos
 
-    child = heap[childpos]
-    heap[pos] = child
-    child.heap_pos = pos
-    pos = childpos
+
+  def _siftup(self, pos: int, item: int):
+    endpos = self.size
+    startpos = pos
     childpos = 2 * pos + 1
 
-  _siftdown(heap, startpos, pos, item)
+    while childpos < endpos:
+      rightpos = childpos + 1
 
+      if rightpos < endpos and not self.keys[self.heap[childpos]] < self.keys[self.heap[rightpos]]:
+        childpos = rightpos
 
-@nb.jit
-def heapify(heap):
-  for i in range((len(heap) // 2) - 1, -1, -1):
-    _siftup(heap, i, heap[i])
+      child = self.heap[childpos]
+      self.heap[pos] = child
+      self.positions[child] = pos
+      pos = childpos
+      childpos = 2 * pos + 1
 
-  for i in range(len(heap) // 2, len(heap)):
-    heap[i].heap_pos = i
+    self._siftdown(startpos, pos, item)
 
 
-@nb.jit
-def heappush(heap, item):
-  pos = len(heap)
-  heap.append(item)
-  _siftdown(heap, 0, pos, item)
+RADIX_BUCKETS = 33
 
 
-@nb.jit
-def heappop(heap):
-  lastelt = heap.pop()
+@jitclass([
+  ("keys", nb.int32[:]),
+  ("queued", nb.bool_[:]),
+  ("size", nb.int32),
+  ("last", nb.int32),
+  ("heads", nb.int32[:]),
+  ("entry_items", nb.int32[:]),
+  ("entry_keys", nb.int32[:]),
+  ("entry_nexts", nb.int32[:]),
+  ("free", nb.int32),
+])
+class RadixHeap:
+  """
+  Min-queue of items 0..capacity-1 for monotone non-negative int32 keys (no
+  key pushed is smaller than the last popped one), like arrival times in
+  Dijkstra's search without estimates. Bucket i holds entries whose keys
+  differ from the last popped key first in bit i-1, so every entry is moved
+  at most 32 times. Changing a key adds a new entry, outdated entries are
+  dropped when they are reached.
+  """
 
-  if heap:
-    returnitem = heap[0]
-    returnitem.heap_pos = -1
-    _siftup(heap, 0, lastelt)
-    return returnitem
+  def __init__(self, capacity: int):
+    self.keys = np.empty(capacity, np.int32)
+    self.queued = np.zeros(capacity, np.bool_)
+    self.size = 0
+    self.last = 0
+    self.heads = np.full(RADIX_BUCKETS, -1, np.int32)
+    self.entry_items = np.empty(capacity, np.int32)
+    self.entry_keys = np.empty(capacity, np.int32)
+    self.entry_nexts = np.empty(capacity, np.int32)
+    self.free = -1
+    self._release_range(0, capacity)
+
+
+  def clear(self):
+    for b in range(RADIX_BUCKETS):
+      e = self.heads[b]
+
+      while e != -1:
+        following = self.entry_nexts[e]
+        self.queued[self.entry_items[e]] = False
+        self._release(e)
+        e = following
+
+      self.heads[b] = -1
+
+    self.size = 0
+    self.last = 0
+
+
+  def contains(self, item: int) -> bool:
+    return self.queued[item]
+
+
+  def push(self, item: int, key: int):
+    """Pushes item, or changes its key if it's already queued."""
+    if not self.queued[item]:
+      self.queued[item] = True
+      self.size += 1
+
+    self.keys[item] = key
+    self._insert(self._acquire(), item, key)
+
+
+  def pop(self) -> int:
+    while True:
+      if self.heads[0] == -1:
+        self._refill()
+
+      e = self.heads[0]
+      self.heads[0] = self.entry_nexts[e]
+      item = self.entry_items[e]
+      key = self.entry_keys[e]
+      self._release(e)
+
+      if self.queued[item] and self.keys[item] == key:
+        self.queued[item] = False
+        self.size -= 1
+        return item
+
+
+  def _refill(self):
+    while self.heads[0] == -1:
+      b = 1
+
+      while self.heads[b] == -1:
+        b += 1
+
+      head = self.heads[b]
+      self.heads[b] = -1
+      min_key = -1
+      e = head
+
+      while e != -1:
+        if self._is_current(e) and (min_key == -1 or self.entry_keys[e] < min_key):
+          min_key = self.entry_keys[e]
+
+        e = self.entry_nexts[e]
+
+      if min_key != -1:
+        self.last = min_key
+
+      e = head
+
+      while e != -1:
+        following = self.entry_nexts[e]
+
+        if self._is_current(e):
+          self._link(e, self._bucket(self.entry_keys[e]))
+        else:
+          self._release(e)
+
+        e = following
+
+
+  def _is_current(self, e: int) -> bool:
+    item = self.entry_items[e]
+    return self.queued[item] and self.keys[item] == self.entry_keys[e]
+
+
+  def _bucket(self, key: int) -> int:
+    diff = key ^ self.last
+    b = 0
+
+    while diff != 0:
+      diff >>= 1
+      b += 1
+
+    return b
+
+
+  def _insert(self, e: int, item: int, key: int):
+    self.entry_items[e] = item
+    self.entry_keys[e] = key
+    self._link(e, self._bucket(key))
+
+
+  def _link(self, e: int, b: int):
+    self.entry_nexts[e] = self.heads[b]
+    self.heads[b] = e
+
+
+  def _acquire(self) -> int:
+    if self.free == -1:
+      capacity = len(self.entry_items)
+      self.entry_items = grow(self.entry_items)
+      self.entry_keys = grow(self.entry_keys)
+      self.entry_nexts = grow(self.entry_nexts)
+      self._release_range(capacity, len(self.entry_items))
+
+    e = self.free
+    self.free = self.entry_nexts[e]
+    return e
+
+
+  def _release(self, e: int):
+    self.entry_nexts[e] = self.free
+    self.free = e
 
-  lastelt.heap_pos = -1
-  return lastelt
 
+  def _release_range(self, beg: int, end: int):
+    for e in range(end - 1, beg - 1, -1):
+      self._release(e)
 
-@nb.jit
-def heapdec(heap, item):
-  _siftdown(heap, 0, item.heap_pos, item)
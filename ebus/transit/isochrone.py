@@ -0,0 +1,219 @@
+import numba as nb
+import numpy as np
+
+from .data.misc import *
+from .data.stops import Stops
+from .params import *
+
+
+@nb.jit
+def isochrone(
+  stops: Stops,
+  arrivals: np.ndarray,
+  start: Point,
+  start_time: int,
+  time_limit: int,
+  cell_size: float = 100.0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+  """
+  Area reachable before time_limit, given arrivals to all stops, as outlines
+  of polygons. The area is a union of circles that can be walked from start
+  and from reached stops in remaining time, rasterized to cells of given size.
+  Returns vertices, offsets of rings in them, component (polygon) of every
+  ring and whether it's a hole. Exterior rings are counterclockwise, holes
+  clockwise, and rings neither cross nor touch.
+  """
+  count = 1
+  for arrival in arrivals:
+    if arrival < time_limit:
+      count += 1
+
+  xs = np.empty(count, np.float32)
+  ys = np.empty(count, np.float32)
+  radii = np.empty(count, np.float32)
+  xs[0] = start.x
+  ys[0] = start.y
+  radii[0] = max(time_limit - start_time, 0) * WALK_SPEED / WALK_DISTANCE_MULTIPLIER
+  i = 1
+
+  for stop_id in range(len(arrivals)):
+    if arrivals[stop_id] < time_limit:
+      xs[i] = stops.xs[stop_id]
+      ys[i] = stops.ys[stop_id]
+      radii[i] = (time_limit - arrivals[stop_id]) * WALK_SPEED / WALK_DISTANCE_MULTIPLIER
+      i += 1
+
+  x0 = np.min(xs - radii)
+  y0 = np.min(ys - radii)
+  width = int(np.ceil((np.max(xs + radii) - x0) / cell_size)) + 1
+  height = int(np.ceil((np.max(ys + radii) - y0) / cell_size)) + 1
+  covered = np.zeros((height, width), np.bool_)
+
+  for i in range(count):
+    r = radii[i]
+    covered[int((ys[i] - y0) / cell_size), int((xs[i] - x0) / cell_size)] = True
+    row_beg = int((ys[i] - r - y0) / cell_size)
+    row_end = min(int((ys[i] + r - y0) / cell_size) + 1, height)
+
+    for row in range(row_beg, row_end):
+      dy = y0 + (row + 0.5) * cell_size - ys[i]
+
+      if abs(dy) > r:
+        continue
+
+      dx = np.sqrt(r*r - dy*dy)
+      col_beg = max(int(np.ceil((xs[i] - dx - x0) / cell_size - 0.5)), 0)
+      col_end = min(int(np.floor((xs[i] + dx - x0) / cell_size - 0.5)) + 1, width)
+      covered[row, col_beg:col_end] = True
+
+  _fill_pinches(covered)
+  return _trace_outlines(covered, x0, y0, cell_size)
+
+
+@nb.jit
+def _fill_pinches(covered):
+  """
+  Covers one of the free cells wherever covered cells touch only by corners,
+  so that outlines never touch themselves or each other.
+  """
+  height, width = covered.shape
+  changed = True
+
+  while changed:
+    changed = False
+
+    for row in range(height - 1):
+      for col in range(width - 1):
+        a = covered[row, col]
+        b = covered[row, col+1]
+        c = covered[row+1, col]
+        d = covered[row+1, col+1]
+
+        if a and d and not b and not c:
+          covered[row, col+1] = True
+          changed = True
+        elif b and c and not a and not d:
+          covered[row, col] = True
+          changed = True
+
+
+# Directions of outline edges: +x, +y, -x, -y
+DIRECTION_ROWS = np.array([0, 1, 0, -1], np.int32)
+DIRECTION_COLS = np.array([1, 0, -1, 0], np.int32)
+
+
+@nb.jit
+def _trace_outlines(covered, x0, y0, cell_size):
+  height, width = covered.shape
+  components = _label_components(covered)
+
+  # Outline edges go from every lattice vertex with covered cell on their
+  # left; without pinches, every vertex has at most one outgoing edge
+  out = np.full((height + 1, width + 1), -1, np.int8)
+
+  for row in range(height):
+    for col in range(width):
+      if not covered[row, col]:
+        continue
+
+      if row == 0 or not covered[row-1, col]:
+        out[row, col] = 0
+
+      if col == width - 1 or not covered[row, col+1]:
+        out[row, col+1] = 1
+
+      if row == height - 1 or not covered[row+1, col]:
+        out[row+1, col+1] = 2
+
+      if col == 0 or not covered[row, col-1]:
+        out[row+1, col] = 3
+
+  vertices = []
+  offsets = [0]
+  ring_components = []
+  holes = []
+
+  for row0 in range(height + 1):
+    for col0 in range(width + 1):
+      if out[row0, col0] == -1:
+        continue
+
+      # Covered cell on the left of the first edge
+      d0 = out[row0, col0]
+      left_row = row0 - 1 if d0 == 2 or d0 == 3 else row0
+      left_col = col0 - 1 if d0 == 1 or d0 == 2 else col0
+      ring_components.append(components[left_row, left_col])
+
+      area = 0.0
+      row = row0
+      col = col0
+      d = -1
+
+      while True:
+        nd = out[row, col]
+        out[row, col] = -1
+
+        # Only corners are kept
+        if nd != d:
+          vertices.append((
+            np.float32(x0 + col * cell_size),
+            np.float32(y0 + row * cell_size),
+          ))
+
+        next_row = row + DIRECTION_ROWS[nd]
+        next_col = col + DIRECTION_COLS[nd]
+        area += col * next_row - next_col * row
+        row = next_row
+        col = next_col
+        d = nd
+
+        if row == row0 and col == col0:
+          break
+
+      offsets.append(len(vertices))
+      holes.append(area < 0)
+
+  result = np.empty((len(vertices), 2), np.float32)
+
+  for i, vertex in enumerate(vertices):
+    result[i, 0] = vertex[0]
+    result[i, 1] = vertex[1]
+
+  return (
+    result,
+    np.array(offsets, np.int32),
+    np.array(ring_components, np.int32),
+    np.array(holes, np.bool_),
+  )
+
+
+@nb.jit
+def _label_components(covered):
+  """Labels of (4-)connected components of covered cells, -1 elsewhere."""
+  height, width = covered.shape
+  labels = np.full((height, width), -1, np.int32)
+  stack = []
+  count = 0
+
+  for row0 in range(height):
+    for col0 in range(width):
+      if not covered[row0, col0] or labels[row0, col0] != -1:
+        continue
+
+      labels[row0, col0] = count
+      stack.append((row0, col0))
+
+      while stack:
+        row, col = stack.pop()
+
+        for d in range(4):
+          r = row + DIRECTION_ROWS[d]
+          c = col + DIRECTION_COLS[d]
+
+          if 0 <= r < height and 0 <= c < width and covered[r, c] and labels[r, c] == -1:
+            labels[r, c] = count
+            stack.append((r, c))
+
+      count += 1
+
+  return labels
@@ -0,0 +1,582 @@
+# Multi-criteria RAPTOR (McRAPTOR), see Delling, Pajor, Werneck:
+# "Round-Based Public Transit Routing", 2012.
+#
+# Labels are compared by arrival time and number of trips (given by round in
+# which label was created) and optionally by walked distance and wheelchair
+# accessibility of used trip instances. All labels are kept in a pool with
+# their parent labels, so paths are only gathered for the resulting plans.
+
+import numba as nb
+from numba.experimental import jitclass
+import numba.types as nbt
+import numpy as np
+
+from .data.misc import *
+from .data.stops import Stops
+from .data.trips import Trips, TripStarts
+from .params import *
+from .plan import *
+from .prospector import *
+
+
+# Optional criteria, arrival time and number of transfers are always used
+WALKING = 1
+WHEELCHAIR = 2
+
+
+@nb.jit
+def get_accessible_starts(trip_starts: TripStarts, accessible_trips: AccessibleTrips) -> np.ndarray:
+  """For every start of trip_starts, whether its trip instance is accessible."""
+  result = np.empty(len(trip_starts.times), np.bool_)
+
+  for trip_id in range(len(trip_starts.offs) - 1):
+    for i in range(trip_starts.offs[trip_id], trip_starts.offs[trip_id+1]):
+      start_time = trip_starts.times[i] - trip_starts.offsets[i]
+      result[i] = accessible_trips.contains((nb.int32(trip_id), trip_starts.services[i], nb.int32(start_time)))
+
+  return result
+
+
+@jitclass([
+  ("stops", nbt_jitc(Stops)),
+  ("trips", nbt_jitc(Trips)),
+  ("trip_starts", nbt_jitc(TripStarts)),
+  ("pickups", nb.bool_[:]),
+  ("accessible", nb.bool_[:]),
+  ("criteria", nb.int32),
+
+  ("near_start", nbt.List(NbtNearStop)),
+  ("destination", NbtPoint),
+  ("near_destination", nbt.List(NbtNearStop)),
+  ("walk_distance", nb.float32),
+
+  ("start_time", nb.int32),
+  ("rounds", nb.int32),
+  ("iteration", nb.int32),
+
+  ("label_count", nb.int32),
+  ("label_arrivals", nb.int32[:]),
+  ("label_walks", nb.int32[:]),
+  ("label_accessible", nb.bool_[:]),
+  ("label_rounds", nb.int32[:]),
+  ("label_stops", nb.int32[:]),
+  ("label_parents", nb.int32[:]),
+  ("label_from_stops", nb.int32[:]),
+  ("label_trip_ids", nb.int32[:]),
+  ("label_details", nb.int32[:]),
+  ("label_nexts", nb.int32[:]),
+  ("label_alive", nb.bool_[:]),
+
+  ("bags", nb.int32[:]),
+  ("targets", nb.int32),
+  ("walk_times", nb.int32[:]),
+
+  ("marked", nb.bool_[:]),
+  ("marked_stops", nb.int32[:]),
+  ("marked_count", nb.int32),
+  ("pending", nb.int32[:]),
+  ("pending_count", nb.int32),
+  ("queued_seqs", nb.int32[:]),
+  ("queued_trips", nb.int32[:]),
+  ("queued_count", nb.int32),
+
+  ("route_starts", nb.int32[:]),
+  ("route_walks", nb.int32[:]),
+  ("route_accessible", nb.bool_[:]),
+  ("route_parents", nb.int32[:]),
+  ("route_stops", nb.int32[:]),
+  ("route_departures", nb.int32[:]),
+  ("route_count", nb.int32),
+])
+class McRaptorTask:
+  def __init__(
+    self,
+    stops: Stops,
+    trips: Trips,
+    pickups: np.ndarray,
+    prospect: Prospect,
+    start_time: int,
+    trip_starts: TripStarts,
+    accessible: np.ndarray,
+    criteria: int,
+    rounds: int = MAX_ROUNDS,
+  ):
+    self.stops = stops
+    self.trips = trips
+    self.trip_starts = trip_starts
+    self.pickups = pickups
+    self.accessible = accessible
+    self.criteria = criteria
+    self.near_start = prospect.near_start
+    self.destination = prospect.destination
+    self.near_destination = prospect.near_destination
+    self.walk_distance = prospect.walk_distance
+
+    self.start_time = start_time
+    self.rounds = rounds
+    self.iteration = 0
+
+    stop_count = stops.count()
+    trip_count = len(trips.routes)
+
+    self.label_count = 0
+    self.label_arrivals = np.empty(stop_count, np.int32)
+    self.label_walks = np.empty(stop_count, np.int32)
+    self.label_accessible = np.empty(stop_count, np.bool_)
+    self.label_rounds = np.empty(stop_count, np.int32)
+    self.label_stops = np.empty(stop_count, np.int32)
+    self.label_parents = np.empty(stop_count, np.int32)
+    self.label_from_stops = np.empty(stop_count, np.int32)
+    self.label_trip_ids = np.empty(stop_count, np.int32)
+    self.label_details = np.empty(stop_count, np.int32)
+    self.label_nexts = np.empty(stop_count, np.int32)
+    self.label_alive = np.empty(stop_count, np.bool_)
+
+    # Heads of linked lists of labels, for every stop and for destination
+    self.bags = np.full(stop_count, -1, np.int32)
+    self.targets = -1
+    self.walk_times = np.full(stop_count, -1, np.int32)
+
+    self.marked = np.zeros(stop_count, np.bool_)
+    self.marked_stops = np.empty(stop_count, np.int32)
+    self.marked_count = 0
+    self.pending = np.empty(stop_count, np.int32)
+    self.pending_count = 0
+    self.queued_seqs = np.full(trip_count, -1, np.int32)
+    self.queued_trips = np.empty(trip_count, np.int32)
+    self.queued_count = 0
+
+    self.route_starts = np.empty(16, np.int32)
+    self.route_walks = np.empty(16, np.int32)
+    self.route_accessible = np.empty(16, np.bool_)
+    self.route_parents = np.empty(16, np.int32)
+    self.route_stops = np.empty(16, np.int32)
+    self.route_departures = np.empty(16, np.int32)
+    self.route_count = 0
+
+
+  def walk_time(self, stop_id: int) -> int:
+    wt = self.walk_times[stop_id]
+
+    if wt != -1:
+      return wt
+
+    wt = -1
+
+    for near in self.near_destination:
+      if near.id == stop_id:
+        wt = nb.int32(near.walk_distance / WALK_SPEED)
+        break
+
+    if wt == -1:
+      a = self.stops[stop_id].position
+      b = self.destination
+      t = np.sqrt((a.x - b.x)**2 + (a.y - b.y)**2) * WALK_DISTANCE_MULTIPLIER / WALK_SPEED
+      wt = nb.int32(t)
+
+    self.walk_times[stop_id] = wt
+    return wt
+
+
+  def ready_time(self, label: int) -> int:
+    """Earliest time a trip can be boarded from label."""
+    if self.label_from_stops[label] == -1:
+      return self.label_arrivals[label]
+
+    return self.label_arrivals[label] + TRANSFER_TIME
+
+
+  def dominates(self, label: int, arrival: int, ready: int, walk: int, accessible: bool) -> bool:
+    """Whether label is at least as good as given values in all used criteria."""
+    if self.label_arrivals[label] > arrival:
+      return False
+
+    # Stops reached directly from start can be left without transfer time,
+    # so ready time is compared as well (destination can't be left at all)
+    if self.label_stops[label] != -1 and self.ready_time(label) > ready:
+      return False
+
+    if self.criteria & WALKING and self.label_walks[label] > walk:
+      return False
+
+    if self.criteria & WHEELCHAIR and accessible and not self.label_accessible[label]:
+      return False
+
+    return True
+
+
+  def insert(self, head: int, k: int, arrival: int, ready: int, walk: int, accessible: bool) -> tuple[int, bool]:
+    """
+    Removes labels of round k dominated by given values from list starting
+    at head. Returns new head of the list and whether given values are
+    dominated by a label of round k or earlier.
+    """
+    new_head = -1
+    tail = -1
+    dominated = False
+    label = head
+
+    while label != -1:
+      next = self.label_nexts[label]
+      keep = self.label_alive[label]
+
+      if keep and not dominated and self.dominates(label, arrival, ready, walk, accessible):
+        dominated = True
+
+      if keep and not dominated and self.label_rounds[label] == k:
+        if (
+          arrival <= self.label_arrivals[label]
+          and (self.label_stops[label] == -1 or ready <= self.ready_time(label))
+          and (not self.criteria & WALKING or walk <= self.label_walks[label])
+          and (not self.criteria & WHEELCHAIR or accessible or not self.label_accessible[label])
+        ):
+          self.label_alive[label] = False
+          keep = False
+
+      if keep:
+        if tail == -1:
+          new_head = label
+        else:
+          self.label_nexts[tail] = label
+
+        tail = label
+
+      label = next
+
+    if tail != -1:
+      self.label_nexts[tail] = -1
+
+    return new_head, dominated
+
+
+  def is_pruned(self, arrival: int, walk: int, accessible: bool) -> bool:
+    """Whether plans continuing from given values can't be better than found ones."""
+    label = self.targets
+
+    while label != -1:
+      if self.label_alive[label] and self.dominates(label, arrival, arrival, walk, accessible):
+        return True
+
+      label = self.label_nexts[label]
+
+    return False
+
+
+  def new_label(
+    self,
+    k: int,
+    stop_id: int,
+    arrival: int,
+    walk: int,
+    accessible: bool,
+    parent: int,
+    from_stop: int,
+    trip_id: int,
+    details: int,
+  ) -> int:
+    if self.label_count == len(self.label_arrivals):
+      self.label_arrivals = grow(self.label_arrivals)
+      self.label_walks = grow(self.label_walks)
+      self.label_accessible = grow(self.label_accessible)
+      self.label_rounds = grow(self.label_rounds)
+      self.label_stops = grow(self.label_stops)
+      self.label_parents = grow(self.label_parents)
+      self.label_from_stops = grow(self.label_from_stops)
+      self.label_trip_ids = grow(self.label_trip_ids)
+      self.label_details = grow(self.label_details)
+      self.label_nexts = grow(self.label_nexts)
+      self.label_alive = grow(self.label_alive)
+
+    label = self.label_count
+    self.label_count += 1
+    self.label_arrivals[label] = arrival
+    self.label_walks[label] = walk
+    self.label_accessible[label] = accessible
+    self.label_rounds[label] = k
+    self.label_stops[label] = stop_id
+    self.label_parents[label] = parent
+    self.label_from_stops[label] = from_stop
+    self.label_trip_ids[label] = trip_id
+    self.label_details[label] = details
+    self.label_alive[label] = True
+    return label
+
+
+  def add_target(self, k: int, arrival: int, walk: int, accessible: bool, parent: int, from_stop: int, distance: int):
+    # Walking only and riding a single trip both mean no transfers
+    k = max(k, 1)
+    head, dominated = self.insert(self.targets, k, arrival, arrival, walk, accessible)
+    self.targets = head
+
+    if dominated:
+      return
+
+    label = self.new_label(k, -1, arrival, walk, accessible, parent, from_stop, -1, distance)
+    self.label_nexts[label] = self.targets
+    self.targets = label
+
+
+  def add_label(
+    self,
+    k: int,
+    stop_id: int,
+    arrival: int,
+    walk: int,
+    accessible: bool,
+    parent: int,
+    from_stop: int,
+    trip_id: int,
+    details: int,
+  ):
+    if self.is_pruned(arrival, walk, accessible):
+      return
+
+    ready = arrival if from_stop == -1 else arrival + TRANSFER_TIME
+    head, dominated = self.insert(self.bags[stop_id], k, arrival, ready, walk, accessible)
+    self.bags[stop_id] = head
+
+    if dominated:
+      return
+
+    label = self.new_label(k, stop_id, arrival, walk, accessible, parent, from_stop, trip_id, details)
+    self.label_nexts[label] = self.bags[stop_id]
+    self.bags[stop_id] = label
+
+    if not self.marked[stop_id]:
+      self.marked[stop_id] = True
+      self.marked_stops[self.marked_count] = stop_id
+      self.marked_count += 1
+
+    if self.pending_count == len(self.pending):
+      self.pending = grow(self.pending)
+
+    self.pending[self.pending_count] = label
+    self.pending_count += 1
+
+    walk_time = self.walk_time(stop_id)
+    distance = nb.int32(walk_time * WALK_SPEED)
+    self.add_target(k, arrival + walk_time, walk + distance, accessible, label, stop_id, distance)
+
+
+  def relax_walks(self, k: int):
+    # Labels created here are relaxed as well, so walks can be chained
+    while self.pending_count > 0:
+      self.pending_count -= 1
+      label = self.pending[self.pending_count]
+
+      if not self.label_alive[label]:
+        continue
+
+      from_stop = self.label_stops[label]
+      arrival = self.label_arrivals[label]
+      walk = self.label_walks[label]
+      accessible = self.label_accessible[label]
+
+      for to_stop, distance in self.stops.get_stop_walks(from_stop):
+        self.add_label(
+          k,
+          to_stop,
+          arrival + int(distance / WALK_SPEED),
+          walk + distance,
+          accessible,
+          label,
+          from_stop,
+          -1,
+          distance,
+        )
+
+
+  def queue_trips(self):
+    for i in range(self.marked_count):
+      stop_id = self.marked_stops[i]
+      self.marked[stop_id] = False
+
+      for trip_id, seq, _ in self.stops.get_stop_trips(stop_id):
+        queued = self.queued_seqs[trip_id]
+
+        if queued == -1:
+          self.queued_seqs[trip_id] = seq
+          self.queued_trips[self.queued_count] = trip_id
+          self.queued_count += 1
+        elif seq < queued:
+          self.queued_seqs[trip_id] = seq
+
+    self.marked_count = 0
+
+
+  def board(self, start_i: int, parent: int, stop_id: int, stop_departure: int):
+    """Adds trip instance boarded after label parent to the route bag."""
+    departure = self.trip_starts.times[start_i] + stop_departure
+    walk = self.label_walks[parent]
+    accessible = self.label_accessible[parent]
+
+    if self.criteria & WHEELCHAIR:
+      accessible = accessible and self.accessible[start_i]
+
+    if self.is_pruned(departure, walk, accessible):
+      return
+
+    start = self.trip_starts.times[start_i]
+    count = 0
+
+    for r in range(self.route_count):
+      if (
+        self.trip_starts.times[self.route_starts[r]] <= start
+        and (not self.criteria & WALKING or self.route_walks[r] <= walk)
+        and (not self.criteria & WHEELCHAIR or self.route_accessible[r] or not accessible)
+      ):
+        return
+
+      dominated = (
+        start <= self.trip_starts.times[self.route_starts[r]]
+        and (not self.criteria & WALKING or walk <= self.route_walks[r])
+        and (not self.criteria & WHEELCHAIR or accessible or not self.route_accessible[r])
+      )
+
+      if not dominated:
+        self.route_starts[count] = self.route_starts[r]
+        self.route_walks[count] = self.route_walks[r]
+        self.route_accessible[count] = self.route_accessible[r]
+        self.route_parents[count] = self.route_parents[r]
+        self.route_stops[count] = self.route_stops[r]
+        self.route_departures[count] = self.route_departures[r]
+        count += 1
+
+    if count == len(self.route_starts):
+      self.route_starts = grow(self.route_starts)
+      self.route_walks = grow(self.route_walks)
+      self.route_accessible = grow(self.route_accessible)
+      self.route_parents = grow(self.route_parents)
+      self.route_stops = grow(self.route_stops)
+      self.route_departures = grow(self.route_departures)
+
+    self.route_starts[count] = start_i
+    self.route_walks[count] = walk
+    self.route_accessible[count] = accessible
+    self.route_parents[count] = parent
+    self.route_stops[count] = stop_id
+    self.route_departures[count] = departure
+    self.route_count = count + 1
+
+
+  def scan_trip(self, k: int, trip_id: int, seq: int):
+    trips = self.trips
+    starts_end = self.trip_starts.offs[trip_id+1]
+    self.route_count = 0
+
+    for i in range(trips.stops_off[trip_id] + seq, trips.stops_off[trip_id+1]):
+      stop_id = trips.stops_ids[i]
+
+      for r in range(self.route_count):
+        self.add_label(
+          k,
+          stop_id,
+          self.trip_starts.times[self.route_starts[r]] + trips.stops_arrivals[i],
+          self.route_walks[r],
+          self.route_accessible[r],
+          self.route_parents[r],
+          self.route_stops[r],
+          trip_id,
+          self.route_departures[r],
+        )
+
+      if not self.pickups[i]:
+        continue
+
+      label = self.bags[stop_id]
+
+      while label != -1:
+        if self.label_alive[label] and self.label_rounds[label] == k-1:
+          ready = self.ready_time(label)
+          start_i = self.trip_starts.next_index(trip_id, ready - trips.stops_departures[i])
+
+          if start_i < starts_end:
+            self.board(start_i, label, stop_id, trips.stops_departures[i])
+
+            # Later trip instance might be accessible when the first isn't
+            if self.criteria & WHEELCHAIR and self.label_accessible[label]:
+              while start_i < starts_end and not self.accessible[start_i]:
+                start_i += 1
+
+              if start_i < starts_end:
+                self.board(start_i, label, stop_id, trips.stops_departures[i])
+
+        label = self.label_nexts[label]
+
+
+  def solve(self):
+    walk_distance = nb.int32(self.walk_distance)
+    walk_arrival = self.start_time + int(self.walk_distance / WALK_SPEED)
+    self.add_target(0, walk_arrival, walk_distance, True, -1, -1, walk_distance)
+
+    for id, dst in self.near_start:
+      distance = nb.int32(dst)
+      arrival = self.start_time + int(dst / WALK_SPEED)
+      self.add_label(0, id, arrival, distance, True, -1, -1, -1, distance)
+
+    self.relax_walks(0)
+
+    for k in range(1, self.rounds + 1):
+      if self.marked_count == 0:
+        break
+
+      self.queue_trips()
+
+      for i in range(self.queued_count):
+        trip_id = self.queued_trips[i]
+        self.scan_trip(k, trip_id, self.queued_seqs[trip_id])
+        self.queued_seqs[trip_id] = -1
+        self.iteration += 1
+
+      self.queued_count = 0
+      self.relax_walks(k)
+
+    return self.gather_plans()
+
+
+  def gather_plans(self):
+    result = nb.typed.List.empty_list(NbtParetoPlan)
+    count = 0
+    label = self.targets
+
+    while label != -1:
+      count += 1
+      label = self.label_nexts[label]
+
+    labels = np.empty(count, np.int32)
+    label = self.targets
+
+    for i in range(count):
+      labels[i] = label
+      label = self.label_nexts[label]
+
+    for label in labels[np.argsort(self.label_arrivals[labels], kind="mergesort")]:
+      result.append(ParetoPlan(
+        Plan(self.label_arrivals[label], self.gather_path(label), self.iteration),
+        nb.int32(self.label_rounds[label] - 1),
+        self.label_walks[label],
+        self.label_accessible[label],
+      ))
+
+    return result
+
+
+  def gather_path(self, label: int):
+    result = nb.typed.List.empty_list(NbtPathSegment)
+
+    while label != -1:
+      result.append(PathSegment(
+        self.label_from_stops[label],
+        self.label_trip_ids[label],
+        self.label_details[label],
+      ))
+
+      label = self.label_parents[label]
+
+    result.reverse()
+    return result
+
+
+@nb.jit(nogil=True)
+def solve_mcraptor(task):
+  return task.solve()
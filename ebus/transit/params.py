@@ -3,3 +3,7 @@ WALK_DISTANCE_MULTIPLIER = 1.1
 TRAM_SPEED = 20
 
 TRANSFER_TIME = 3*60
+
+MAX_ROUNDS = 8 # Max number of trips in a plan found by round-based engines
+CONNECTIONS_END = 30*60*60 # Connections of next day departing later aren't scanned by CSA
+BOUNDS_CELL_SIZE = 250 # Side of destination cells for which lower bounds are cached (meters)
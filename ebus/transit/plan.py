@@ -0,0 +1,41 @@
+import numba as nb
+import numba.types as nbt
+from typing import NamedTuple
+
+
+class PathSegment(NamedTuple):
+  from_stop: int
+  trip_id: int
+  details: int # departure if trip_id != -1, walk distance otherwise
+
+
+class Plan(NamedTuple):
+  arrival: int
+  path: list[PathSegment]
+  iterations: int
+
+
+NbtPathSegment = nbt.NamedUniTuple(nb.int32, 3, PathSegment)
+NbtPlan = nbt.NamedTuple([nb.int32, nbt.ListType(NbtPathSegment), nb.int32], Plan)
+
+@nb.jit
+def empty_segment():
+  return PathSegment(nb.int32(-1), nb.int32(-1), nb.int32(-1))
+
+
+class ProfileEntry(NamedTuple):
+  departure: int
+  plan: Plan
+
+
+NbtProfileEntry = nbt.NamedTuple([nb.int32, NbtPlan], ProfileEntry)
+
+
+class ParetoPlan(NamedTuple):
+  plan: Plan
+  transfers: int
+  walk_distance: int
+  accessible: bool
+
+
+NbtParetoPlan = nbt.NamedTuple([NbtPlan, nb.int32, nb.int32, nb.bool_], ParetoPlan)
@@ -0,0 +1,478 @@
+# Round-based public transit routing (RAPTOR), see Delling, Pajor, Werneck:
+# "Round-Based Public Transit Routing", 2012.
+#
+# Every trip already is a route pattern (all of its starts share the same stop
+# sequence and relative times), so trips are scanned directly, without any
+# additional preprocessing apart from pickup flags of trip stops.
+
+import numba as nb
+from numba.experimental import jitclass
+import numba.types as nbt
+import numpy as np
+
+from .data.misc import *
+from .data.stops import Stops
+from .data.trips import Trips, TripStarts
+from .params import *
+from .plan import *
+from .prospector import *
+
+
+@nb.jit
+def get_pickups(stops: Stops, trips: Trips) -> np.ndarray:
+  """For every entry of trips.stops_ids, whether boarding there is possible."""
+  result = np.zeros(len(trips.stops_ids), np.bool_)
+
+  for i in range(len(stops.trips_ids)):
+    result[trips.stops_off[stops.trips_ids[i]] + stops.trips_seqs[i]] = True
+
+  return result
+
+
+@jitclass([
+  ("stops", nbt_jitc(Stops)),
+  ("trips", nbt_jitc(Trips)),
+  ("trip_starts", nbt_jitc(TripStarts)),
+  ("pickups", nb.bool_[:]),
+
+  ("near_start", nbt.List(NbtNearStop)),
+  ("destination", NbtPoint),
+  ("near_destination", nbt.List(NbtNearStop)),
+  ("walk_distance", nb.float32),
+
+  ("start_time", nb.int32),
+  ("rounds", nb.int32),
+  ("iteration", nb.int32),
+  ("arrival", nb.int32),
+  ("arrival_round", nb.int32),
+  ("path_tail", NbtPathSegment),
+
+  ("arrivals", nb.int32[:, :]),
+  ("from_stops", nb.int32[:, :]),
+  ("trip_ids", nb.int32[:, :]),
+  ("details", nb.int32[:, :]),
+  ("best", nb.int32[:]),
+  ("starts", nb.int32[:]),
+  ("start_walks", nb.int32[:]),
+  ("walk_times", nb.int32[:]),
+
+  ("marked", nb.bool_[:]),
+  ("marked_stops", nb.int32[:]),
+  ("marked_count", nb.int32),
+  ("touched", nb.bool_[:]),
+  ("touched_stops", nb.int32[:]),
+  ("touched_count", nb.int32),
+  ("queued_seqs", nb.int32[:]),
+  ("queued_trips", nb.int32[:]),
+  ("queued_count", nb.int32),
+  ("pending", nb.int32[:]),
+])
+class RaptorTask:
+  def __init__(
+    self,
+    stops: Stops,
+    trips: Trips,
+    pickups: np.ndarray,
+    prospect: Prospect,
+    start_time: int,
+    trip_starts: TripStarts,
+    rounds: int = MAX_ROUNDS,
+  ):
+    self.stops = stops
+    self.trips = trips
+    self.trip_starts = trip_starts
+    self.pickups = pickups
+    self.near_start = prospect.near_start
+    self.destination = prospect.destination
+    self.near_destination = prospect.near_destination
+    self.walk_distance = prospect.walk_distance
+
+    self.start_time = start_time
+    self.rounds = rounds
+    self.iteration = 0
+    self.arrival = INF_TIME
+    self.arrival_round = 0
+    self.path_tail = empty_segment()
+
+    stop_count = stops.count()
+    trip_count = len(trips.routes)
+
+    # Row k holds labels of plans with at most k trips. Path tails are only
+    # written when label improves, so label set in an earlier round is found
+    # by looking for the first row that has the same arrival.
+    self.arrivals = np.full((rounds + 1, stop_count), INF_TIME, np.int32)
+    self.from_stops = np.empty((rounds + 1, stop_count), np.int32)
+    self.trip_ids = np.empty((rounds + 1, stop_count), np.int32)
+    self.details = np.empty((rounds + 1, stop_count), np.int32)
+    self.best = np.full(stop_count, INF_TIME, np.int32)
+    self.starts = np.full(stop_count, INF_TIME, np.int32)
+    self.start_walks = np.empty(stop_count, np.int32)
+    self.walk_times = np.full(stop_count, -1, np.int32)
+
+    self.marked = np.zeros(stop_count, np.bool_)
+    self.marked_stops = np.empty(stop_count, np.int32)
+    self.marked_count = 0
+    self.touched = np.zeros(stop_count, np.bool_)
+    self.touched_stops = np.empty(stop_count, np.int32)
+    self.touched_count = 0
+    self.queued_seqs = np.full(trip_count, -1, np.int32)
+    self.queued_trips = np.empty(trip_count, np.int32)
+    self.queued_count = 0
+    self.pending = np.empty(stop_count, np.int32)
+
+
+  def walk_time(self, stop_id: int) -> int:
+    wt = self.walk_times[stop_id]
+
+    if wt != -1:
+      return wt
+
+    wt = -1
+
+    for near in self.near_destination:
+      if near.id == stop_id:
+        wt = nb.int32(near.walk_distance / WALK_SPEED)
+        break
+
+    if wt == -1:
+      a = self.stops[stop_id].position
+      b = self.destination
+      t = np.sqrt((a.x - b.x)**2 + (a.y - b.y)**2) * WALK_DISTANCE_MULTIPLIER / WALK_SPEED
+      wt = nb.int32(t)
+
+    self.walk_times[stop_id] = wt
+    return wt
+
+
+  def improve(self, k: int, stop_id: int, arrival: int, from_stop: int, trip_id: int, details: int) -> bool:
+    if arrival >= min(self.best[stop_id], self.arrival):
+      return False
+
+    self.arrivals[k, stop_id] = arrival
+    self.from_stops[k, stop_id] = from_stop
+    self.trip_ids[k, stop_id] = trip_id
+    self.details[k, stop_id] = details
+    self.best[stop_id] = arrival
+    self.mark(stop_id)
+
+    if not self.touched[stop_id]:
+      self.touched[stop_id] = True
+      self.touched_stops[self.touched_count] = stop_id
+      self.touched_count += 1
+
+    walk_time = self.walk_time(stop_id)
+
+    if arrival + walk_time < self.arrival:
+      self.arrival = arrival + walk_time
+      self.arrival_round = k
+      self.path_tail = PathSegment(nb.int32(stop_id), nb.int32(-1), nb.int32(walk_time*WALK_SPEED))
+
+    return True
+
+
+  def mark(self, stop_id: int):
+    if not self.marked[stop_id]:
+      self.marked[stop_id] = True
+      self.marked_stops[self.marked_count] = stop_id
+      self.marked_count += 1
+
+
+  def settled_round(self, k: int, stop_id: int) -> int:
+    """Round in which label of stop_id, as seen in round k, was set."""
+    while k > 0 and self.arrivals[k-1, stop_id] == self.arrivals[k, stop_id]:
+      k -= 1
+
+    return k
+
+
+  def ready_time(self, k: int, stop_id: int) -> int:
+    """Earliest time at which a trip can be boarded at stop_id after round k."""
+    return min(self.arrivals[k, stop_id] + TRANSFER_TIME, self.starts[stop_id])
+
+
+  def start(self, start_time: int):
+    for i in range(self.marked_count):
+      self.marked[self.marked_stops[i]] = False
+
+    for i in range(self.touched_count):
+      self.touched[self.touched_stops[i]] = False
+
+    self.marked_count = 0
+    self.touched_count = 0
+    self.start_time = start_time
+    walk_arrival = start_time + int(self.walk_distance / WALK_SPEED)
+
+    if walk_arrival < self.arrival:
+      self.arrival = walk_arrival
+      self.arrival_round = 0
+      self.path_tail = PathSegment(nb.int32(-1), nb.int32(-1), nb.int32(self.walk_distance))
+
+    for id, dst in self.near_start:
+      arrival = start_time + int(dst / WALK_SPEED)
+      self.starts[id] = arrival
+      self.start_walks[id] = nb.int32(dst)
+      self.improve(0, id, arrival, -1, -1, nb.int32(dst))
+
+      # Label from a later start might have earlier arrival, but no transfer
+      # time is needed after initial walk, so trips are worth scanning anyway
+      self.mark(id)
+
+
+  def merge_round(self, k: int):
+    # Labels of plans with fewer trips are valid in later rounds as well
+    for i in range(self.touched_count):
+      stop_id = self.touched_stops[i]
+      self.arrivals[k, stop_id] = min(self.arrivals[k, stop_id], self.arrivals[k-1, stop_id])
+
+
+  def queue_trips(self):
+    for i in range(self.marked_count):
+      stop_id = self.marked_stops[i]
+      self.marked[stop_id] = False
+
+      for trip_id, seq, _ in self.stops.get_stop_trips(stop_id):
+        queued = self.queued_seqs[trip_id]
+
+        if queued == -1:
+          self.queued_seqs[trip_id] = seq
+          self.queued_trips[self.queued_count] = trip_id
+          self.queued_count += 1
+        elif seq < queued:
+          self.queued_seqs[trip_id] = seq
+
+    self.marked_count = 0
+
+
+  def scan_trip(self, k: int, trip_id: int, seq: int):
+    trips = self.trips
+    start = INF_TIME
+    board_stop = -1
+    board_departure = -1
+
+    for i in range(trips.stops_off[trip_id] + seq, trips.stops_off[trip_id+1]):
+      stop_id = trips.stops_ids[i]
+
+      if start != INF_TIME:
+        self.improve(k, stop_id, start + trips.stops_arrivals[i], board_stop, trip_id, board_departure)
+
+      if not self.pickups[i] or self.arrivals[k-1, stop_id] == INF_TIME:
+        continue
+
+      earliest = self.ready_time(k-1, stop_id) - trips.stops_departures[i]
+
+      if earliest >= start:
+        continue
+
+      next_start = self.trip_starts.get_next_start(trip_id, earliest).time
+      departure = next_start + trips.stops_departures[i]
+
+      if next_start < start and departure < self.arrival:
+        start = next_start
+        board_stop = stop_id
+        board_departure = departure
+
+
+  def relax_walks(self, k: int):
+    # Stops improved here are relaxed as well, so walks can be chained, just
+    # like in RouterTask. That includes stops relaxed before in this round,
+    # which are still marked, so they're kept on a separate stack.
+    pending = self.pending
+    count = self.marked_count
+    pending[:count] = self.marked_stops[:count]
+
+    while count > 0:
+      count -= 1
+      from_stop = pending[count]
+      arrival = self.arrivals[k, from_stop]
+
+      for to_stop, distance in self.stops.get_stop_walks(from_stop):
+        if self.improve(k, to_stop, arrival + int(distance / WALK_SPEED), from_stop, -1, distance):
+          if count == len(pending):
+            pending = grow(pending)
+            self.pending = pending
+
+          pending[count] = to_stop
+          count += 1
+
+
+  def run(self):
+    self.relax_walks(0)
+
+    for k in range(1, self.rounds + 1):
+      self.merge_round(k)
+
+      if self.marked_count == 0:
+        continue
+
+      self.queue_trips()
+
+      for i in range(self.queued_count):
+        trip_id = self.queued_trips[i]
+        self.scan_trip(k, trip_id, self.queued_seqs[trip_id])
+        self.queued_seqs[trip_id] = -1
+        self.iteration += 1
+
+      self.queued_count = 0
+      self.relax_walks(k)
+
+
+  def solve(self) -> Plan:
+    self.start(self.start_time)
+    self.run()
+    return Plan(self.arrival, self.gather_path(), self.iteration)
+
+
+  def solve_profile(self, time_to: int):
+    """
+    rRAPTOR: all plans departing between self.start_time and time_to, which
+    aren't dominated by another plan that departs later and arrives earlier
+    (or by just walking). Labels are kept between runs for consecutive
+    departures, latest first, so every run only explores what is improved.
+
+    Walking to destination can start at any time, so it's only reported once,
+    departing at time_to, unless a plan with trips departing then is faster.
+    """
+    result = nb.typed.List.empty_list(NbtProfileEntry)
+    departures = self.get_departures(self.start_time, time_to)
+
+    if len(departures) == 0 or departures[-1] != time_to:
+      departures = np.append(departures, np.int32(time_to))
+
+    for departure in departures[::-1]:
+      arrival = self.arrival
+      self.start(departure)
+      self.run()
+
+      if self.arrival < arrival:
+        path = self.gather_path()
+        walk_only = True
+
+        for segment in path:
+          if segment.trip_id != -1:
+            walk_only = False
+            break
+
+        if not walk_only or departure == time_to:
+          result.append(ProfileEntry(departure, Plan(self.arrival, path, self.iteration)))
+
+    result.reverse()
+    return result
+
+
+  def get_departures(self, time_from: int, time_to: int) -> np.ndarray:
+    """
+    Sorted departure times (from start) at which a trip can be caught just in
+    time, at a stop reached by initial walks, so that walking is still faster
+    than going to destination on foot.
+    """
+    departures = nb.typed.List.empty_list(nb.int32)
+    ready_times = self.get_ready_times(int(self.walk_distance / WALK_SPEED))
+
+    for id in range(len(ready_times)):
+      ready_time = ready_times[id]
+
+      if ready_time == INF_TIME:
+        continue
+
+      for trip_id, _, stop_departure in self.stops.get_stop_trips(id):
+        earliest = time_from + ready_time - stop_departure
+
+        while True:
+          start = self.trip_starts.get_next_start(trip_id, earliest).time
+          departure = start + stop_departure - ready_time
+
+          if start == INF_TIME or departure > time_to:
+            break
+
+          departures.append(nb.int32(departure))
+          earliest = start + 1
+
+    result = np.empty(len(departures), np.int32)
+
+    for i in range(len(departures)):
+      result[i] = departures[i]
+
+    return np.unique(result)
+
+
+  def get_ready_times(self, limit: int) -> np.ndarray:
+    """
+    Time from start until a trip can be boarded at every stop, as in
+    ready_time after initial walks, or INF_TIME if that walk takes limit or
+    longer.
+    """
+    walks = np.full(self.stops.count(), INF_TIME, np.int32)
+    result = np.full(self.stops.count(), INF_TIME, np.int32)
+    pending = np.empty(16, np.int32)
+    count = 0
+
+    for id, dst in self.near_start:
+      walk = int(dst / WALK_SPEED)
+
+      if walk < min(walks[id], limit):
+        walks[id] = walk
+        result[id] = walk
+
+        if count == len(pending):
+          pending = grow(pending)
+
+        pending[count] = id
+        count += 1
+
+    while count > 0:
+      count -= 1
+      from_stop = pending[count]
+
+      for to_stop, distance in self.stops.get_stop_walks(from_stop):
+        walk = walks[from_stop] + int(distance / WALK_SPEED)
+
+        if walk < min(walks[to_stop], limit):
+          walks[to_stop] = walk
+          result[to_stop] = min(result[to_stop], walk + TRANSFER_TIME)
+
+          if count == len(pending):
+            pending = grow(pending)
+
+          pending[count] = to_stop
+          count += 1
+
+    return result
+
+
+  def gather_path(self):
+    result = nb.typed.List.empty_list(NbtPathSegment)
+    segment = self.path_tail
+    k = self.arrival_round
+
+    while True:
+      result.append(segment)
+
+      if segment.from_stop == -1:
+        result.reverse()
+        return result
+
+      stop_id = segment.from_stop
+
+      if segment.trip_id != -1 and self.starts[stop_id] <= segment.details:
+        segment = PathSegment(nb.int32(-1), nb.int32(-1), self.start_walks[stop_id])
+        continue
+
+      k = self.settled_round(k, stop_id)
+
+      segment = PathSegment(
+        self.from_stops[k, stop_id],
+        self.trip_ids[k, stop_id],
+        self.details[k, stop_id],
+      )
+
+      if segment.trip_id != -1:
+        k -= 1
+
+
+@nb.jit(nogil=True)
+def solve_raptor(task):
+  return task.solve()
+
+@nb.jit(nogil=True)
+def solve_raptor_profile(task, time_to):
+  return task.solve_profile(time_to)
@@ -1,37 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
 import datetime
 import math
 import numba as nb
 from numba.experimental import jitclass
 import numba.types as nbt
 import numpy as np
-from typing import NamedTuple
-
+import os
+import threading
+from time import perf_counter
+from typing import Callable, Iterable, NamedTuple, TypeVar
+
+from .backward import *
+from .bounds import *
+from .csa import *
 from .data.misc import *
 from .data.stops import Stops
-from .data.trips import Trips
+from .data.trips import Trips, TripStarts, get_trip_starts
+from .datecache import DateCache
 from .heapq import *
+from .mcraptor import *
 from .params import *
+from .plan import *
 from .prospector import *
+from .raptor import *
 from .transitdb import *
+from .tripbased import *
+
+T = TypeVar("T")
+U = TypeVar("U")
 
 
-class PathSegment(NamedTuple):
-  from_stop: int
-  trip_id: int
-  details: int # departure if trip_id != -1, walk distance otherwise
+class RouteQuery(NamedTuple):
+  start: Coords|Point|int
+  destination: Coords|Point|int
+  date_or_services: datetime.date|Services|None
+  time: datetime.time|int|None
 
 
-class Plan(NamedTuple):
-  arrival: int
-  path: list[PathSegment]
-  iterations: int
+class RouteResult(NamedTuple):
+  plan: Plan
+  prospect_time: float
+  solve_time: float
 
 
 class Router:
+  """
+  Router pools its RouterTask and uses a TransitDb cursor, so a single
+  instance must only be used by one thread at a time. Other threads should
+  use their own clones, which share all date caches and precomputed data.
+  """
   tdb: TransitDb
   clustertimes: np.ndarray
   stops: Stops
   trips: Trips
+  pickups: np.ndarray
+  starts: DateCache
+  connections: DateCache
+  accessible: DateCache
+  accessible_trips: AccessibleTrips|None
+  transfers: Transfers|None
+  reverse: ReverseIndex|None
+  bound_graph: DateCache
+  lower_bounds: DateCache
+  task: "RouterTask|None"
 
   def __init__(
     self,
@@ -39,11 +70,30 @@ class Router:
     clustertimes = None,
     stops = None,
     trips = None,
+    pickups = None,
+    starts = None,
+    connections = None,
+    accessible = None,
+    transfers = None,
+    reverse = None,
+    bound_graph = None,
+    lower_bounds = None,
   ):
     self.tdb = tdb
     self.clustertimes = clustertimes if clustertimes is not None else np.empty((0, 0), np.int32)
     self.stops = stops or tdb.get_stops()
     self.trips = trips or tdb.get_trips()
+    self.pickups = pickups if pickups is not None else get_pickups(self.stops, self.trips)
+    self.starts = starts or DateCache()
+    self.connections = connections or DateCache()
+    self.accessible = accessible or DateCache()
+    self.accessible_trips = None
+    self.transfers = transfers
+    self.reverse = reverse
+    self.bound_graph = bound_graph or DateCache(1)
+    self.lower_bounds = lower_bounds or DateCache(64)
+    self.task = None
+    self.csa_task = None
 
 
   def clone(self):
@@ -52,6 +102,14 @@ class Router:
       self.clustertimes,
       self.stops,
       self.trips,
+      self.pickups,
+      self.starts,
+      self.connections,
+      self.accessible,
+      self.transfers,
+      self.reverse,
+      self.bound_graph,
+      self.lower_bounds,
     )
 
 
@@ -60,86 +118,377 @@ class Router:
       prospect: Prospect,
       date_or_services: datetime.date|Services|None,
       time: datetime.time|int|None,
+      engine: str = "dijkstra",
+      exact_bounds: bool = False,
   ) -> Plan:
+    """
+    With exact_bounds, dijkstra engine is guided by lower bounds of travel
+    times to destination (see get_lower_bounds) instead of clustertimes, so
+    found plans are optimal.
+    """
+    if exact_bounds and engine != "dijkstra":
+      raise Exception(f"Router.find_route: engine '{engine}' doesn't use lower bounds")
+
+    bounds = self.get_lower_bounds(prospect) if exact_bounds else None
+
     if date_or_services is None or time is None:
-      timeless = True
+      if engine != "dijkstra":
+        raise Exception(f"Router.find_route: engine '{engine}' doesn't support timeless search")
+
+      task = self.get_task(prospect, 0, TripStarts.empty(len(self.trips.routes)), bounds=bounds)
+      return solve_timeless(task)
+
+    start_time = _seconds(time)
+
+    match engine:
+      case "dijkstra":
+        task = self.get_task(prospect, start_time, self.get_starts(date_or_services), bounds=bounds)
+        return solve(task)
+
+      case "raptor":
+        task = RaptorTask(
+          self.stops,
+          self.trips,
+          self.pickups,
+          prospect,
+          start_time,
+          self.get_starts(date_or_services),
+        )
+
+        return solve_raptor(task)
+
+      case "csa":
+        task = self.get_csa_task(prospect, start_time, self.get_connections(date_or_services))
+        return solve_csa(task)
+
+      case "tripbased":
+        if self.transfers is None:
+          raise Exception("Router.find_route: engine 'tripbased' needs precomputed transfers")
+
+        task = TripBasedTask(
+          self.stops,
+          self.trips,
+          self.transfers,
+          self.pickups,
+          prospect,
+          start_time,
+          self.get_starts(date_or_services),
+        )
+
+        return solve_tripbased(task)
+
+      case _:
+        raise Exception(f"Router.find_route: unknown engine '{engine}'")
+
+
+  def find_route_arrive_by(
+      self,
+      prospect: Prospect,
+      date_or_services: datetime.date|Services,
+      time: datetime.time|int,
+  ) -> ProfileEntry:
+    """
+    Latest departure from start which arrives at destination by given time,
+    with its plan, found by a single backward search.
+    """
+    task = BackwardRaptorTask(
+      self.stops,
+      self.trips,
+      self.pickups,
+      self.get_reverse_index(),
+      prospect,
+      _seconds(time),
+      self.get_starts(date_or_services),
+    )
+
+    return solve_backward(task)
+
+
+  def find_profile(
+      self,
+      prospect: Prospect,
+      date_or_services: datetime.date|Services,
+      time_from: datetime.time|int,
+      time_to: datetime.time|int,
+  ) -> list[ProfileEntry]:
+    """Pareto-optimal (departure, arrival) plans departing in given window."""
+    task = RaptorTask(
+      self.stops,
+      self.trips,
+      self.pickups,
+      prospect,
+      _seconds(time_from),
+      self.get_starts(date_or_services),
+    )
+
+    return list(solve_raptor_profile(task, _seconds(time_to)))
+
+
+  def one_to_all(
+      self,
+      prospect_or_stop: Prospect|int,
+      date_or_services: datetime.date|Services|None = None,
+      time: datetime.time|int|None = None,
+      max_duration: int|None = None,
+  ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Earliest arrivals to all stops (INF_TIME if unreachable) and stops from
+    which they are reached (-1 for stops near start), found by a single
+    exhaustive search. Without date and time, trips are assumed to depart
+    whenever needed, like in timeless find_route. With max_duration, stops
+    reached later than that after start are treated as unreachable.
+    """
+    timeless = date_or_services is None or time is None
+
+    if timeless:
       start_time = 0
-      services = Services.empty()
+      trip_starts = TripStarts.empty(len(self.trips.routes))
     else:
-      timeless = False
+      start_time = _seconds(time)
+      trip_starts = self.get_starts(date_or_services)
 
-      if isinstance(time, int):
-        start_time = time
-      else:
-        start_time = time.hour * 60*60 + time.minute * 60 + time.second
+    return self._one_to_all(prospect_or_stop, start_time, trip_starts, timeless, max_duration)
 
-      if isinstance(date_or_services, Services):
-        services = date_or_services
-      else:
-        services = self.tdb.get_services(date_or_services)
 
-    task = RouterTask(
+  def matrix(
+      self,
+      origins: list[Prospect|int],
+      destinations: list[int]|np.ndarray,
+      date_or_services: datetime.date|Services|None = None,
+      time: datetime.time|int|None = None,
+      max_duration: int|None = None,
+      workers: int|None = None,
+  ) -> np.ndarray:
+    """
+    Travel times from origins (prospects or stops) to destination stops
+    (INF_TIME if unreachable), one one-to-all search per origin, run by
+    clones of the router in a thread pool.
+    """
+    destinations = np.asarray(destinations, np.int32)
+    timeless = date_or_services is None or time is None
+
+    if timeless:
+      start_time = 0
+      trip_starts = TripStarts.empty(len(self.trips.routes))
+    else:
+      start_time = _seconds(time)
+      trip_starts = self.get_starts(date_or_services)
+
+    def travel_times(router, origin):
+      arrivals, _ = router._one_to_all(origin, start_time, trip_starts, timeless, max_duration)
+      result = arrivals[destinations]
+      return np.where(result == INF_TIME, INF_TIME, result - start_time)
+
+    rows = self.map_clones(travel_times, origins, workers)
+    return np.array(rows, np.int32).reshape(len(origins), len(destinations))
+
+
+  def route_many(
+      self,
+      queries: Iterable[RouteQuery],
+      prospector: Prospector,
+      engine: str = "dijkstra",
+      workers: int|None = None,
+  ) -> list[RouteResult]:
+    """
+    Results of find_route for all queries in order. Every distinct pair of
+    start and destination is prospected once, prospecting and searches are
+    run in thread pools with clones of prospector and router.
+    """
+    queries = list(queries)
+    endpoints = list(dict.fromkeys((q.start, q.destination) for q in queries))
+
+    def prospect(prospector, endpoint):
+      t0 = perf_counter()
+      result = prospector.prospect(*endpoint)
+      return result, perf_counter() - t0
+
+    prospects = dict(zip(endpoints, map_clones(prospector, prospect, endpoints, workers)))
+
+    def route(router, query):
+      prospect, prospect_time = prospects[(query.start, query.destination)]
+      t0 = perf_counter()
+      plan = router.find_route(prospect, query.date_or_services, query.time, engine)
+      return RouteResult(plan, prospect_time, perf_counter() - t0)
+
+    return map_clones(self, route, queries, workers)
+
+
+  def map_clones(self, fn: Callable[["Router", T], U], items: Iterable[T], workers: int|None = None) -> list[U]:
+    return map_clones(self, fn, items, workers)
+
+
+  def _one_to_all(
+      self,
+      prospect_or_stop: Prospect|int,
+      start_time: int,
+      trip_starts: TripStarts,
+      timeless: bool,
+      max_duration: int|None,
+  ) -> tuple[np.ndarray, np.ndarray]:
+    if isinstance(prospect_or_stop, Prospect):
+      prospect = prospect_or_stop
+    else:
+      prospect = stop_prospect(self.stops, prospect_or_stop)
+
+    if max_duration is None:
+      time_limit = INF_TIME
+    else:
+      time_limit = start_time + max_duration
+
+    task = self.get_task(prospect, start_time, trip_starts, True, time_limit)
+    return solve_one_to_all(task, timeless)
+
+
+  def find_pareto(
+      self,
+      prospect: Prospect,
+      date_or_services: datetime.date|Services,
+      time: datetime.time|int,
+      criteria: int = WALKING | WHEELCHAIR,
+  ) -> list[ParetoPlan]:
+    """
+    Pareto-optimal plans by arrival, number of transfers and criteria given
+    by flags WALKING (walked distance) and WHEELCHAIR (accessibility of all
+    used trip instances), sorted by arrival.
+    """
+    task = McRaptorTask(
       self.stops,
       self.trips,
-      self.clustertimes,
+      self.pickups,
       prospect,
-      start_time,
-      services,
+      _seconds(time),
+      self.get_starts(date_or_services),
+      self.get_accessible(date_or_services, criteria),
+      criteria,
     )
 
-    if timeless:
-      return solve_timeless(task)
+    return list(solve_mcraptor(task))
+
+
+  def get_lower_bounds(self, prospect: Prospect) -> np.ndarray:
+    """
+    Lower bounds of travel times from all stops to the cell of prospect's
+    destination, cached per cell.
+    """
+    # Held in a cache shared by clones, so it's built once
+    graph = self.bound_graph.get(None, lambda: get_bound_graph(self.stops, self.trips))
+    col = math.floor(prospect.destination.x / BOUNDS_CELL_SIZE)
+    row = math.floor(prospect.destination.y / BOUNDS_CELL_SIZE)
+    x0 = col * BOUNDS_CELL_SIZE
+    y0 = row * BOUNDS_CELL_SIZE
+
+    build = lambda: get_lower_bounds(graph, self.stops, x0, y0, x0 + BOUNDS_CELL_SIZE, y0 + BOUNDS_CELL_SIZE)
+    return self.lower_bounds.get((col, row), build)
+
+
+  def get_reverse_index(self) -> ReverseIndex:
+    if self.reverse is None:
+      self.reverse = get_reverse_index(self.stops, self.trips)
+
+    return self.reverse
+
+
+  def get_starts(self, date_or_services: datetime.date|Services) -> TripStarts:
+    if isinstance(date_or_services, Services):
+      return get_trip_starts(self.trips, date_or_services)
+
+    date = date_or_services
+    return self.starts.get(date, lambda: get_trip_starts(self.trips, self.tdb.get_services(date)))
+
+
+  def get_accessible(self, date_or_services: datetime.date|Services, criteria: int) -> np.ndarray:
+    if not criteria & WHEELCHAIR:
+      return np.empty(0, np.bool_)
+
+    if self.accessible_trips is None:
+      self.accessible_trips = self.tdb.get_accessible_trips()
+
+    if isinstance(date_or_services, Services):
+      return get_accessible_starts(self.get_starts(date_or_services), self.accessible_trips)
+
+    date = date_or_services
+    build = lambda: get_accessible_starts(self.get_starts(date), self.accessible_trips)
+    return self.accessible.get(date, build)
+
+
+  def get_task(
+      self,
+      prospect: Prospect,
+      start_time: int,
+      trip_starts: TripStarts,
+      exhaustive: bool = False,
+      time_limit: int = INF_TIME,
+      bounds: np.ndarray|None = None,
+  ) -> "RouterTask":
+    if self.task is None:
+      self.task = RouterTask(
+        self.stops,
+        self.trips,
+        self.clustertimes,
+        prospect,
+        start_time,
+        trip_starts,
+        exhaustive,
+        time_limit,
+        bounds,
+      )
     else:
-      return solve(task)
+      self.task.start(prospect, start_time, trip_starts, exhaustive, time_limit, bounds)
 
+    return self.task
 
-def nbt_jitc(cls):
-  if nb.config.DISABLE_JIT:
-    return None
-  else:
-    return cls.class_type.instance_type
 
-NbtPathSegment = nbt.NamedUniTuple(nb.int32, 3, PathSegment)
-NbtPlan = nbt.NamedTuple([nb.int32, nbt.ListType(NbtPathSegment), nb.int32], Plan)
+  def get_csa_task(self, prospect: Prospect, start_time: int, connections: Connections) -> CsaTask:
+    if self.csa_task is None:
+      self.csa_task = CsaTask(self.stops, connections, prospect, start_time)
+    else:
+      self.csa_task.start(prospect, start_time, connections)
 
-@nb.jit
-def empty_segment():
-  return PathSegment(nb.int32(-1), nb.int32(-1), nb.int32(-1))
+    return self.csa_task
 
 
-@jitclass([
-  ("arrival", nb.int32),
-  ("estimate", nb.int32),
-  ("heap_pos", nb.int32),
-  ("stop_id", nb.int32),
-  ("walk_time", nb.int32),
-  ("path_tail", NbtPathSegment),
-])
-class Node:
-  def __init__(
-    self,
-    stop_id: int,
-    estimate: int,
-    walk_time: int,
-  ):
-    self.arrival = INF_TIME
-    self.estimate = estimate
-    self.heap_pos = -1
-    self.stop_id = stop_id
-    self.walk_time = walk_time
-    self.path_tail = empty_segment()
+  def get_connections(self, date_or_services: datetime.date|Services) -> Connections:
+    if isinstance(date_or_services, Services):
+      return build_connections(self.trips, self.pickups, self.get_starts(date_or_services))
+
+    date = date_or_services
+    return self.connections.get(date, lambda: build_connections(self.trips, self.pickups, self.get_starts(date)))
 
-  def __lt__(self, other):
-    return self.arrival + self.estimate < other.arrival + other.estimate
 
-NbtNode = nbt_jitc(Node)
+def map_clones(original, fn: Callable[..., U], items: Iterable[T], workers: int|None = None) -> list[U]:
+  """
+  Results of fn(clone, item) for all items in order, computed in a thread
+  pool, where every thread gets its own clone of original (like Router or
+  Prospector, which are meant to be used by a single thread).
+  """
+  local = threading.local()
+
+  def call(item):
+    clone = getattr(local, "clone", None)
+
+    if clone is None:
+      clone = local.clone = original.clone()
+
+    return fn(clone, item)
+
+  with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+    return list(pool.map(call, items))
+
+
+def _seconds(time: datetime.time|int) -> int:
+  if isinstance(time, int):
+    return time
+  else:
+    return time.hour * 60*60 + time.minute * 60 + time.second
 
 
 @jitclass([
   ("stops", nbt_jitc(Stops)),
   ("trips", nbt_jitc(Trips)),
-  ("services", nbt_jitc(Services)),
+  ("trip_starts", nbt_jitc(TripStarts)),
   ("clustertimes", nb.int32[:, :]),
+  ("bounds", nb.int32[:]),
 
   ("destination", NbtPoint),
   ("near_destination", nbt.List(NbtNearStop)),
@@ -148,9 +497,21 @@ NbtNode = nbt_jitc(Node)
   ("arrival", nb.int32),
   ("path_tail", NbtPathSegment),
   ("exhaustive", nb.bool_),
-
-  ("nodes", nbt.List(NbtNode)),
-  ("queue", nbt.ListType(NbtNode)),
+  ("exact", nb.bool_),
+
+  ("epoch", nb.int32),
+  ("epochs", nb.int32[:]),
+  ("arrivals", nb.int32[:]),
+  ("starts", nb.int32[:]),
+  ("initial_walks", nb.int32[:]),
+  ("estimates", nb.int32[:]),
+  ("walk_times", nb.int32[:]),
+  ("from_stops", nb.int32[:]),
+  ("trip_ids", nb.int32[:]),
+  ("details", nb.int32[:]),
+
+  ("queue", nbt_jitc(IndexedHeap)),
+  ("radix", nbt_jitc(RadixHeap)),
 ])
 class RouterTask:
   def __init__(
@@ -160,47 +521,124 @@ class RouterTask:
     clustertimes: np.ndarray,
     prospect: Prospect,
     start_time: int,
-    services: Services,
+    trip_starts: TripStarts,
+    exhaustive: bool = False,
+    time_limit: int = INF_TIME,
+    bounds: np.ndarray|None = None,
   ):
     self.stops = stops
     self.trips = trips
     self.clustertimes = clustertimes
-    self.services = services
+
+    # Per stop state is only valid when its epoch matches the task's epoch,
+    # so it doesn't need to be cleared when task is reused by start()
+    stop_count = stops.count()
+    self.epoch = 0
+    self.epochs = np.zeros(stop_count, np.int32)
+    self.arrivals = np.empty(stop_count, np.int32)
+    self.starts = np.empty(stop_count, np.int32)
+    self.initial_walks = np.empty(stop_count, np.int32)
+    self.estimates = np.empty(stop_count, np.int32)
+    self.walk_times = np.empty(stop_count, np.int32)
+    self.from_stops = np.empty(stop_count, np.int32)
+    self.trip_ids = np.empty(stop_count, np.int32)
+    self.details = np.empty(stop_count, np.int32)
+
+    self.queue = IndexedHeap(stop_count)
+    self.radix = RadixHeap(stop_count)
+
+    self.start(prospect, start_time, trip_starts, exhaustive, time_limit, bounds)
+
+
+  def start(
+    self,
+    prospect: Prospect,
+    start_time: int,
+    trip_starts: TripStarts,
+    exhaustive: bool = False,
+    time_limit: int = INF_TIME,
+    bounds: np.ndarray|None = None,
+  ):
+    """
+    Prepares the task for a new search, keeping allocated arrays. Exhaustive
+    search finds arrivals to all stops reachable before time_limit, without
+    estimates, so its queue keys are monotone and a radix heap is used
+    instead of a binary one. Bounds, if given, are used as estimates instead
+    of clustertimes, and the search is exact: trips aren't cut short after
+    a stop reached earlier by another plan.
+    """
+    if bounds is None:
+      self.bounds = np.empty(0, np.int32)
+    else:
+      self.bounds = bounds
+
+    self.exact = bounds is not None
+
+    self.trip_starts = trip_starts
     self.destination = prospect.destination
     self.near_destination = prospect.near_destination
 
     self.iteration = 0
-    self.arrival = start_time + int(prospect.walk_distance / WALK_SPEED)
     self.path_tail = PathSegment(nb.int32(-1), nb.int32(-1), nb.int32(prospect.walk_distance))
-    self.exhaustive = False
+    self.exhaustive = exhaustive
+
+    if exhaustive:
+      self.arrival = time_limit
+    else:
+      self.arrival = start_time + int(prospect.walk_distance / WALK_SPEED)
 
-    self.nodes = [Node(nb.int32(-1), nb.int32(-1), nb.int32(-1))] * stops.count()
-    self.queue = nb.typed.List.empty_list(NbtNode)
+    if self.epoch == np.iinfo(np.int32).max:
+      self.epochs[:] = 0
+      self.epoch = 0
+
+    self.epoch += 1
+    self.queue.clear()
+    self.radix.clear()
 
     for id, dst in prospect.near_start:
-      n = self.get_node(id)
-      n.arrival = start_time + int(dst / WALK_SPEED)
-      n.path_tail = PathSegment(nb.int32(-1), nb.int32(-1), nb.int32(dst))
-      self.queue.append(n)
+      self.visit(id)
+      arrival = start_time + int(dst / WALK_SPEED)
 
-    heapify(self.queue)
+      if arrival < self.starts[id]:
+        self.starts[id] = arrival
+        self.initial_walks[id] = nb.int32(dst)
 
+      if arrival < self.arrivals[id]:
+        self.update_node(id, arrival, -1, -1, nb.int32(dst))
 
-  def get_node(self, stop_id: int) -> Node:
-    node = self.nodes[stop_id]
 
-    if node.stop_id == -1:
+  def visit(self, stop_id: int):
+    if self.epochs[stop_id] != self.epoch:
       walk_time = self.estimate_walk_time(stop_id)
-      node = Node(stop_id, self.estimate(stop_id, walk_time), walk_time)
-      self.nodes[stop_id] = node
+      self.epochs[stop_id] = self.epoch
+      self.arrivals[stop_id] = INF_TIME
+      self.starts[stop_id] = INF_TIME
+      self.estimates[stop_id] = self.estimate(stop_id, walk_time)
+      self.walk_times[stop_id] = walk_time
 
-    return node
+
+  def get_arrival(self, stop_id: int) -> int:
+    if self.epochs[stop_id] != self.epoch:
+      return INF_TIME
+    else:
+      return self.arrivals[stop_id]
+
+
+  def get_arrivals(self) -> tuple[np.ndarray, np.ndarray]:
+    """Arrivals to all stops and stops from which they were reached."""
+    visited = self.epochs == self.epoch
+    arrivals = np.where(visited, self.arrivals, INF_TIME).astype(np.int32)
+    from_stops = np.where(visited, self.from_stops, -1).astype(np.int32)
+    return arrivals, from_stops
 
 
   def estimate(self, stop_id: int, walk_time: int) -> int:
     if self.exhaustive:
       return 0
 
+    if len(self.bounds) != 0:
+      return self.bounds[stop_id]
+
     pos = self.stops[stop_id].position
     result = walk_time
 
@@ -231,93 +669,120 @@ class RouterTask:
     return nb.int32(t)
 
 
-  def update_node(self, node: Node, arrival: int, came_from: Node, trip_id: int, details: int):
-    if arrival + node.estimate >= self.arrival:
+  def set_arrival(self, stop_id: int, arrival: int, from_stop: int, trip_id: int, details: int):
+    self.arrivals[stop_id] = arrival
+    self.from_stops[stop_id] = from_stop
+    self.trip_ids[stop_id] = trip_id
+    self.details[stop_id] = details
+
+    if self.exhaustive:
+      self.radix.push(stop_id, arrival)
+    else:
+      self.queue.push(stop_id, arrival + self.estimates[stop_id])
+
+
+  def update_node(self, stop_id: int, arrival: int, from_stop: int, trip_id: int, details: int):
+    if arrival + self.estimates[stop_id] >= self.arrival:
       return
 
-    node.arrival = arrival
-    node.path_tail = PathSegment(came_from.stop_id, nb.int32(trip_id), nb.int32(details))
+    self.set_arrival(stop_id, arrival, from_stop, trip_id, details)
+    walk_time = self.walk_times[stop_id]
 
-    if node.heap_pos == -1:
-      heappush(self.queue, node)
+    if arrival + walk_time < self.arrival and not self.exhaustive:
+      self.arrival = arrival + walk_time
+      self.path_tail = PathSegment(nb.int32(stop_id), nb.int32(-1), nb.int32(walk_time*WALK_SPEED))
+
+
+  def has_queued(self) -> bool:
+    if self.exhaustive:
+      return self.radix.size > 0
     else:
-      heapdec(self.queue, node)
+      return self.queue.size > 0
 
-    if arrival + node.walk_time < self.arrival and not self.exhaustive:
-      self.arrival = arrival + node.walk_time
-      self.path_tail = PathSegment(node.stop_id, nb.int32(-1), nb.int32(node.walk_time*WALK_SPEED))
 
+  def pop_node(self) -> int:
+    if self.exhaustive:
+      return self.radix.pop()
+    else:
+      return self.queue.pop()
 
-  def consider_walking(self, from_node: Node):
-    for stop_walk in self.stops.get_stop_walks(from_node.stop_id):
-      to_node = self.get_node(stop_walk.stop_id)
-      arrival = from_node.arrival + int(stop_walk.distance / WALK_SPEED)
 
-      if arrival < min(to_node.arrival, self.arrival):
-        self.update_node(to_node, arrival, from_node, -1, stop_walk.distance)
+  def consider_walking(self, from_stop: int):
+    from_arrival = self.arrivals[from_stop]
+
+    for stop_walk in self.stops.get_stop_walks(from_stop):
+      to_stop = stop_walk.stop_id
+      self.visit(to_stop)
+      arrival = from_arrival + int(stop_walk.distance / WALK_SPEED)
+
+      if arrival < min(self.arrivals[to_stop], self.arrival):
+        self.update_node(to_stop, arrival, from_stop, -1, stop_walk.distance)
 
 
   def solve(self) -> Plan:
-    while self.queue:
-      from_node = heappop(self.queue)
+    while self.has_queued():
+      from_stop = self.pop_node()
+      from_arrival = self.arrivals[from_stop]
+      from_estimate = self.estimates[from_stop]
 
-      if from_node.arrival + from_node.estimate >= self.arrival:
+      if from_arrival + from_estimate >= self.arrival:
         break
 
       self.iteration += 1
-      self.consider_walking(from_node)
+      self.consider_walking(from_stop)
 
-      for trip_id, stop_seq, relative_departure in self.stops.get_stop_trips(from_node.stop_id):
-        time = from_node.arrival - relative_departure
+      # Stop might have been reached by walking after the initial walk got
+      # there, but no transfer time is needed after the initial walk
+      ready = min(from_arrival + TRANSFER_TIME, self.starts[from_stop])
 
-        if from_node.path_tail.from_stop != -1:
-          time += TRANSFER_TIME
-
-        start_time = self.trips.get_next_start(trip_id, self.services, time).time
+      for trip_id, stop_seq, relative_departure in self.stops.get_stop_trips(from_stop):
+        time = ready - relative_departure
+        start_time = self.trip_starts.get_next_start(trip_id, time).time
 
         if start_time == INF_TIME:
           continue
 
         departure = start_time + relative_departure
 
-        if departure + from_node.estimate >= self.arrival:
+        if departure + from_estimate >= self.arrival:
           continue
 
         for to_stop, relative_arrival, _ in self.trips.get_stops_after(trip_id, stop_seq):
-          to_node = self.get_node(to_stop)
+          self.visit(to_stop)
+          to_arrival = self.arrivals[to_stop]
           arrival = start_time + relative_arrival
 
-          if arrival < min(to_node.arrival, self.arrival):
-            self.update_node(to_node, arrival, from_node, trip_id, departure)
-          elif arrival >= to_node.arrival + TRANSFER_TIME:
+          if arrival < min(to_arrival, self.arrival):
+            self.update_node(to_stop, arrival, from_stop, trip_id, departure)
+          elif arrival >= to_arrival + TRANSFER_TIME and not self.exact:
             break
 
     return Plan(self.arrival, self.gather_path(self.path_tail), self.iteration)
 
 
   def solve_timeless(self) -> Plan:
-    while self.queue:
-      from_node = heappop(self.queue)
+    while self.has_queued():
+      from_stop = self.pop_node()
+      from_arrival = self.arrivals[from_stop]
 
-      if from_node.arrival + from_node.estimate >= self.arrival:
+      if from_arrival + self.estimates[from_stop] >= self.arrival:
         break
 
       self.iteration += 1
-      self.consider_walking(from_node)
-
-      for trip_id, stop_seq, relative_departure in self.stops.get_stop_trips(from_node.stop_id):
-        time = from_node.arrival - relative_departure
+      self.consider_walking(from_stop)
+      ready = min(from_arrival + TRANSFER_TIME, self.starts[from_stop])
 
-        if from_node.path_tail.from_stop != -1:
-          time += TRANSFER_TIME
+      for trip_id, stop_seq, relative_departure in self.stops.get_stop_trips(from_stop):
+        time = ready - relative_departure
 
         for to_stop, relative_arrival, _ in self.trips.get_stops_after(trip_id, stop_seq):
-          to_node = self.get_node(to_stop)
+          self.visit(to_stop)
+          to_arrival = self.arrivals[to_stop]
           arrival = time + relative_arrival
 
-          if arrival < min(to_node.arrival, self.arrival):
-            self.update_node(to_node, arrival, from_node, trip_id, time + relative_departure)
-          elif arrival >= to_node.arrival + TRANSFER_TIME:
+          if arrival < min(to_arrival, self.arrival):
+            self.update_node(to_stop, arrival, from_stop, trip_id, time + relative_departure)
+          elif arrival >= to_arrival + TRANSFER_TIME:
             break
 
     return Plan(self.arrival, self.gather_path(self.path_tail), self.iteration)
@@ -333,7 +798,13 @@ class RouterTask:
         result.reverse()
         return result
       else:
-        segment = self.nodes[segment.from_stop].path_tail
+        stop_id = segment.from_stop
+
+        # Trip boarded right after the initial walk, see solve
+        if segment.trip_id != -1 and self.starts[stop_id] <= segment.details:
+          segment = PathSegment(nb.int32(-1), nb.int32(-1), self.initial_walks[stop_id])
+        else:
+          segment = PathSegment(self.from_stops[stop_id], self.trip_ids[stop_id], self.details[stop_id])
 
 
 @nb.jit(nogil=True)
@@ -343,3 +814,24 @@ def solve(task):
 @nb.jit(nogil=True)
 def solve_timeless(task):
   return task.solve_timeless()
+
+
+@nb.jit(nogil=True)
+def solve_one_to_all(task, timeless):
+  if timeless:
+    task.solve_timeless()
+  else:
+    task.solve()
+
+  return task.get_arrivals()
+
+
+@nb.jit
+def stop_prospect(stops, stop_id):
+  """Prospect starting at given stop, without destination."""
+  position = stops[stop_id].position
+  coords = Coords(np.float32(0), np.float32(0))
+  near_start = nb.typed.List.empty_list(NbtNearStop)
+  near_start.append(NearStop(nb.int32(stop_id), nb.float32(0)))
+  near_destination = nb.typed.List.empty_list(NbtNearStop)
+  return Prospect(position, coords, near_start, position, coords, near_destination, np.float32(0))
@@ -0,0 +1,79 @@
+import numpy as np
+from pathlib import Path
+import shutil
+
+from .data.misc import NbtStrings, Strings
+from .data.routes import Routes
+from .data.shapes import Shapes
+from .data.stops import Stops
+from .data.trips import Trips
+
+
+SNAPSHOT_VERSION = 1
+
+CLASSES = {
+  "routes": Routes,
+  "shapes": Shapes,
+  "stops": Stops,
+  "trips": Trips,
+}
+
+
+def snapshot_dir(path: Path) -> Path:
+  """Directory of the current snapshot version in path."""
+  return path / f"v{SNAPSHOT_VERSION}"
+
+
+def save_snapshot(path: Path, routes: Routes, shapes: Shapes, stops: Stops, trips: Trips):
+  """
+  Saves every array field as .npy and every list of strings as UTF-8 blob
+  with .npy offsets. The directory is written next to the target and renamed,
+  so readers never see a partial snapshot.
+  """
+  target = snapshot_dir(path)
+  tmp = target.with_name(target.name + ".tmp")
+  shutil.rmtree(tmp, ignore_errors=True)
+  tmp.mkdir(parents=True)
+  objects = {"routes": routes, "shapes": shapes, "stops": stops, "trips": trips}
+
+  for name, cls in CLASSES.items():
+    for field, field_type in cls.class_type.struct.items():
+      value = getattr(objects[name], field)
+
+      if field_type == NbtStrings:
+        (tmp / f"{name}.{field}.txt").write_text(value.blob, "utf-8")
+        np.save(tmp / f"{name}.{field}.npy", value.offsets)
+      else:
+        np.save(tmp / f"{name}.{field}.npy", value)
+
+  shutil.rmtree(target, ignore_errors=True)
+  tmp.rename(target)
+
+
+def load_snapshot(path: Path) -> tuple[Routes, Shapes, Stops, Trips]|None:
+  """
+  Loads snapshot of the current version saved by save_snapshot, if any.
+  Arrays are memory-mapped read-only, so processes share their pages.
+  """
+  source = snapshot_dir(path)
+
+  if not source.exists():
+    return None
+
+  result = []
+
+  for name, cls in CLASSES.items():
+    fields = {}
+
+    for field, field_type in cls.class_type.struct.items():
+      array = np.load(source / f"{name}.{field}.npy", mmap_mode="r")
+
+      if field_type == NbtStrings:
+        blob = (source / f"{name}.{field}.txt").read_text("utf-8")
+        fields[field] = Strings(blob, array)
+      else:
+        fields[field] = array
+
+    result.append(cls(**fields))
+
+  return tuple(result)
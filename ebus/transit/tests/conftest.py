@@ -0,0 +1,20 @@
+import pytest
+import random
+
+from transit.data.trips import get_trip_starts
+from transit.raptor import get_pickups
+from transit.tests.network import build_network, random_prospect
+
+
+@pytest.fixture(scope="session", params=[1, 2])
+def network(request):
+  stops, trips, services = build_network(request.param)
+  return stops, trips, get_trip_starts(trips, services), get_pickups(stops, trips)
+
+
+@pytest.fixture
+def queries(network):
+  """Random prospects with start times, the same for every test."""
+  stops = network[0]
+  rnd = random.Random(0)
+  return [(random_prospect(stops, rnd), rnd.randrange(5*3600, 23*3600)) for _ in range(40)]
@@ -0,0 +1,187 @@
+# Small synthetic network for tests: random stops on a plane, walks between
+# close ones and lines running both ways through nearby stops, with separate
+# timetables for 3 services.
+
+import math
+import numpy as np
+import random
+
+from transit.data.misc import *
+from transit.data.routes import Routes
+from transit.data.shapes import Shapes
+from transit.data.stops import Stops
+from transit.data.trips import Trips
+from transit.prospector import NearStop, Prospect
+
+
+SIZE = 6000 # Side of the square with stops (meters)
+WALK_RADIUS = 700
+NEAR_RADIUS = 500
+
+
+def build_network(seed: int, stop_count: int = 150, line_count: int = 16) -> tuple[Stops, Trips, Services]:
+  rnd = random.Random(seed)
+  xs = np.array([rnd.uniform(-SIZE/2, SIZE/2) for _ in range(stop_count)], np.float32)
+  ys = np.array([rnd.uniform(-SIZE/2, SIZE/2) for _ in range(stop_count)], np.float32)
+  dist = lambda a, b: math.hypot(xs[a] - xs[b], ys[a] - ys[b])
+
+  walks = [
+    sorted(
+      (int(dist(a, b) * 1.2), b)
+      for b in range(stop_count)
+      if a != b and dist(a, b) < WALK_RADIUS
+    )
+    for a in range(stop_count)
+  ]
+
+  # (stop ids, arrivals, departures, pickups, [(services, start times)])
+  patterns = []
+
+  for _ in range(line_count):
+    line = [rnd.randrange(stop_count)]
+
+    for _ in range(rnd.randint(8, 16)):
+      closest = sorted(range(stop_count), key=lambda s: dist(line[-1], s))[1:10]
+      candidates = [s for s in closest if s not in line]
+
+      if not candidates:
+        break
+
+      line.append(rnd.choice(candidates))
+
+    for ids in [line, line[::-1]]:
+      arrivals = [0]
+      departures = [0]
+
+      for a, b in zip(ids, ids[1:]):
+        arrivals.append(departures[-1] + int(dist(a, b) / rnd.uniform(6, 10)) + 20)
+        departures.append(arrivals[-1] + rnd.choice([0, 0, 30]))
+
+      pickups = [rnd.random() > 0.05 for _ in ids]
+      starts = []
+
+      for services in [[0], [1, 2], [3]]:
+        headway = rnd.choice([300, 600, 900, 1200])
+        first = rnd.randrange(4*3600, 6*3600)
+        last = rnd.randrange(22*3600, 26*3600)
+        starts.append((services, list(range(first, last, headway))))
+
+      patterns.append((ids, arrivals, departures, pickups, starts))
+
+  i32 = lambda values: np.array(values, np.int32)
+  starts_off = [0]
+  starts_services_off = [0]
+  starts_services = []
+  starts_times_off = [0]
+  starts_times = []
+  stops_off = [0]
+  stops_ids = []
+  stops_arrivals = []
+  stops_departures = []
+  stop_trips = [[] for _ in range(stop_count)]
+
+  for trip_id, (ids, arrivals, departures, pickups, starts) in enumerate(patterns):
+    for services, times in starts:
+      starts_services += services
+      starts_services_off.append(len(starts_services))
+      starts_times += times
+      starts_times_off.append(len(starts_times))
+
+    starts_off.append(len(starts_services_off) - 1)
+    stops_ids += ids
+    stops_arrivals += arrivals
+    stops_departures += departures
+    stops_off.append(len(stops_ids))
+
+    for seq, (stop_id, departure, pickup) in enumerate(zip(ids, departures, pickups)):
+      if pickup:
+        stop_trips[stop_id].append((trip_id, seq, departure))
+
+  trip_count = len(patterns)
+
+  trips = Trips(
+    np.zeros(trip_count, np.int32),
+    np.full(trip_count, -1, np.int32),
+    pack_strings([f"headsign {i}" for i in range(trip_count)]),
+    i32([min(min(times) for _, times in p[4]) for p in patterns]),
+    i32([max(max(times) for _, times in p[4]) for p in patterns]),
+    i32(starts_off),
+    i32(starts_services_off),
+    i32(starts_services),
+    i32(starts_times_off),
+    i32(starts_times),
+    i32(stops_off),
+    i32(stops_ids),
+    i32(stops_arrivals),
+    i32(stops_departures),
+  )
+
+  names = pack_strings([f"stop {i}" for i in range(stop_count)])
+
+  stops = Stops(
+    names,
+    names,
+    pack_strings([None] * stop_count),
+    np.zeros(stop_count, np.int32),
+    xs,
+    ys,
+    xs,
+    ys,
+    i32(np.cumsum([0] + [len(w) for w in walks])),
+    i32([b for w in walks for _, b in w]),
+    np.array([d for w in walks for d, _ in w], np.int16),
+    i32(np.cumsum([0] + [len(t) for t in stop_trips])),
+    i32([t for st in stop_trips for t, _, _ in st]),
+    np.array([s for st in stop_trips for _, s, _ in st], np.int16),
+    i32([d for st in stop_trips for _, _, d in st]),
+  )
+
+  services = Services(i32([0, 1]), i32([0, 2]), i32([0, 3]))
+  return stops, trips, services
+
+
+def build_routes_and_shapes(trips: Trips) -> tuple[Routes, Shapes]:
+  routes = Routes(
+    np.zeros(1, np.int32),
+    pack_strings(["1"]),
+    np.full(1, 3, np.int8),
+    np.zeros(1, np.int32),
+    np.full(1, 0xffffff, np.int32),
+  )
+
+  shapes = Shapes(
+    np.array([0, 2], np.int32),
+    np.array([52.4, 52.41], np.float32),
+    np.array([16.9, 16.91], np.float32),
+  )
+
+  return routes, shapes
+
+
+def random_prospect(stops: Stops, rnd: random.Random) -> Prospect:
+  start = Point(np.float32(rnd.uniform(-SIZE/2, SIZE/2)), np.float32(rnd.uniform(-SIZE/2, SIZE/2)))
+  destination = Point(np.float32(rnd.uniform(-SIZE/2, SIZE/2)), np.float32(rnd.uniform(-SIZE/2, SIZE/2)))
+  distance = math.hypot(start.x - destination.x, start.y - destination.y)
+
+  return Prospect(
+    start,
+    Coords(np.float32(0), np.float32(0)),
+    _near(stops, start),
+    destination,
+    Coords(np.float32(0), np.float32(0)),
+    _near(stops, destination),
+    np.float32(distance * 1.2),
+  )
+
+
+def _near(stops: Stops, point: Point) -> list[NearStop]:
+  distances = np.hypot(stops.xs - point.x, stops.ys - point.y)
+  radius = NEAR_RADIUS
+
+  while np.count_nonzero(distances < radius) < 3:
+    radius *= 1.5
+
+  return [
+    NearStop(np.int32(i), np.float32(distances[i] * 1.2))
+    for i in np.flatnonzero(distances < radius)
+  ]
@@ -0,0 +1,100 @@
+import math
+import numpy as np
+
+from transit.backward import *
+from transit.bounds import *
+from transit.csa import *
+from transit.raptor import *
+from transit.router import RouterTask, solve
+from transit.tripbased import *
+
+
+def raptor_arrival(network, prospect, start_time):
+  stops, trips, trip_starts, pickups = network
+  return solve_raptor(RaptorTask(stops, trips, pickups, prospect, start_time, trip_starts)).arrival
+
+
+def uses_trips(plan):
+  return any(segment.trip_id != -1 for segment in plan.path)
+
+
+def test_csa_matches_raptor(network, queries):
+  stops, trips, trip_starts, pickups = network
+  connections = build_connections(trips, pickups, trip_starts)
+  task = None
+
+  for prospect, start_time in queries:
+    # Reused task must give the same results as a new one
+    if task is None:
+      task = CsaTask(stops, connections, prospect, start_time)
+    else:
+      task.start(prospect, start_time, connections)
+
+    assert solve_csa(task).arrival == raptor_arrival(network, prospect, start_time)
+
+
+def test_tripbased_matches_raptor(network, queries, tmp_path):
+  stops, trips, trip_starts, pickups = network
+  np.save(tmp_path / "transfers.npy", calculate_transfers(stops, trips, pickups))
+  transfers = load_transfers(tmp_path / "transfers.npy", trips)
+
+  for prospect, start_time in queries:
+    task = TripBasedTask(stops, trips, transfers, pickups, prospect, start_time, trip_starts)
+    assert solve_tripbased(task).arrival == raptor_arrival(network, prospect, start_time)
+
+
+def test_dijkstra_with_bounds_matches_raptor(network, queries):
+  stops, trips, trip_starts, pickups = network
+  graph = get_bound_graph(stops, trips)
+  clustertimes = np.empty((0, 0), np.int32)
+
+  for prospect, start_time in queries:
+    x0 = math.floor(prospect.destination.x / BOUNDS_CELL_SIZE) * BOUNDS_CELL_SIZE
+    y0 = math.floor(prospect.destination.y / BOUNDS_CELL_SIZE) * BOUNDS_CELL_SIZE
+    bounds = get_lower_bounds(graph, stops, x0, y0, x0 + BOUNDS_CELL_SIZE, y0 + BOUNDS_CELL_SIZE)
+    task = RouterTask(stops, trips, clustertimes, prospect, start_time, trip_starts, False, INF_TIME, bounds)
+    assert solve(task).arrival == raptor_arrival(network, prospect, start_time)
+
+
+def test_arrive_by_is_latest_departure(network, queries):
+  stops, trips, trip_starts, pickups = network
+  reverse = get_reverse_index(stops, trips)
+
+  for prospect, start_time in queries:
+    arrival_time = raptor_arrival(network, prospect, start_time)
+    task = BackwardRaptorTask(stops, trips, pickups, reverse, prospect, arrival_time, trip_starts)
+    entry = solve_backward(task)
+
+    assert start_time <= entry.departure
+    assert entry.plan.arrival <= arrival_time
+    assert raptor_arrival(network, prospect, entry.departure) <= arrival_time
+    assert raptor_arrival(network, prospect, entry.departure + 1) > arrival_time
+
+
+def test_profile_is_pareto_optimal(network, queries):
+  stops, trips, trip_starts, pickups = network
+
+  for prospect, start_time in queries[:10]:
+    end_time = start_time + 1800
+    task = RaptorTask(stops, trips, pickups, prospect, start_time, trip_starts)
+    entries = list(solve_raptor_profile(task, end_time))
+
+    for entry, following in zip(entries, entries[1:]):
+      assert entry.departure < following.departure
+      assert entry.plan.arrival < following.plan.arrival
+
+    # Apart from the end of the window, departing later arrives later
+    for entry in entries:
+      assert raptor_arrival(network, prospect, entry.departure) == entry.plan.arrival
+
+      if entry.departure != end_time:
+        assert raptor_arrival(network, prospect, entry.departure + 1) > entry.plan.arrival
+
+    # Every departure in the window is covered by the next entry, or walking
+    walk_task = RaptorTask(stops, trips, pickups, prospect, start_time, trip_starts, 0)
+    walk_time = solve_raptor(walk_task).arrival - start_time
+
+    for departure in range(start_time, end_time + 1, 60):
+      following = next(e for e in entries if e.departure >= departure)
+      arrival = min(following.plan.arrival, departure + walk_time)
+      assert raptor_arrival(network, prospect, departure) == arrival
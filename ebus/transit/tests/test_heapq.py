@@ -0,0 +1,67 @@
+import random
+
+from transit.heapq import *
+
+
+CAPACITY = 500
+
+
+def test_indexed_heap_pops_in_key_order():
+  rnd = random.Random(0)
+  heap = IndexedHeap(CAPACITY)
+
+  for _ in range(2):
+    keys = {}
+
+    # Keys of queued items are changed both ways
+    for _ in range(3 * CAPACITY):
+      item = rnd.randrange(CAPACITY)
+      key = rnd.randrange(100_000)
+      heap.push(item, key)
+      keys[item] = key
+
+    assert heap.size == len(keys)
+    assert all(heap.contains(item) == (item in keys) for item in range(CAPACITY))
+    popped = [heap.pop() for _ in range(len(keys))]
+
+    assert sorted(popped) == sorted(keys)
+    assert [keys[item] for item in popped] == sorted(keys.values())
+    assert not any(heap.contains(item) for item in range(CAPACITY))
+
+    # Emptied heap is reused, so is one that is cleared
+    heap.push(0, 1)
+    heap.clear()
+    assert heap.size == 0 and not heap.contains(0)
+
+
+def test_radix_heap_pops_in_key_order():
+  rnd = random.Random(0)
+  heap = RadixHeap(CAPACITY)
+
+  for _ in range(2):
+    keys = {}
+    last = 0
+    popped = []
+
+    # Like in Dijkstra's search, keys are pushed between pops and never
+    # below the last popped key, but can be decreased or increased
+    while len(popped) < 2 * CAPACITY:
+      for _ in range(rnd.randrange(4)):
+        item = rnd.randrange(CAPACITY)
+        key = last + rnd.choice([0, rnd.randrange(1000), rnd.randrange(1 << 30)])
+        heap.push(item, key)
+        keys[item] = key
+
+      if heap.size == 0:
+        continue
+
+      assert heap.size == len(keys)
+      item = heap.pop()
+      assert keys[item] == min(keys.values())
+      last = keys.pop(item)
+      popped.append(item)
+      assert not heap.contains(item)
+
+    heap.clear()
+    assert heap.size == 0
+    assert not any(heap.contains(item) for item in range(CAPACITY))
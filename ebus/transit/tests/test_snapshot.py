@@ -0,0 +1,34 @@
+import numpy as np
+
+from transit.data.misc import NbtStrings
+from transit.snapshot import *
+from transit.tests.network import build_network, build_routes_and_shapes
+
+
+def test_snapshot_round_trip(tmp_path):
+  stops, trips, _ = build_network(1)
+  routes, shapes = build_routes_and_shapes(trips)
+  assert load_snapshot(tmp_path) is None
+
+  save_snapshot(tmp_path, routes, shapes, stops, trips)
+
+  # Saving again replaces the snapshot, without leaving a temporary one
+  save_snapshot(tmp_path, routes, shapes, stops, trips)
+  assert [p.name for p in tmp_path.iterdir()] == [snapshot_dir(tmp_path).name]
+
+  loaded = load_snapshot(tmp_path)
+
+  for cls, original, copy in zip(CLASSES.values(), [routes, shapes, stops, trips], loaded):
+    for field, field_type in cls.class_type.struct.items():
+      expected = getattr(original, field)
+      actual = getattr(copy, field)
+
+      if field_type == NbtStrings:
+        assert actual.blob == expected.blob
+        assert np.array_equal(actual.offsets, expected.offsets)
+      else:
+        assert actual.dtype == expected.dtype
+        assert np.array_equal(actual, expected)
+
+  assert loaded[2][5].name == stops[5].name
+  assert loaded[3].get_trip_stops(3) == trips.get_trip_stops(3)
@@ -61,7 +61,7 @@ class TransitDb(Db):
 
     return Routes(
       agencies.to_numpy(),
-      names.tolist(),
+      pack_strings(names.tolist()),
       types.to_numpy(),
       colors.to_numpy(),
       text_colors.to_numpy(),
@@ -94,9 +94,9 @@ class TransitDb(Db):
     assert np.array_equal(ids, np.arange(len(a)))
 
     return Stops(
-      codes.tolist(),
-      names.tolist(),
-      zones.tolist(),
+      pack_strings(codes.tolist()),
+      pack_strings(names.tolist()),
+      pack_strings(zones.tolist()),
       clusters.to_numpy(),
       lats.to_numpy(),
       lons.to_numpy(),
@@ -128,7 +128,7 @@ class TransitDb(Db):
     return Trips(
       routes.to_numpy(),
       shapes.fill_null(-1).to_numpy(),
-      headsigns.tolist(),
+      pack_strings(headsigns.tolist()),
       first_departures.to_numpy(),
       last_departures.to_numpy(),
       starts_off.to_numpy(),
@@ -153,6 +153,20 @@ class TransitDb(Db):
     return TripInstance(wa, id)
 
 
+  def get_accessible_trips(self) -> AccessibleTrips:
+    trip_ids, services, start_times = self.sql("""
+      select trip, service, start_time
+      from trip_instance
+      where wheelchair_accessible = 1
+    """).arrow().flatten()
+
+    return AccessibleTrips(
+      trip_ids.to_numpy(),
+      services.to_numpy(),
+      start_times.to_numpy(),
+    )
+
+
   def process_delays(self, trip_updates: str) -> Delays:
     res = self.script("process-delays", [trip_updates])
 
@@ -0,0 +1,612 @@
+# Trip-Based public transit routing, see Witt: "Trip-Based Public Transit
+# Routing", 2015.
+#
+# Transfers are precomputed between trip stops (stop events of route patterns)
+# rather than between trip instances, so they don't depend on date. Reduction
+# keeps a transfer to trip u at seq j only if no transfer to u at the same or
+# earlier seq, from the same or later stop of the trip, catches an instance of
+# u at least as early - that holds for every instance, as all of them share
+# relative times. Transfers to the same trip are only kept to earlier seqs, as
+# they catch a later instance. Instances are found at query time by TripStarts.
+#
+# Transfers walk at most one stop walk. Walks can be chained, just like in
+# RaptorTask, so at query time stops reached by getting off a trip are relaxed
+# by walking, and trips are boarded at stops reached by more than one walk.
+
+import numba as nb
+from numba.experimental import jitclass
+import numba.types as nbt
+import numpy as np
+from pathlib import Path
+
+from .data.misc import *
+from .data.stops import Stops
+from .data.trips import Trips, TripStarts
+from .params import *
+from .plan import *
+from .prospector import *
+
+
+TRANSFER = np.dtype([
+  ("from_event", np.int32),
+  ("to_trip", np.int32),
+  ("to_seq", np.int32),
+  ("distance", np.int32),
+])
+
+
+@jitclass([
+  ("offs", nb.int32[:]),
+  ("to_trips", nb.int32[:]),
+  ("to_seqs", nb.int32[:]),
+  ("distances", nb.int32[:]),
+])
+class Transfers:
+  """Transfers from every entry of trips.stops_ids, in CSR layout."""
+
+  def __init__(self, offs, to_trips, to_seqs, distances):
+    self.offs = offs
+    self.to_trips = to_trips
+    self.to_seqs = to_seqs
+    self.distances = distances
+
+
+def load_transfers(path: Path, trips: Trips) -> Transfers:
+  transfers = np.load(path)
+  event_count = len(trips.stops_ids)
+
+  return Transfers(
+    np.searchsorted(transfers["from_event"], np.arange(event_count + 1)).astype(np.int32),
+    np.ascontiguousarray(transfers["to_trip"]),
+    np.ascontiguousarray(transfers["to_seq"]),
+    np.ascontiguousarray(transfers["distance"]),
+  )
+
+
+def calculate_transfers(stops: Stops, trips: Trips, pickups: np.ndarray) -> np.ndarray:
+  """Reduced transfers as TRANSFER records sorted by from_event."""
+  from_events, to_trips, to_seqs, distances = _calculate_transfers(stops, trips, pickups)
+  result = np.empty(len(from_events), TRANSFER)
+  result["from_event"] = from_events
+  result["to_trip"] = to_trips
+  result["to_seq"] = to_seqs
+  result["distance"] = distances
+  return result[np.argsort(from_events, kind="stable")]
+
+
+@nb.jit
+def _calculate_transfers(stops, trips, pickups):
+  count = 0
+  from_events = np.empty(16, np.int32)
+  to_trips = np.empty(16, np.int32)
+  to_seqs = np.empty(16, np.int32)
+  distances = np.empty(16, np.int32)
+
+  # Transfers kept for the current trip, grouped by target trip in lists
+  kept_seqs = np.empty(16, np.int32)
+  kept_thresholds = np.empty(16, np.int32)
+  kept_nexts = np.empty(16, np.int32)
+
+  for trip_id in range(len(trips.routes)):
+    beg = trips.stops_off[trip_id]
+    end = trips.stops_off[trip_id+1]
+    heads = nb.typed.Dict.empty(nb.int32, nb.int32)
+    kept = 0
+
+    # Getting off at the first stop is never useful
+    for event in range(end - 1, beg, -1):
+      from_stop = trips.stops_ids[event]
+      arrival = trips.stops_arrivals[event]
+
+      for i in range(-1, stops.walks_off[from_stop+1] - stops.walks_off[from_stop]):
+        if i == -1:
+          to_stop = from_stop
+          distance = 0
+        else:
+          to_stop = stops.walks_stop_ids[stops.walks_off[from_stop] + i]
+          distance = nb.int32(stops.walks_distances[stops.walks_off[from_stop] + i])
+
+        for to_trip, to_seq, departure in stops.get_stop_trips(to_stop):
+          to_event = trips.stops_off[to_trip] + to_seq
+
+          if not pickups[to_event] or to_event == trips.stops_off[to_trip+1] - 1:
+            continue
+
+          # Staying on is better, but a later instance can be caught earlier
+          if to_trip == trip_id and to_seq >= event - beg:
+            continue
+
+          # Earliest start of target trip catchable, relative to our start
+          threshold = arrival + int(distance / WALK_SPEED) + TRANSFER_TIME - departure
+          head = heads[to_trip] if to_trip in heads else -1
+          k = head
+          dominated = False
+
+          while k != -1:
+            if kept_seqs[k] <= to_seq and kept_thresholds[k] <= threshold:
+              dominated = True
+              break
+
+            k = kept_nexts[k]
+
+          if dominated:
+            continue
+
+          if kept == len(kept_seqs):
+            kept_seqs = grow(kept_seqs)
+            kept_thresholds = grow(kept_thresholds)
+            kept_nexts = grow(kept_nexts)
+
+          kept_seqs[kept] = to_seq
+          kept_thresholds[kept] = threshold
+          kept_nexts[kept] = head
+          heads[to_trip] = nb.int32(kept)
+          kept += 1
+
+          if count == len(from_events):
+            from_events = grow(from_events)
+            to_trips = grow(to_trips)
+            to_seqs = grow(to_seqs)
+            distances = grow(distances)
+
+          from_events[count] = event
+          to_trips[count] = to_trip
+          to_seqs[count] = to_seq
+          distances[count] = distance
+          count += 1
+
+  return from_events[:count], to_trips[:count], to_seqs[:count], distances[:count]
+
+
+@jitclass([
+  ("stops", nbt_jitc(Stops)),
+  ("trips", nbt_jitc(Trips)),
+  ("trip_starts", nbt_jitc(TripStarts)),
+  ("transfers", nbt_jitc(Transfers)),
+  ("pickups", nb.bool_[:]),
+
+  ("destination", NbtPoint),
+  ("near_destination", nbt.List(NbtNearStop)),
+
+  ("start_time", nb.int32),
+  ("rounds", nb.int32),
+  ("iteration", nb.int32),
+  ("arrival", nb.int32),
+  ("arrival_stop", nb.int32),
+  ("arrival_alighted", nb.bool_),
+  ("path_tail", NbtPathSegment),
+
+  ("starts", nb.int32[:]),
+  ("start_distances", nb.int32[:]),
+  ("initial_arrivals", nb.int32[:]),
+  ("initial_from_stops", nb.int32[:]),
+  ("initial_details", nb.int32[:]),
+  ("alight_arrivals", nb.int32[:]),
+  ("alight_from_stops", nb.int32[:]),
+  ("alight_details", nb.int32[:]),
+  ("alight_segments", nb.int32[:]),
+  ("alight_events", nb.int32[:]),
+  ("alight_distances", nb.int32[:]),
+  ("pending", nb.int32[:]),
+  ("walk_times", nb.int32[:]),
+  ("trip_segments", nb.int32[:]),
+
+  ("segment_count", nb.int32),
+  ("segment_instances", nb.int32[:]),
+  ("segment_trips", nb.int32[:]),
+  ("segment_begs", nb.int32[:]),
+  ("segment_ends", nb.int32[:]),
+  ("segment_parents", nb.int32[:]),
+  ("segment_alights", nb.int32[:]),
+  ("segment_distances", nb.int32[:]),
+  ("segment_nexts", nb.int32[:]),
+])
+class TripBasedTask:
+  """
+  Initial labels are stops reached by walking from start, alight labels are
+  stops reached by getting off a segment and walking. Both are chained, and
+  kept along with the total walked distance and the event of getting off.
+  """
+
+  def __init__(
+    self,
+    stops: Stops,
+    trips: Trips,
+    transfers: Transfers,
+    pickups: np.ndarray,
+    prospect: Prospect,
+    start_time: int,
+    trip_starts: TripStarts,
+    rounds: int = MAX_ROUNDS,
+  ):
+    self.stops = stops
+    self.trips = trips
+    self.trip_starts = trip_starts
+    self.transfers = transfers
+    self.pickups = pickups
+    self.destination = prospect.destination
+    self.near_destination = prospect.near_destination
+
+    self.start_time = start_time
+    self.rounds = rounds
+    self.iteration = 0
+    self.arrival = start_time + int(prospect.walk_distance / WALK_SPEED)
+    self.arrival_stop = -1
+    self.arrival_alighted = False
+    self.path_tail = PathSegment(nb.int32(-1), nb.int32(-1), nb.int32(prospect.walk_distance))
+
+    stop_count = stops.count()
+    self.starts = np.full(stop_count, INF_TIME, np.int32)
+    self.start_distances = np.empty(stop_count, np.int32)
+    self.initial_arrivals = np.full(stop_count, INF_TIME, np.int32)
+    self.initial_from_stops = np.empty(stop_count, np.int32)
+    self.initial_details = np.empty(stop_count, np.int32)
+    self.alight_arrivals = np.full(stop_count, INF_TIME, np.int32)
+    self.alight_from_stops = np.empty(stop_count, np.int32)
+    self.alight_details = np.empty(stop_count, np.int32)
+    self.alight_segments = np.empty(stop_count, np.int32)
+    self.alight_events = np.empty(stop_count, np.int32)
+    self.alight_distances = np.empty(stop_count, np.int32)
+    self.pending = np.empty(stop_count, np.int32)
+    self.walk_times = np.full(stop_count, -1, np.int32)
+
+    # Last segment enqueued for every trip, segments of a trip are linked
+    self.trip_segments = np.full(len(trips.routes), -1, np.int32)
+
+    self.segment_count = 0
+    self.segment_instances = np.empty(16, np.int32)
+    self.segment_trips = np.empty(16, np.int32)
+    self.segment_begs = np.empty(16, np.int32)
+    self.segment_ends = np.empty(16, np.int32)
+    self.segment_parents = np.empty(16, np.int32)
+    self.segment_alights = np.empty(16, np.int32)
+    self.segment_distances = np.empty(16, np.int32)
+    self.segment_nexts = np.empty(16, np.int32)
+
+    for id, dst in prospect.near_start:
+      arrival = start_time + int(dst / WALK_SPEED)
+
+      if arrival < self.initial_arrivals[id]:
+        self.starts[id] = arrival
+        self.start_distances[id] = nb.int32(dst)
+        self.initial_arrivals[id] = arrival
+        self.initial_from_stops[id] = -1
+        self.initial_details[id] = nb.int32(dst)
+
+
+  def walk_time(self, stop_id: int) -> int:
+    wt = self.walk_times[stop_id]
+
+    if wt != -1:
+      return wt
+
+    wt = -1
+
+    for near in self.near_destination:
+      if near.id == stop_id:
+        wt = nb.int32(near.walk_distance / WALK_SPEED)
+        break
+
+    if wt == -1:
+      # Only position is needed, so Stop with its strings isn't constructed
+      dx = self.stops.xs[stop_id] - self.destination.x
+      dy = self.stops.ys[stop_id] - self.destination.y
+      t = np.sqrt(dx**2 + dy**2) * WALK_DISTANCE_MULTIPLIER / WALK_SPEED
+      wt = nb.int32(t)
+
+    self.walk_times[stop_id] = wt
+    return wt
+
+
+  def reached(self, instance: int, trip_id: int) -> int:
+    """
+    First seq of the trip instance reached so far. Reaching an instance also
+    reaches all later instances of the same trip, as they can't be better.
+    """
+    result = self.trips.stops_off[trip_id+1] - self.trips.stops_off[trip_id]
+    s = self.trip_segments[trip_id]
+
+    while s != -1:
+      if self.segment_instances[s] <= instance:
+        result = min(result, self.segment_begs[s])
+
+      s = self.segment_nexts[s]
+
+    return result
+
+
+  def enqueue(self, instance: int, trip_id: int, seq: int, parent: int, alight: int, distance: int):
+    reached = self.reached(instance, trip_id)
+
+    if seq >= reached:
+      return
+
+    if self.segment_count == len(self.segment_instances):
+      self.segment_instances = grow(self.segment_instances)
+      self.segment_trips = grow(self.segment_trips)
+      self.segment_begs = grow(self.segment_begs)
+      self.segment_ends = grow(self.segment_ends)
+      self.segment_parents = grow(self.segment_parents)
+      self.segment_alights = grow(self.segment_alights)
+      self.segment_distances = grow(self.segment_distances)
+      self.segment_nexts = grow(self.segment_nexts)
+
+    s = self.segment_count
+    self.segment_count += 1
+    self.segment_instances[s] = instance
+    self.segment_trips[s] = trip_id
+    self.segment_begs[s] = seq
+    self.segment_parents[s] = parent
+    self.segment_alights[s] = alight
+    self.segment_distances[s] = distance
+    self.segment_nexts[s] = self.trip_segments[trip_id]
+    self.trip_segments[trip_id] = s
+
+    # Stop where the instance was boarded before is still worth getting off at
+    self.segment_ends[s] = min(reached + 1, self.trips.stops_off[trip_id+1] - self.trips.stops_off[trip_id])
+
+
+  def start_walks(self):
+    # Walks from start are chained, just like in RouterTask
+    pending = np.empty(0, np.int32)
+    count = 0
+
+    for near in self.near_start_stops():
+      if count == len(pending):
+        pending = grow(pending)
+
+      pending[count] = near
+      count += 1
+
+    while count > 0:
+      count -= 1
+      from_stop = pending[count]
+      from_arrival = self.initial_arrivals[from_stop]
+
+      for to_stop, distance in self.stops.get_stop_walks(from_stop):
+        arrival = from_arrival + int(distance / WALK_SPEED)
+
+        if arrival < min(self.initial_arrivals[to_stop], self.arrival):
+          self.initial_arrivals[to_stop] = arrival
+          self.initial_from_stops[to_stop] = from_stop
+          self.initial_details[to_stop] = distance
+
+          if count == len(pending):
+            pending = grow(pending)
+
+          pending[count] = to_stop
+          count += 1
+
+
+  def near_start_stops(self):
+    return np.nonzero(self.initial_arrivals != INF_TIME)[0]
+
+
+  def solve(self) -> Plan:
+    self.start_walks()
+    reached_stops = self.near_start_stops()
+
+    for stop_id in reached_stops:
+      arrival = self.initial_arrivals[stop_id]
+      walk_time = self.walk_time(stop_id)
+
+      if arrival + walk_time < self.arrival:
+        self.arrival = arrival + walk_time
+        self.arrival_stop = stop_id
+        self.arrival_alighted = False
+
+    for stop_id in reached_stops:
+      # Stop might have been reached by walking after the initial walk got
+      # there, but no transfer time is needed after the initial walk
+      ready = min(self.initial_arrivals[stop_id] + TRANSFER_TIME, self.starts[stop_id])
+
+      for trip_id, seq, departure in self.stops.get_stop_trips(stop_id):
+        instance = self.trip_starts.next_index(trip_id, ready - departure)
+
+        if instance < self.trip_starts.offs[trip_id+1]:
+          self.enqueue(instance, trip_id, seq, -1, stop_id, 0)
+
+    round_beg = 0
+
+    for _ in range(self.rounds):
+      round_end = self.segment_count
+
+      if round_beg == round_end:
+        break
+
+      for s in range(round_beg, round_end):
+        self.scan_segment(s)
+
+      round_beg = round_end
+
+    return Plan(self.arrival, self.gather_path(), self.iteration)
+
+
+  def scan_segment(self, s: int):
+    trips = self.trips
+    trip_id = self.segment_trips[s]
+    start = self.trip_starts.times[self.segment_instances[s]]
+    off = trips.stops_off[trip_id]
+    self.iteration += 1
+
+    if start + trips.stops_departures[off + self.segment_begs[s]] >= self.arrival:
+      return
+
+    for event in range(off + self.segment_begs[s] + 1, off + self.segment_ends[s]):
+      arrival = start + trips.stops_arrivals[event]
+
+      if arrival >= self.arrival:
+        break
+
+      self.alight(s, event, arrival)
+
+      for t in range(self.transfers.offs[event], self.transfers.offs[event+1]):
+        to_trip = self.transfers.to_trips[t]
+        to_seq = self.transfers.to_seqs[t]
+        distance = self.transfers.distances[t]
+        departure = trips.stops_departures[trips.stops_off[to_trip] + to_seq]
+        ready = arrival + int(distance / WALK_SPEED) + TRANSFER_TIME
+        instance = self.trip_starts.next_index(to_trip, ready - departure)
+
+        if instance == self.trip_starts.offs[to_trip+1]:
+          continue
+
+        if self.trip_starts.times[instance] + departure >= self.arrival:
+          continue
+
+        self.enqueue(instance, to_trip, to_seq, s, event, distance)
+
+
+  def alight(self, s: int, event: int, arrival: int):
+    """Relaxes walks from stop of event, where segment s gets off at arrival."""
+    stop_id = self.trips.stops_ids[event]
+
+    if arrival >= min(self.alight_arrivals[stop_id], self.arrival):
+      return
+
+    self.alight_arrivals[stop_id] = arrival
+    self.alight_from_stops[stop_id] = -1
+    self.alight_details[stop_id] = 0
+    self.alight_segments[stop_id] = s
+    self.alight_events[stop_id] = event
+    self.alight_distances[stop_id] = 0
+    pending = self.pending
+    pending[0] = stop_id
+    count = 1
+
+    while count > 0:
+      count -= 1
+      from_stop = pending[count]
+      from_arrival = self.alight_arrivals[from_stop]
+      walk_time = self.walk_time(from_stop)
+
+      if from_arrival + walk_time < self.arrival:
+        self.arrival = from_arrival + walk_time
+        self.arrival_stop = from_stop
+        self.arrival_alighted = True
+
+      for to_stop, distance in self.stops.get_stop_walks(from_stop):
+        to_arrival = from_arrival + int(distance / WALK_SPEED)
+
+        if to_arrival < min(self.alight_arrivals[to_stop], self.arrival):
+          self.alight_arrivals[to_stop] = to_arrival
+          self.alight_from_stops[to_stop] = from_stop
+          self.alight_details[to_stop] = distance
+          self.alight_segments[to_stop] = s
+          self.alight_events[to_stop] = self.alight_events[from_stop]
+          self.alight_distances[to_stop] = self.alight_distances[from_stop] + distance
+
+          if self.alight_from_stops[from_stop] != -1:
+            self.board(to_stop)
+
+          if count == len(pending):
+            pending = grow(pending)
+            self.pending = pending
+
+          pending[count] = to_stop
+          count += 1
+
+
+  def board(self, stop_id: int):
+    """Enqueues trips at stop_id, reached by its alight label."""
+    ready = self.alight_arrivals[stop_id] + TRANSFER_TIME
+
+    for trip_id, seq, departure in self.stops.get_stop_trips(stop_id):
+      instance = self.trip_starts.next_index(trip_id, ready - departure)
+
+      if instance == self.trip_starts.offs[trip_id+1]:
+        continue
+
+      if self.trip_starts.times[instance] + departure >= self.arrival:
+        continue
+
+      self.enqueue(
+        instance,
+        trip_id,
+        seq,
+        self.alight_segments[stop_id],
+        self.alight_events[stop_id],
+        self.alight_distances[stop_id],
+      )
+
+
+  def gather_path(self):
+    result = nb.typed.List.empty_list(NbtPathSegment)
+    trips = self.trips
+
+    if self.arrival_stop == -1:
+      result.append(self.path_tail)
+      return result
+
+    stop_id = self.arrival_stop
+    s = -1
+    boarding = INF_TIME
+
+    result.append(PathSegment(
+      nb.int32(stop_id),
+      nb.int32(-1),
+      nb.int32(self.walk_time(stop_id) * WALK_SPEED),
+    ))
+
+    if self.arrival_alighted:
+      while self.alight_from_stops[stop_id] != -1:
+        from_stop = self.alight_from_stops[stop_id]
+        result.append(PathSegment(from_stop, nb.int32(-1), self.alight_details[stop_id]))
+        stop_id = from_stop
+
+      s = self.alight_segments[stop_id]
+
+    while s != -1:
+      trip_id = self.segment_trips[s]
+      board_event = trips.stops_off[trip_id] + self.segment_begs[s]
+      board_stop = trips.stops_ids[board_event]
+      start = self.trip_starts.times[self.segment_instances[s]]
+
+      result.append(PathSegment(
+        nb.int32(board_stop),
+        nb.int32(trip_id),
+        nb.int32(start + trips.stops_departures[board_event]),
+      ))
+
+      parent = self.segment_parents[s]
+
+      if parent == -1:
+        stop_id = board_stop
+        boarding = start + trips.stops_departures[board_event]
+      else:
+        alight_stop = trips.stops_ids[self.segment_alights[s]]
+
+        if alight_stop != board_stop:
+          result.append(PathSegment(
+            nb.int32(alight_stop),
+            nb.int32(-1),
+            self.segment_distances[s],
+          ))
+
+      s = parent
+
+    # Trip boarded right after the initial walk, see solve
+    if boarding != INF_TIME and self.starts[stop_id] <= boarding:
+      result.append(PathSegment(nb.int32(-1), nb.int32(-1), self.start_distances[stop_id]))
+      result.reverse()
+      return result
+
+    while True:
+      result.append(PathSegment(
+        self.initial_from_stops[stop_id],
+        nb.int32(-1),
+        self.initial_details[stop_id],
+      ))
+
+      if self.initial_from_stops[stop_id] == -1:
+        break
+
+      stop_id = self.initial_from_stops[stop_id]
+
+    result.reverse()
+    return result
+
+
+@nb.jit(nogil=True)
+def solve_tripbased(task):
+  return task.solve()
@@ -24,11 +24,17 @@ sys.path.append(str(FDIR))
 
 from common import *
 
-if len(sys.argv) == 1:
-  print(f"Usage: {sys.argv[0]} CITY")
+args = sys.argv[1:]
+hourly = "--hourly" in args
+
+if hourly:
+  args.remove("--hourly")
+
+if len(args) == 0:
+  print(f"Usage: {sys.argv[0]} [--hourly] CITY")
   sys.exit()
 else:
-  city_name = " ".join(sys.argv[1:])
+  city_name = " ".join(args)
   city = get_city(city_name)
 
   if city is None:
@@ -78,11 +84,13 @@ def distance_m(a, b) -> np.float32:
   return np.abs(a.x - b.x) + np.abs(a.y - b.y)
 
 
-@nb.jit(nogil=True)
-def calculate_times(from_cluster, clusters, stops, trips, empty_services):
-  result = np.empty(clusters.count, dtype=np.int32)
+HOURS = 24
+SAMPLES_PER_HOUR = 4 # Departures within an hour for which times are calculated
 
-  prospect = Prospect(
+
+@nb.jit
+def cluster_prospect(from_cluster, clusters):
+  return Prospect(
     clusters.centers[from_cluster],
     Coords(np.float32(0), np.float32(0)),
     clusters.stops[from_cluster],
@@ -92,30 +100,68 @@ def calculate_times(from_cluster, clusters, stops, trips, empty_services):
     np.float32(0),
   )
 
+
+@nb.jit
+def cluster_times(from_cluster, clusters, arrivals, start_time, result):
+  """Sets result to times to every cluster, unless they're longer already."""
+  for to_cluster in range(clusters.count):
+    if to_cluster == from_cluster:
+      result[to_cluster] = 0
+      continue
+
+    for stop in clusters.stops[to_cluster]:
+      if arrivals[stop.id] != INF_TIME:
+        result[to_cluster] = min(result[to_cluster], arrivals[stop.id] - start_time)
+
+
+@nb.jit(nogil=True)
+def calculate_times(from_cluster, clusters, stops, trips, empty_starts):
+  result = np.full(clusters.count, INF_TIME, dtype=np.int32)
+
   task = RouterTask(
     stops,
     trips,
     np.empty((0, 0), np.int32),
-    prospect,
+    cluster_prospect(from_cluster, clusters),
     0,
-    empty_services,
+    empty_starts,
+    True,
+    INF_TIME,
+    None,
   )
 
-  task.arrival = INF_TIME
-  task.exhaustive = True
-  task.solve_timeless()
+  arrivals, _ = solve_one_to_all(task, True)
+  cluster_times(from_cluster, clusters, arrivals, 0, result)
+  return result
 
-  for to_cluster in range(clusters.count):
-    if to_cluster == from_cluster:
-      result[to_cluster] = 0
-      continue
 
-    time = INF_TIME
+@nb.jit(nogil=True)
+def calculate_hourly_times(from_cluster, clusters, stops, trips, trip_starts):
+  """
+  Times to every cluster for departures in every hour, the shortest of the
+  ones departing at SAMPLES_PER_HOUR evenly spaced times.
+  """
+  result = np.full((HOURS, clusters.count), INF_TIME, dtype=np.int32)
+  prospect = cluster_prospect(from_cluster, clusters)
 
-    for stop in clusters.stops[to_cluster]:
-      time = min(time, task.get_node(stop.id).arrival)
+  task = RouterTask(
+    stops,
+    trips,
+    np.empty((0, 0), np.int32),
+    prospect,
+    0,
+    trip_starts,
+    True,
+    INF_TIME,
+    None,
+  )
 
-    result[to_cluster] = time
+  for hour in range(HOURS):
+    for sample in range(SAMPLES_PER_HOUR):
+      start_time = hour * 60*60 + sample * 60*60 // SAMPLES_PER_HOUR
+      task.start(prospect, start_time, trip_starts, True, INF_TIME, None)
+      arrivals, _ = solve_one_to_all(task, False)
+      cluster_times(from_cluster, clusters, arrivals, start_time, result[hour])
 
   return result
 
@@ -125,11 +171,31 @@ tdb = TransitDb(DATA_CITIES / f"{city['id']}.db")
 stops = tdb.get_stops()
 trips = tdb.get_trips()
 clusters = get_clusters(tdb)
-empty_services = Services.empty()
 
+if hourly:
+  # Day types in the order of algorithm.estimator.Instant
+  s4dt = tdb.script("get-services-for-day-types").np()["services"]
+  workday_services = Services(today=s4dt[0], yesterday=s4dt[0], tomorrow=s4dt[0])
+  saturday_services = Services(today=s4dt[1], yesterday=s4dt[0], tomorrow=s4dt[2])
+  sunday_services = Services(today=s4dt[2], yesterday=s4dt[1], tomorrow=s4dt[0])
+  dt_services = [workday_services, saturday_services, sunday_services]
+  results = np.empty((len(dt_services), HOURS, clusters.count, clusters.count), np.int32)
+
+  for day_type, services in enumerate(dt_services):
+    trip_starts = get_trip_starts(trips, services)
+
+    def do_calc(i):
+      return calculate_hourly_times(i, clusters, stops, trips, trip_starts)
+
+    for from_cluster, times in enumerate(tp.map(do_calc, range(clusters.count))):
+      results[day_type, :, from_cluster, :] = times
+
+  np.save(DATA_CITIES / f"{city['id']}-clustertimes-hourly.npy", results)
+else:
+  empty_starts = TripStarts.empty(len(trips.routes))
 
-def do_calc(i):
-  return calculate_times(i, clusters, stops, trips, empty_services)
+  def do_calc(i):
+    return calculate_times(i, clusters, stops, trips, empty_starts)
 
-results = list(tp.map(do_calc, range(clusters.count)))
-np.save(DATA_CITIES / f"{city['id']}-clustertimes.npy", np.array(results))
+  results = list(tp.map(do_calc, range(clusters.count)))
+  np.save(DATA_CITIES / f"{city['id']}-clustertimes.npy", np.array(results))
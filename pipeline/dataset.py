@@ -148,9 +148,10 @@ workday_services = Services(today=s4dt[0], yesterday=s4dt[0], tomorrow=s4dt[0])
 saturday_services = Services(today=s4dt[1], yesterday=s4dt[0], tomorrow=s4dt[2])
 sunday_services = Services(today=s4dt[2], yesterday=s4dt[1], tomorrow=s4dt[0])
 dt_services = [workday_services, saturday_services, sunday_services]
+dt_starts = [get_trip_starts(trips, services) for services in dt_services]
 
 def random_day_type():
-  return random.randrange(0, len(dt_services))
+  return random.randrange(0, len(dt_starts))
 
 @nb.jit
 def random_time():
@@ -158,18 +159,9 @@ def random_time():
 
 
 @nb.jit(nogil=True)
-def process(stops, trips, prospect, from_stop, day_type, services, batch):
+def process(task, stops, prospect, from_stop, day_type, trip_starts, batch):
   start = random_time()
-
-  task = RouterTask(
-    stops,
-    trips,
-    clustertimes,
-    prospect,
-    start,
-    services,
-  )
-
+  task.start(prospect, start, trip_starts)
   plan = task.solve()
 
   batch.push(
@@ -185,7 +177,7 @@ def process(stops, trips, prospect, from_stop, day_type, services, batch):
 
   if len(plan.path) > 3:
     stop_id = plan.path[random.randrange(3, len(plan.path))].from_stop
-    node = task.nodes[stop_id]
+    arrival = task.get_arrival(stop_id)
     to_stop = stops[stop_id]
 
     prospect.destination = to_stop.position
@@ -202,7 +194,7 @@ def process(stops, trips, prospect, from_stop, day_type, services, batch):
       day_type,
       start,
       reference(stops, prospect, from_stop, None),
-      node.arrival - start,
+      arrival - start,
     )
 
 
@@ -231,7 +223,14 @@ def make_batch():
         destination = random_stop()
 
     prospect = local_prospector.prospect(from_stop, destination)
-    process(stops, trips, prospect, from_stop, day_type, dt_services[day_type], batch)
+    trip_starts = dt_starts[day_type]
+    task = getattr(thread_local, "task", None)
+
+    if task is None:
+      task = RouterTask(stops, trips, clustertimes, prospect, 0, trip_starts)
+      thread_local.task = task
+
+    process(task, stops, prospect, from_stop, day_type, trip_starts, batch)
 
   return batch_to_chunk(batch)
 
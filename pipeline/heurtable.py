@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import ThreadPoolExecutor
+import numba as nb
+import numpy as np
+import os
+from pathlib import Path
+import sys
+
+FDIR = Path(__file__).parent
+sys.path.append(str(FDIR.parent / "ebus"))
+sys.path.append(str(FDIR))
+
+from common import *
+
+if len(sys.argv) == 1:
+  print(f"Usage: {sys.argv[0]} CITY")
+  sys.exit()
+else:
+  city_name = " ".join(sys.argv[1:])
+  city = get_city(city_name)
+
+  if city is None:
+    print(f"Unknown city '{city_name}'")
+    sys.exit()
+
+from algorithm.estimators.heurtable import CELL_SIZE, UNKNOWN, heurtable_grid
+from transit.data.misc import *
+from transit.data.stops import Stops
+from transit.params import WALK_SPEED
+from transit.transitdb import *
+from transit.router import *
+
+
+TIME_BUCKETS = 24
+SAMPLES_PER_BUCKET = 2 # Departures within a bucket for which times are calculated
+CELL_WALK = 500 # Max distance walked from the last stop to a cell (meters)
+
+
+def get_cell_stops(stops: Stops) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+  """
+  Stops within CELL_WALK of every cell, with times of walks to its nearest
+  point, in CSR layout.
+  """
+  x0, y0, columns, rows = heurtable_grid(stops)
+  offs = [0]
+  stop_ids = []
+  walk_times = []
+
+  for row in range(rows):
+    for column in range(columns):
+      cx0 = x0 + column * CELL_SIZE
+      cy0 = y0 + row * CELL_SIZE
+      dx = np.maximum.reduce([cx0 - stops.xs, np.zeros(stops.count()), stops.xs - cx0 - CELL_SIZE])
+      dy = np.maximum.reduce([cy0 - stops.ys, np.zeros(stops.count()), stops.ys - cy0 - CELL_SIZE])
+      distances = np.sqrt(dx*dx + dy*dy)
+      near = np.flatnonzero(distances <= CELL_WALK)
+      stop_ids.append(near)
+      walk_times.append(distances[near] / WALK_SPEED)
+      offs.append(offs[-1] + len(near))
+
+  return (
+    np.array(offs, np.int32),
+    np.concatenate(stop_ids).astype(np.int32),
+    np.concatenate(walk_times).astype(np.int32),
+  )
+
+
+@nb.jit(nogil=True)
+def calculate_times(from_stop, stops, trips, trip_starts, cells_off, cells_stops, cells_walks):
+  """
+  Minutes to every cell for departures in every time bucket, the shortest of
+  the ones departing at SAMPLES_PER_BUCKET evenly spaced times.
+  """
+  cell_count = len(cells_off) - 1
+  result = np.full((TIME_BUCKETS, cell_count), INF_TIME, np.int32)
+  prospect = stop_prospect(stops, from_stop)
+  bucket_time = DAY // TIME_BUCKETS
+
+  task = RouterTask(
+    stops,
+    trips,
+    np.empty((0, 0), np.int32),
+    prospect,
+    0,
+    trip_starts,
+    True,
+    INF_TIME,
+    None,
+  )
+
+  for bucket in range(TIME_BUCKETS):
+    for sample in range(SAMPLES_PER_BUCKET):
+      start_time = bucket * bucket_time + sample * bucket_time // SAMPLES_PER_BUCKET
+      task.start(prospect, start_time, trip_starts, True, INF_TIME, None)
+      arrivals, _ = solve_one_to_all(task, False)
+
+      for cell in range(cell_count):
+        for i in range(cells_off[cell], cells_off[cell+1]):
+          arrival = arrivals[cells_stops[i]]
+
+          if arrival != INF_TIME:
+            time = arrival - start_time + cells_walks[i]
+            result[bucket, cell] = min(result[bucket, cell], time)
+
+  minutes = np.full((TIME_BUCKETS, cell_count), UNKNOWN, np.uint16)
+
+  for bucket in range(TIME_BUCKETS):
+    for cell in range(cell_count):
+      if result[bucket, cell] != INF_TIME:
+        minutes[bucket, cell] = min(result[bucket, cell] // 60, UNKNOWN - 1)
+
+  return minutes
+
+
+tp = ThreadPoolExecutor(max_workers=os.cpu_count())
+tdb = TransitDb(DATA_CITIES / f"{city['id']}.db")
+stops = tdb.get_stops()
+trips = tdb.get_trips()
+cells_off, cells_stops, cells_walks = get_cell_stops(stops)
+
+# Day types in the order of algorithm.estimator.Instant
+s4dt = tdb.script("get-services-for-day-types").np()["services"]
+workday_services = Services(today=s4dt[0], yesterday=s4dt[0], tomorrow=s4dt[0])
+saturday_services = Services(today=s4dt[1], yesterday=s4dt[0], tomorrow=s4dt[2])
+sunday_services = Services(today=s4dt[2], yesterday=s4dt[1], tomorrow=s4dt[0])
+dt_services = [workday_services, saturday_services, sunday_services]
+
+# Written straight to the file, since for large cities it can take gigabytes
+table = np.lib.format.open_memmap(
+  DATA_CITIES / f"{city['id']}-heurtable.npy",
+  mode="w+",
+  dtype=np.uint16,
+  shape=(len(dt_services), TIME_BUCKETS, stops.count(), len(cells_off) - 1),
+)
+
+for day_type, services in enumerate(dt_services):
+  trip_starts = get_trip_starts(trips, services)
+
+  def do_calc(i):
+    return calculate_times(i, stops, trips, trip_starts, cells_off, cells_stops, cells_walks)
+
+  for from_stop, minutes in enumerate(tp.map(do_calc, range(stops.count()))):
+    table[day_type, :, from_stop, :] = minutes
+
+table.flush()
@@ -24,6 +24,10 @@ else:
     sys.exit()
 
 
+from algorithm.estimators.knn import save_knn_grid
+from transit.transitdb import TransitDb
+
+
 N = 5
 
 dataset_path = TMP_CITIES / city["id"] / "dataset.parquet"
@@ -50,3 +54,7 @@ knnr.fit(X, Y)
 
 with (DATA_CITIES / f"{city['id']}-knn.pkl").open("wb") as file:
   pickle.dump(knnr, file)
+
+print("Building grid of KNN times")
+tdb = TransitDb(DATA_CITIES / f"{city['id']}.db")
+save_knn_grid(knnr, DATA_CITIES / f"{city['id']}-knn-grid.npy", tdb.get_stops())
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import ThreadPoolExecutor
+import numba as nb
+import numpy as np
+import os
+from pathlib import Path
+import sys
+
+FDIR = Path(__file__).parent
+sys.path.append(str(FDIR.parent / "ebus"))
+sys.path.append(str(FDIR))
+
+from common import *
+
+if len(sys.argv) == 1:
+  print(f"Usage: {sys.argv[0]} CITY")
+  sys.exit()
+else:
+  city_name = " ".join(sys.argv[1:])
+  city = get_city(city_name)
+
+  if city is None:
+    print(f"Unknown city '{city_name}'")
+    sys.exit()
+
+from transit.backward import get_reverse_index
+from transit.data.misc import *
+from transit.data.stops import Stops
+from transit.data.trips import Trips
+from transit.transitdb import *
+from transit.router import *
+
+
+LANDMARK_COUNT = 16
+
+
+def pick_landmarks(stops: Stops, count: int) -> np.ndarray:
+  """Farthest-point sampling, starting from the stop farthest from the center."""
+  points = np.stack((stops.xs, stops.ys), axis=1)
+  distances = np.linalg.norm(points - points.mean(axis=0), axis=1)
+  result = []
+
+  for _ in range(count):
+    landmark = int(np.argmax(distances))
+    result.append(landmark)
+    distances = np.minimum(distances, np.linalg.norm(points - points[landmark], axis=1))
+
+  return np.array(result, np.int32)
+
+
+def reverse_network(stops: Stops, trips: Trips) -> tuple[Stops, Trips]:
+  """
+  Network in which every trip and walk goes the other way, so timeless
+  searches in it find travel times to the start rather than from it.
+  Boarding is possible wherever getting off is in the original network.
+  """
+  stop_count = stops.count()
+  durations = np.repeat(trips.stops_arrivals[trips.stops_off[1:] - 1], np.diff(trips.stops_off))
+  order = np.concatenate([
+    np.arange(trips.stops_off[t+1] - 1, trips.stops_off[t] - 1, -1, dtype=np.int32)
+    for t in range(len(trips.routes))
+  ])
+
+  stops_ids = trips.stops_ids[order]
+  stops_arrivals = (durations - trips.stops_departures)[order].astype(np.int32)
+  stops_departures = (durations - trips.stops_arrivals)[order].astype(np.int32)
+
+  seqs = np.arange(len(order)) - np.repeat(trips.stops_off[:-1], np.diff(trips.stops_off))
+  trip_ids = np.repeat(np.arange(len(trips.routes), dtype=np.int32), np.diff(trips.stops_off))
+
+  # Reversed event i is original event order[i], which can be left unless
+  # it's the first stop of its trip
+  first = np.zeros(len(order), np.bool_)
+  first[trips.stops_off[:-1]] = True
+  boardable = ~first[order]
+  boardable_ids = stops_ids[boardable]
+  by_stop = np.argsort(boardable_ids, kind="stable")
+
+  reverse = get_reverse_index(stops, trips)
+
+  reversed_stops = _replace_links(
+    stops,
+    reverse.walks_off,
+    reverse.walks_stop_ids,
+    reverse.walks_distances,
+    np.searchsorted(boardable_ids[by_stop], np.arange(stop_count + 1)).astype(np.int32),
+    trip_ids[boardable][by_stop],
+    seqs[boardable][by_stop].astype(np.int16),
+    stops_departures[boardable][by_stop],
+  )
+
+  reversed_trips = _replace_stops(trips, stops_ids, stops_arrivals, stops_departures)
+  return reversed_stops, reversed_trips
+
+
+# Stops and Trips are built in numba, so that their lists of strings aren't
+# boxed and unboxed again
+
+@nb.jit
+def _replace_links(stops, walks_off, walks_stop_ids, walks_distances, trips_off, trips_ids, trips_seqs, trips_departures):
+  return Stops(
+    stops.codes,
+    stops.names,
+    stops.zones,
+    stops.clusters,
+    stops.lats,
+    stops.lons,
+    stops.xs,
+    stops.ys,
+    walks_off,
+    walks_stop_ids,
+    walks_distances,
+    trips_off,
+    trips_ids,
+    trips_seqs,
+    trips_departures,
+  )
+
+
+@nb.jit
+def _replace_stops(trips, stops_ids, stops_arrivals, stops_departures):
+  return Trips(
+    trips.routes,
+    trips.shapes,
+    trips.headsigns,
+    trips.first_departures,
+    trips.last_departures,
+    trips.starts_off,
+    trips.starts_services_off,
+    trips.starts_services,
+    trips.starts_times_off,
+    trips.starts_times,
+    trips.stops_off,
+    stops_ids,
+    stops_arrivals,
+    stops_departures,
+  )
+
+
+@nb.jit(nogil=True)
+def calculate_times(landmark, stops, trips, empty_starts):
+  task = RouterTask(
+    stops,
+    trips,
+    np.empty((0, 0), np.int32),
+    stop_prospect(stops, landmark),
+    0,
+    empty_starts,
+    True,
+    INF_TIME,
+    None,
+  )
+
+  arrivals, _ = solve_one_to_all(task, True)
+  return arrivals
+
+
+tp = ThreadPoolExecutor(max_workers=os.cpu_count())
+tdb = TransitDb(DATA_CITIES / f"{city['id']}.db")
+stops = tdb.get_stops()
+trips = tdb.get_trips()
+reversed_stops, reversed_trips = reverse_network(stops, trips)
+empty_starts = TripStarts.empty(len(trips.routes))
+landmarks = pick_landmarks(stops, LANDMARK_COUNT)
+
+forward = list(tp.map(lambda l: calculate_times(l, stops, trips, empty_starts), landmarks))
+backward = list(tp.map(lambda l: calculate_times(l, reversed_stops, reversed_trips, empty_starts), landmarks))
+
+np.savez(
+  DATA_CITIES / f"{city['id']}-landmarks.npz",
+  landmarks=landmarks,
+  forward=np.array(forward),
+  backward=np.array(backward),
+)
@@ -18,7 +18,10 @@ sys.path.append(str(Path(__file__).parent))
 
 from common import *
 from transit.osrm import *
+from transit.raptor import get_pickups
+from transit.snapshot import save_snapshot
 from transit.transitdb import *
+from transit.tripbased import calculate_transfers
 
 
 STOP_WALK_RADIUS = 1000
@@ -235,6 +238,19 @@ def prepare_city(city):
       t1 = time.time()
       print(f"Time: {_t(t1, t0)}")
 
+      t0 = time.time()
+      print("Calculating transfers between trips")
+      stops = tdb.get_stops()
+      trips = tdb.get_trips()
+      transfers = calculate_transfers(stops, trips, get_pickups(stops, trips))
+      np.save(DATA_CITIES / f"{city['id']}-transfers.npy", transfers)
+
+      t1 = time.time()
+      print(f"Time: {_t(t1, t0)}")
+
+      print("Saving snapshot")
+      save_snapshot(DATA_CITIES / f"{city['id']}-snapshot", tdb.get_routes(), tdb.get_shapes(), stops, trips)
+
   except:
     tmp.unlink(missing_ok=True)
     raise
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parents[1] / "ebus"))
+sys.path.append(str(Path(__file__).parent))
+
+from common import *
+
+if len(sys.argv) == 1:
+  print(f"Usage: {sys.argv[0]} CITY")
+  sys.exit()
+else:
+  city_name = " ".join(sys.argv[1:])
+  city = get_city(city_name)
+
+  if city is None:
+    print(f"Unknown city '{city_name}'")
+    sys.exit()
+
+from transit.snapshot import save_snapshot
+from transit.transitdb import TransitDb
+
+
+tdb = TransitDb(DATA_CITIES / f"{city['id']}.db")
+
+save_snapshot(
+  DATA_CITIES / f"{city['id']}-snapshot",
+  tdb.get_routes(),
+  tdb.get_shapes(),
+  tdb.get_stops(),
+  tdb.get_trips(),
+)